@@ -0,0 +1,96 @@
+"""
+Compara requisições/s da timeline HTML (PostListView, WSGI síncrono) com a API
+JSON async (ASGI/uvicorn) na mesma concorrência.
+
+Suba os dois servidores antes (mesmo banco):
+
+    gunicorn config.wsgi:application -b 127.0.0.1:8001 -w 2
+    gunicorn config.asgi:application -b 127.0.0.1:8002 -w 2 -k uvicorn.workers.UvicornWorker
+
+e rode:
+
+    python benchmarks/bench_api.py --html http://127.0.0.1:8001/ \\
+        --api http://127.0.0.1:8002/api/posts/ -c 32 -n 2000
+"""
+import argparse
+import http.client
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+
+def summarize(latencies, errors, wall):
+    """Vazão e percentis (em ms) de uma rodada; `latencies` em segundos."""
+    latencies = sorted(latencies)
+    pct = lambda p: latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000 if latencies else 0.0
+    return {
+        "rps": len(latencies) / wall if wall else 0.0,
+        "p50_ms": pct(0.50),
+        "p95_ms": pct(0.95),
+        "p99_ms": pct(0.99),
+        "mean_ms": statistics.fmean(latencies) * 1000 if latencies else 0.0,
+        "errors": len(errors),
+    }
+
+
+def run(url, concurrency, total):
+    """
+    Dispara `total` GETs com `concurrency` conexões keep-alive. Retorna métricas.
+    `url` pode ser uma lista (mesmo host), percorrida em rodízio.
+    """
+    urls = [url] if isinstance(url, str) else list(url)
+    parts = urlsplit(urls[0])
+    paths = []
+    for u in urls:
+        p = urlsplit(u)
+        paths.append((p.path or "/") + (f"?{p.query}" if p.query else ""))
+    local = threading.local()
+    latencies, errors = [], []
+    lock = threading.Lock()
+
+    def one(i):
+        conn = getattr(local, "conn", None)
+        if conn is None:
+            conn = local.conn = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=30)
+        start = time.perf_counter()
+        try:
+            conn.request("GET", paths[i % len(paths)])
+            resp = conn.getresponse()
+            resp.read()
+            ok = resp.status == 200
+        except (OSError, http.client.HTTPException):
+            local.conn = None
+            ok = False
+        elapsed = time.perf_counter() - start
+        with lock:
+            (latencies if ok else errors).append(elapsed)
+
+    began = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, range(total)))
+    return summarize(latencies, errors, time.perf_counter() - began)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--html", default="http://127.0.0.1:8001/", help="URL da timeline HTML.")
+    parser.add_argument("--api", default="http://127.0.0.1:8002/api/posts/", help="URL da API JSON.")
+    parser.add_argument("-c", "--concurrency", type=int, default=32)
+    parser.add_argument("-n", "--requests", type=int, default=2000)
+    args = parser.parse_args()
+
+    print(f"concorrência={args.concurrency} requisições={args.requests}")
+    results = {}
+    for name, url in (("html", args.html), ("api", args.api)):
+        run(url, args.concurrency, min(100, args.requests))  # aquecimento
+        results[name] = r = run(url, args.concurrency, args.requests)
+        print(f"{name:>4}: {r['rps']:8.1f} req/s  p50={r['p50_ms']:.1f}ms  "
+              f"p95={r['p95_ms']:.1f}ms  p99={r['p99_ms']:.1f}ms  erros={r['errors']}")
+    if results["html"]["rps"]:
+        print(f"API/HTML: {results['api']['rps'] / results['html']['rps']:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+Concorrência no SQLite: vazão de escritas e leituras com vários processos
+(como os workers do gunicorn) no mesmo arquivo, antes e depois do perfil de
+produção (config/settings.py: SQLITE_PRAGMAS e TRANSACTION_MODE).
+
+Cada perfil roda sobre uma cópia limpa do banco de desenvolvimento:
+
+    python benchmarks/bench_sqlite.py --writers 4 --readers 4 --seconds 10
+
+A escrita imita o PostCreateView (lê o autor e cria o post numa transação;
+os signals atualizam os contadores); a leitura é a 1ª página da timeline.
+"""
+import argparse
+import json
+import os
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+# perfil -> variáveis de ambiente lidas por config/settings.py
+PROFILES = {
+    "antes": {
+        "SQLITE_JOURNAL_MODE": "delete", "SQLITE_SYNCHRONOUS": "full",
+        "SQLITE_TRANSACTION_MODE": "DEFERRED", "SQLITE_MMAP_SIZE": "0", "SQLITE_CACHE_SIZE": "-2000",
+    },
+    "depois": {},  # padrões do settings: WAL, NORMAL, IMMEDIATE, mmap, cache maior
+}
+
+
+def worker(role, seconds):
+    """Processo filho: repete a operação por `seconds` e imprime as contagens em JSON."""
+    sys.path.insert(0, str(BASE_DIR))
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
+    import django
+    django.setup()
+    from django.contrib.auth.models import User
+    from django.db import OperationalError, transaction
+    from posts.models import Post
+
+    author_id = User.objects.values_list("pk", flat=True).first()
+    ok = errors = 0
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        try:
+            if role == "writer":
+                with transaction.atomic():
+                    author = User.objects.get(pk=author_id)
+                    Post.objects.create(author=author, message="bench")
+            else:
+                page = Post.objects.select_related("author").prefetch_related("attachments")[:20]
+                list(page)
+            ok += 1
+        except OperationalError:  # "database is locked"
+            errors += 1
+    print(json.dumps({"role": role, "ok": ok, "errors": errors}))
+
+
+def run_profile(name, env, source, writers, readers, seconds):
+    with tempfile.TemporaryDirectory() as tmp:
+        db = os.path.join(tmp, "bench.sqlite3")
+        # Cópia consistente (API de backup), sem herdar o modo de journal de outra rodada
+        with sqlite3.connect(source) as src, sqlite3.connect(db) as dst:
+            src.backup(dst)
+        child_env = {
+            **os.environ, **env, "DATABASE_URL": f"sqlite:///{db}", "DEBUG": "1",
+            "SQLITE_READONLY_ALIAS": "0", "CACHE_BACKEND": "locmem",
+        }
+        procs = [
+            subprocess.Popen(
+                [sys.executable, __file__, "--worker", role, "--seconds", str(seconds)],
+                env=child_env, stdout=subprocess.PIPE, text=True,
+            )
+            for role in ["writer"] * writers + ["reader"] * readers
+        ]
+        results = [json.loads(p.communicate()[0].strip().splitlines()[-1]) for p in procs]
+    totals = {}
+    for role in ("writer", "reader"):
+        rows = [r for r in results if r["role"] == role]
+        totals[role] = {
+            "ops_s": sum(r["ok"] for r in rows) / seconds,
+            "errors": sum(r["errors"] for r in rows),
+        }
+    print(f"{name:>7}: escritas {totals['writer']['ops_s']:8.1f}/s (erros {totals['writer']['errors']})  "
+          f"leituras {totals['reader']['ops_s']:8.1f}/s (erros {totals['reader']['errors']})")
+    return totals
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", default=str(BASE_DIR / "db.sqlite3"), help="Banco de origem (migrado).")
+    parser.add_argument("--writers", type=int, default=4)
+    parser.add_argument("--readers", type=int, default=4)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--worker", choices=["writer", "reader"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        return worker(args.worker, args.seconds)
+    print(f"escritores={args.writers} leitores={args.readers} duração={args.seconds}s")
+    for name, env in PROFILES.items():
+        run_profile(name, env, args.db, args.writers, args.readers, args.seconds)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""
+Custo de partida do servidor: import do app e tempo até a primeira requisição.
+
+- import: processo Python novo importando config.wsgi (django.setup) e o
+  URLconf com todas as views; --top lista os módulos mais caros (-X importtime);
+- primeira requisição: sobe o gunicorn com config/gunicorn.py e mede do spawn
+  até a primeira resposta em --path, e a latência da segunda (já aquecida),
+  para cada WORKER_CLASS, com e sem preload.
+
+Uso:
+
+    python benchmarks/bench_startup.py --runs 5
+    python benchmarks/bench_startup.py --classes gthread,asgi --path /api/posts/ --top 15
+"""
+import argparse
+import http.client
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+IMPORT_SNIPPET = (
+    "import time; t = time.perf_counter(); import config.wsgi; "
+    "from django.urls import get_resolver; get_resolver().url_patterns; "
+    "print(time.perf_counter() - t)"
+)
+
+
+def _env(**extra):
+    return {**os.environ, "DJANGO_SETTINGS_MODULE": "config.settings", "DEBUG": os.getenv("DEBUG", "0"), **extra}
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def import_time():
+    """Segundos para importar o app e as views num interpretador novo."""
+    out = subprocess.run(
+        [sys.executable, "-c", IMPORT_SNIPPET], cwd=BASE_DIR, env=_env(),
+        check=True, capture_output=True, text=True,
+    ).stdout
+    return float(out.strip().splitlines()[-1])
+
+
+def slowest_imports(top):
+    """(cumulativo em ms, módulo) dos imports mais caros, pelo -X importtime."""
+    err = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", IMPORT_SNIPPET], cwd=BASE_DIR, env=_env(),
+        check=True, capture_output=True, text=True,
+    ).stderr
+    rows = []
+    for line in err.splitlines():
+        # "import time: self [us] | cumulative | imported package"
+        parts = line.removeprefix("import time:").split("|")
+        if len(parts) == 3 and parts[1].strip().isdigit():
+            rows.append((int(parts[1]) / 1000, parts[2].rstrip()))
+    return sorted(rows, reverse=True)[:top]
+
+
+def _get(port, path, timeout=1.0):
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=timeout)
+    try:
+        conn.request("GET", path, headers={"Host": "localhost"})
+        response = conn.getresponse()
+        response.read()
+        return response.status
+    finally:
+        conn.close()
+
+
+def first_request(worker_class, preload, path, workers, limit=30.0):
+    """(s até a primeira resposta, ms da segunda, status) de um gunicorn recém-criado."""
+    port = _free_port()
+    env = _env(
+        WORKER_CLASS=worker_class, GUNICORN_PRELOAD="1" if preload else "0",
+        WORKERS=str(workers), GUNICORN_BIND=f"127.0.0.1:{port}", METRICS_DIR="",
+    )
+    started = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", "python:config.gunicorn"],
+        cwd=BASE_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        while time.perf_counter() - started < limit:
+            try:
+                status = _get(port, path)
+            except OSError:
+                time.sleep(0.005)
+                continue
+            first = time.perf_counter() - started
+            t = time.perf_counter()
+            _get(port, path)
+            return first, (time.perf_counter() - t) * 1000, status
+        sys.exit(f"gunicorn ({worker_class}) não respondeu em {limit:.0f}s.")
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=3, help="Repetições de cada medida (vale a mediana).")
+    parser.add_argument("--classes", default="sync,gthread,asgi", help="WORKER_CLASS separados por vírgula.")
+    parser.add_argument("--path", default="/", help="URL da primeira requisição.")
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--top", type=int, default=0, help="Mostra os N imports mais lentos.")
+    args = parser.parse_args()
+
+    imports = [import_time() for _ in range(args.runs)]
+    print(f"import do app + views: {statistics.median(imports) * 1000:.0f}ms (mediana de {args.runs})")
+    for ms, module in slowest_imports(args.top) if args.top else []:
+        print(f"  {ms:8.1f}ms  {module}")
+
+    print(f"primeira requisição GET {args.path} ({args.workers} worker(s)):")
+    for worker_class in args.classes.split(","):
+        for preload in (True, False):
+            runs = [first_request(worker_class, preload, args.path, args.workers) for _ in range(args.runs)]
+            first = statistics.median(r[0] for r in runs)
+            second = statistics.median(r[1] for r in runs)
+            label = f"{worker_class}{' + preload' if preload else ''}"
+            print(f"  {label:>17}: {first * 1000:6.0f}ms até a 1ª resposta, 2ª {second:5.1f}ms (HTTP {runs[-1][2]})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,257 @@
+"""
+Benchmark repetível das views da timeline, com baseline e detecção de regressão.
+
+Cenários: list (timeline), list_deep (página antiga via cursor), detail,
+author (/u/<username>/), login (posts recentes na página de login) e
+create (POST de novo post; só no modo client, grava no banco).
+
+Modos:
+- client: Django test client em threads, no mesmo processo (conta queries
+  de cada requisição com CaptureQueriesContext);
+- http: sobe um gunicorn de verdade (ou usa --url) e mede pela rede; as
+  queries por requisição vêm do /metrics (InstrumentationMiddleware).
+
+Uso (banco de desenvolvimento populado pelo seed):
+
+    python manage.py seed_timeline --users 200 --posts 50000
+    python benchmarks/bench_views.py --mode http -c 8 -n 1000 --save-baseline
+    # ... depois da mudança:
+    python benchmarks/bench_views.py --mode http -c 8 -n 1000
+
+Sem --save-baseline, compara com benchmarks/baseline-<modo>.json e sai com
+status 1 se p95 subir, vazão cair (além de --threshold) ou queries aumentarem.
+"""
+import argparse
+import json
+import os
+import re
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE_DIR))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
+# O benchmark mede as views, não os limites: sem isso o cenário "create" vira 429
+# (vale também para o gunicorn do modo server, que herda o ambiente)
+os.environ.setdefault("THROTTLE_ENABLED", "0")
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.contrib.auth.models import User  # noqa: E402
+from django.db import connection  # noqa: E402
+from django.db.models import Count  # noqa: E402
+from django.test import Client  # noqa: E402
+from django.test.utils import CaptureQueriesContext  # noqa: E402
+from django.urls import reverse  # noqa: E402
+
+from bench_api import run, summarize  # noqa: E402
+from posts.models import Post  # noqa: E402
+from posts.pagination import encode_cursor  # noqa: E402
+
+# cenário -> view_name usado nos labels do /metrics
+VIEW_NAMES = {
+    "list": "posts:list", "list_deep": "posts:list", "detail": "posts:detail",
+    "author": "posts:author", "login": "login", "create": "posts:create",
+}
+
+
+def build_scenarios():
+    """URLs de cada cenário a partir dos dados atuais do banco."""
+    posts = Post.objects.order_by("-created_at", "-id")
+    recent = list(posts.values_list("pk", flat=True)[:50])
+    if not recent:
+        sys.exit("Banco sem posts: rode antes `python manage.py seed_timeline`.")
+    deep = posts.values_list("created_at", "id")[min(1000, posts.count() - 1)]
+    top_author = (
+        User.objects.annotate(n=Count("posts")).order_by("-n").values_list("username", flat=True).first()
+    )
+    return {
+        "list": [reverse("posts:list")],
+        "list_deep": [f"{reverse('posts:list')}?after={encode_cursor(deep)}"],
+        "detail": [reverse("posts:detail", args=[pk]) for pk in recent],
+        "author": [reverse("posts:author", args=[top_author])],
+        "login": [reverse("login")],
+        "create": [reverse("posts:create")],
+    }
+
+
+# ---------------------------
+# Modo client (mesmo processo)
+# ---------------------------
+def run_client(name, paths, concurrency, total, user):
+    local = threading.local()
+    latencies, errors, queries = [], [], []
+    lock = threading.Lock()
+
+    def one(i):
+        client = getattr(local, "client", None)
+        if client is None:
+            # Exceções viram 500 e contam como erro (ex.: "database is locked" no SQLite)
+            client = local.client = Client(HTTP_HOST="localhost", raise_request_exception=False)
+            if name == "create":
+                client.force_login(user)
+        path = paths[i % len(paths)]
+        start = time.perf_counter()
+        with CaptureQueriesContext(connection) as ctx:
+            if name == "create":
+                resp = client.post(path, {
+                    "message": f"benchmark {i}",
+                    "attachments-TOTAL_FORMS": "0", "attachments-INITIAL_FORMS": "0",
+                })
+            else:
+                resp = client.get(path)
+        elapsed = time.perf_counter() - start
+        with lock:
+            (latencies if resp.status_code in (200, 302) else errors).append(elapsed)
+            queries.append(len(ctx.captured_queries))
+
+    began = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, range(total)))
+    result = summarize(latencies, errors, time.perf_counter() - began)
+    result["queries"] = sum(queries) / len(queries) if queries else 0.0
+    return result
+
+
+# ---------------------------
+# Modo http (gunicorn)
+# ---------------------------
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_gunicorn(workers, metrics_dir):
+    port = _free_port()
+    # Flush a cada requisição: o /metrics precisa ver todos os workers ao fim de cada cenário
+    env = {**os.environ, "METRICS_DIR": metrics_dir, "METRICS_FLUSH_INTERVAL": "0", "DEBUG": os.getenv("DEBUG", "0")}
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "config.wsgi:application", "-b", f"127.0.0.1:{port}", "-w", str(workers)],
+        cwd=BASE_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    url = f"http://127.0.0.1:{port}"
+    for _ in range(100):
+        try:
+            urllib.request.urlopen(f"{url}/metrics", timeout=1).read()
+            return proc, url
+        except OSError:
+            time.sleep(0.1)
+    proc.terminate()
+    sys.exit("gunicorn não respondeu em 10s.")
+
+
+def scrape(url, view):
+    """(requisições, queries) acumuladas da view no /metrics."""
+    body = urllib.request.urlopen(f"{url}/metrics", timeout=5).read().decode()
+    total = lambda metric: sum(
+        float(v) for v in re.findall(rf'^{metric}\{{view="{re.escape(view)}"[^}}]*\}} ([\d.e+]+)$', body, re.M)
+    )
+    return total("http_requests_total"), total("db_queries_total")
+
+
+def run_http(url, paths, concurrency, total, view):
+    before = scrape(url, view)
+    result = run([url + p for p in paths], concurrency, total)
+    requests, queries = (a - b for a, b in zip(scrape(url, view), before))
+    result["queries"] = queries / requests if requests else 0.0
+    return result
+
+
+# ---------------------------
+# Baseline
+# ---------------------------
+def compare(results, baseline, threshold):
+    """Lista de regressões (cenário, motivo) em relação à baseline."""
+    regressions = []
+    for name, r in results.items():
+        base = baseline.get(name)
+        if not base:
+            continue
+        if r["p95_ms"] > base["p95_ms"] * (1 + threshold):
+            regressions.append((name, f"p95 {base['p95_ms']:.1f} -> {r['p95_ms']:.1f}ms"))
+        if r["rps"] < base["rps"] * (1 - threshold):
+            regressions.append((name, f"vazão {base['rps']:.1f} -> {r['rps']:.1f} req/s"))
+        if r["queries"] > base["queries"] + 0.5:
+            regressions.append((name, f"queries {base['queries']:.1f} -> {r['queries']:.1f} por requisição"))
+        if r["errors"]:
+            regressions.append((name, f"{r['errors']} erros"))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mode", choices=["client", "http"], default="client")
+    parser.add_argument("-c", "--concurrency", type=int, default=4)
+    parser.add_argument("-n", "--requests", type=int, default=300, help="Requisições por cenário.")
+    parser.add_argument("--only", help="Cenários separados por vírgula (padrão: todos os do modo).")
+    parser.add_argument("--url", help="Modo http: servidor já rodando (precisa do /metrics).")
+    parser.add_argument("--workers", type=int, default=2, help="Modo http: workers do gunicorn iniciado.")
+    parser.add_argument("--baseline", help="Arquivo de baseline (padrão: benchmarks/baseline-<modo>.json).")
+    parser.add_argument("--save-baseline", action="store_true", help="Grava os resultados como nova baseline.")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Tolerância relativa (0.2 = 20%%).")
+    parser.add_argument("--rounds", type=int, default=3, help="Rodadas por cenário; vale a de vazão mediana.")
+    args = parser.parse_args()
+
+    scenarios = build_scenarios()
+    if args.mode == "http":
+        scenarios.pop("create")  # POST exige sessão + CSRF: medido só no modo client
+    if args.only:
+        scenarios = {k: v for k, v in scenarios.items() if k in args.only.split(",")}
+    baseline_path = Path(args.baseline or Path(__file__).parent / f"baseline-{args.mode}.json")
+
+    proc = None
+    if args.mode == "http" and not args.url:
+        proc, args.url = start_gunicorn(args.workers, tempfile.mkdtemp(prefix="bench-metrics-"))
+    user = User.objects.order_by("pk").first()
+
+    results = {}
+    print(f"modo={args.mode} concorrência={args.concurrency} requisições={args.requests}")
+    try:
+        for name, paths in scenarios.items():
+            if args.mode == "client":
+                if name != "create":
+                    run_client(name, paths, args.concurrency, min(50, args.requests), user)  # aquecimento
+                rounds = [run_client(name, paths, args.concurrency, args.requests, user) for _ in range(args.rounds)]
+            else:
+                run([args.url + p for p in paths], args.concurrency, min(100, args.requests))  # aquecimento
+                rounds = [
+                    run_http(args.url, paths, args.concurrency, args.requests, VIEW_NAMES[name])
+                    for _ in range(args.rounds)
+                ]
+            # Mediana das rodadas: uma rodada ruim (ruído da máquina) não decide sozinha
+            rounds.sort(key=lambda r: r["rps"])
+            results[name] = r = rounds[len(rounds) // 2]
+            print(f"{name:>10}: {r['rps']:8.1f} req/s  p50={r['p50_ms']:.1f}ms  p95={r['p95_ms']:.1f}ms  "
+                  f"p99={r['p99_ms']:.1f}ms  queries={r['queries']:.1f}  erros={r['errors']}")
+    finally:
+        if proc:
+            proc.terminate()
+            proc.wait()
+
+    if args.save_baseline:
+        baseline_path.write_text(json.dumps(results, indent=2, sort_keys=True) + "\n")
+        print(f"Baseline gravada em {baseline_path}")
+        return
+    if not baseline_path.exists():
+        print(f"Sem baseline em {baseline_path} (use --save-baseline).")
+        return
+    regressions = compare(results, json.loads(baseline_path.read_text()), args.threshold)
+    for name, reason in regressions:
+        print(f"REGRESSÃO {name}: {reason}")
+    if regressions:
+        sys.exit(1)
+    print(f"Sem regressões em relação a {baseline_path} (tolerância {args.threshold:.0%}).")
+
+
+if __name__ == "__main__":
+    main()
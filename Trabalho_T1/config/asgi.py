@@ -13,4 +13,32 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+from django.core.handlers.asgi import ASGIHandler  # noqa: E402  (depois do setup)
+from django.core.handlers.exception import convert_exception_to_response  # noqa: E402
+
+from config.middleware import InstrumentationMiddleware  # noqa: E402
+
+
+class APIASGIHandler(ASGIHandler):
+    """
+    Handler ASGI da API JSON (/api/), sem a pilha de MIDDLEWARE do site.
+    A API é somente leitura e não usa sessão, CSRF nem mensagens; sob ASGI cada
+    middleware baseado em MiddlewareMixin custa dois saltos de thread por request.
+    """
+    def load_middleware(self, is_async=False):
+        self._view_middleware = []
+        self._template_response_middleware = []
+        self._exception_middleware = []
+        handler = convert_exception_to_response(self._get_response_async)
+        self._middleware_chain = convert_exception_to_response(InstrumentationMiddleware(handler))
+
+
+api_application = APIASGIHandler()
+
+
+async def application(scope, receive, send):
+    if scope["type"] == "http" and scope["path"].startswith("/api/"):
+        return await api_application(scope, receive, send)
+    return await django_application(scope, receive, send)
@@ -0,0 +1,37 @@
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache
+from django.core.exceptions import PermissionDenied
+
+
+def user_cache_key(user_id):
+    return f"auth:user:{user_id}"
+
+
+def invalidate_cached_user(user_id):
+    cache.delete(user_cache_key(user_id))
+
+
+class CachedModelBackend(ModelBackend):
+    """
+    ModelBackend que guarda o usuário da sessão no cache: a cada request o
+    AuthenticationMiddleware chama get_user(), que no Django padrão é um SELECT.
+    A verificação do hash da sessão (troca de senha derruba as sessões) continua
+    valendo, porque o cache é invalidado em todo save do usuário (posts.signals).
+    """
+    def get_user(self, user_id):
+        key = user_cache_key(user_id)
+        user = cache.get(key)
+        if user is None:
+            user = super().get_user(user_id)
+            if user is not None:
+                cache.set(key, user, settings.AUTH_USER_CACHE_TIMEOUT)
+        return user
+
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        user = super().authenticate(request, username=username, password=password, **kwargs)
+        if user is None and password is not None:
+            # O ModelBackend seguinte na lista (só para sessões antigas) daria a mesma
+            # resposta depois de outro PBKDF2: encerra a cadeia aqui
+            raise PermissionDenied
+        return user
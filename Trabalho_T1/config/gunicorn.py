@@ -0,0 +1,131 @@
+"""
+Perfil de produção do gunicorn:  gunicorn -c python:config.gunicorn
+
+Tudo por variável de ambiente (como o settings):
+
+- WORKER_CLASS: sync | gthread (padrão) | asgi (uvicorn; obrigatório para o
+  SSE de /api/events/). USE_ASGI=1 continua valendo como asgi;
+- WORKERS / WEB_CONCURRENCY: processos; padrão pelas CPUs disponíveis ao
+  container (affinity e cota do cgroup), conforme a classe. Em asgi sem
+  EVENTS_MODE=redis o padrão é 1: o MemoryBackend só entrega os eventos do SSE
+  aos clientes do mesmo processo (com mais workers explícitos, aviso no start);
+- THREADS (gthread), MAX_REQUESTS/MAX_REQUESTS_JITTER (reciclagem contra
+  vazamento de memória), TIMEOUT, GRACEFUL_TIMEOUT, KEEPALIVE, GUNICORN_BIND;
+- GUNICORN_PRELOAD=0 desliga o preload.
+
+Com preload o master importa o Django, o URLconf (todas as views) e compila os
+templates principais uma vez antes do fork: os workers nascem prontos,
+compartilham essas páginas de memória (copy-on-write) e a primeira requisição
+de cada um não paga os imports. Migrações, superusuário e collectstatic não
+rodam aqui: são passos únicos (entrypoint.sh setup / build da imagem).
+"""
+import math
+import os
+
+
+def _cpus():
+    """CPUs utilizáveis: affinity do processo limitada pela cota do cgroup v2 (docker --cpus)."""
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            quota, period = f.read().split()
+        if quota != "max":
+            cpus = min(cpus, max(1, math.ceil(int(quota) / int(period))))
+    except (OSError, ValueError):
+        pass
+    return cpus
+
+
+EVENTS_MODE = os.getenv("EVENTS_MODE", "memory")
+
+# modo -> (classe do worker, aplicação, workers por CPU disponível)
+_worker_modes = {
+    "sync": ("sync", "config.wsgi:application", lambda n: 2 * n + 1),
+    "gthread": ("gthread", "config.wsgi:application", lambda n: n + 1),
+    "asgi": ("uvicorn.workers.UvicornWorker", "config.asgi:application", lambda n: n if EVENTS_MODE == "redis" else 1),
+}
+WORKER_MODE = os.getenv("WORKER_CLASS", "asgi" if os.getenv("USE_ASGI", "0") == "1" else "gthread")
+worker_class, wsgi_app, _workers_for = _worker_modes[WORKER_MODE]
+
+bind = os.getenv("GUNICORN_BIND", f"0.0.0.0:{os.getenv('PORT', '8000')}")
+workers = int(os.getenv("WORKERS") or os.getenv("WEB_CONCURRENCY") or _workers_for(_cpus()))
+threads = int(os.getenv("THREADS", "4")) if WORKER_MODE == "gthread" else 1
+preload_app = os.getenv("GUNICORN_PRELOAD", "1") == "1"
+
+# Reciclagem: o jitter evita que todos os workers reiniciem juntos
+max_requests = int(os.getenv("MAX_REQUESTS", "2000"))
+max_requests_jitter = int(os.getenv("MAX_REQUESTS_JITTER", str(max_requests // 10)))
+
+timeout = int(os.getenv("TIMEOUT", "120"))
+graceful_timeout = int(os.getenv("GRACEFUL_TIMEOUT", "30"))
+keepalive = int(os.getenv("KEEPALIVE", "5"))
+# Heartbeat dos workers em tmpfs: no overlayfs do Docker o fchmod pode travar
+worker_tmp_dir = "/dev/shm" if os.path.isdir("/dev/shm") else None
+accesslog = os.getenv("ACCESS_LOG") or None
+errorlog = "-"
+
+
+# ---------------------------
+# Hooks
+# ---------------------------
+WARM_TEMPLATES = [
+    "base.html",
+    "posts/post_list.html",
+    "posts/post_detail.html",
+    "posts/post_author.html",
+    "registration/login.html",
+]
+
+
+def on_starting(server):
+    """Master, antes de carregar a aplicação."""
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
+    from django.conf import settings
+    from django.core.exceptions import ImproperlyConfigured
+
+    if workers > 1 and not settings.CACHE_SHARED:
+        # Cada worker teria suas próprias versões de cache: 304/páginas velhas nos que não viram a escrita
+        raise ImproperlyConfigured(
+            f"CACHE_BACKEND={settings.CACHE_BACKEND} é por processo e não serve {workers} workers; "
+            "use CACHE_BACKEND=file ou redis (ou WORKERS=1)."
+        )
+    if WORKER_MODE != "asgi":
+        server.log.info("WORKER_CLASS=%s: /api/events/ (SSE) responde 204; use asgi para a timeline ao vivo", WORKER_MODE)
+    elif workers > 1 and EVENTS_MODE != "redis":
+        server.log.warning(
+            "WORKER_CLASS=asgi com %d workers e EVENTS_MODE=%s: cada cliente do SSE só recebe "
+            "os eventos publicados no próprio worker; use EVENTS_MODE=redis ou WORKERS=1",
+            workers, EVENTS_MODE,
+        )
+
+
+def when_ready(server):
+    """Master, depois do preload e antes do primeiro fork."""
+    if not preload_app:
+        return
+    from django.db import connections
+    from django.template import TemplateDoesNotExist
+    from django.template.loader import get_template
+    from django.urls import get_resolver
+
+    get_resolver().url_patterns  # importa todas as views
+    for name in WARM_TEMPLATES:
+        try:
+            get_template(name)  # fica no loader cacheado (DEBUG=0) herdado pelos workers
+        except TemplateDoesNotExist:
+            pass
+    # Conexão aberta no master seria compartilhada pelos filhos (mesmo socket/arquivo)
+    connections.close_all()
+    server.log.info("Preload: %s pronto para %d worker(s) %s", wsgi_app, workers, WORKER_MODE)
+
+
+def child_exit(server, worker):
+    """Master, depois que um worker sai (reciclado por max_requests, timeout...)."""
+    if os.getenv("METRICS_DIR"):
+        from config.metrics import registry
+
+        # O arquivo do worker (gravado no atexit dele) vai para o agregado dos mortos
+        registry.fold([worker.pid])
@@ -0,0 +1,164 @@
+"""
+Servidor de mídia (uploads) para produção.
+
+- Range/206 para seek em áudio/vídeo, com If-Range;
+- ETag (o SHA-256 do storage endereçado por conteúdo, quando houver) e 304;
+- Cache-Control imutável só para nomes endereçados por conteúdo (o SHA-256 é o
+  nome: nunca muda de conteúdo); os demais (renditions, uploads antigos)
+  revalidam com ETag a cada uso (no-cache, 304 barato);
+- Sem carregar o arquivo na memória: sob o gunicorn, o FileResponse vira
+  wsgi.file_wrapper e o corpo sai via sendfile() (inclusive em ranges);
+- Com proxy na frente (MEDIA_ACCEL_REDIRECT=nginx|sendfile), só devolve os
+  headers X-Accel-Redirect / X-Sendfile e o proxy entrega o arquivo;
+- Content-Type do banco (tipo detectado pelos magic bytes no upload), nunca da
+  extensão; fora de ALLOWED_MEDIA_CONTENT_TYPES vai como download
+  (Content-Disposition: attachment), para um "GIF" com HTML não rodar no site.
+"""
+import os
+import re
+
+from django.conf import settings
+from django.http import FileResponse, Http404, HttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, parse_etags, quote_etag
+from django.views.decorators.http import require_safe
+
+from posts.models import Attachment, Rendition
+
+RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+SHA256_RE = re.compile(r"[0-9a-f]{64}")
+ONE_YEAR = 365 * 24 * 60 * 60
+
+
+class RangeFile:
+    """
+    Janela [start, start+length) de um arquivo aberto. Expõe fileno() e deixa o
+    descritor posicionado em `start`, que é o que o sendfile do gunicorn usa
+    (junto com o Content-Length) para enviar só o trecho pedido.
+    """
+    mode = "rb"
+
+    def __init__(self, f, start, length):
+        self._file = f
+        self._file.seek(start)
+        self.remaining = length
+
+    def read(self, size=-1):
+        if self.remaining <= 0:
+            return b""
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self._file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def fileno(self):
+        return self._file.fileno()
+
+    def close(self):
+        self._file.close()
+
+
+def _etag(path, stat):
+    digest = SHA256_RE.search(os.path.basename(path))
+    return quote_etag(digest.group(0) if digest else f"{int(stat.st_mtime):x}-{stat.st_size:x}")
+
+
+def _content_addressed(path):
+    """Nome do ContentAddressedStorage (<sha256>.<ext>): o conteúdo nunca muda."""
+    return SHA256_RE.fullmatch(os.path.splitext(os.path.basename(path))[0]) is not None
+
+
+def _stored_content_type(path):
+    """Tipo gravado no upload (Attachment.content_type / Rendition.format), ou None."""
+    if path.startswith("renditions/"):
+        fmt = Rendition.objects.filter(file=path).values_list("format", flat=True).first()  # índice em file
+        return f"image/{fmt}" if fmt else None
+    rows = Attachment.objects.filter(file=path)  # índice em file
+    digest = SHA256_RE.search(os.path.basename(path))
+    if digest:
+        rows = rows.filter(sha256=digest.group(0))
+    return rows.exclude(content_type="").values_list("content_type", flat=True).first()
+
+
+def _parse_range(header, size):
+    """(start, end) inclusivos; None = ignora o header; ValueError = 416."""
+    match = RANGE_RE.match(header.strip())
+    if not match:
+        return None  # sintaxe inválida ou múltiplos ranges: responde 200 completo
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:  # sufixo: últimos N bytes
+        start, end = max(0, size - int(last)), size - 1
+    else:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        raise ValueError
+    return start, end
+
+
+@require_safe
+def serve_media(request, path):
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+    except Exception:
+        raise Http404
+    if not os.path.isfile(full_path):
+        raise Http404
+
+    stat = os.stat(full_path)
+    etag = _etag(full_path, stat)
+
+    response = get_conditional_response(request, etag=etag, last_modified=int(stat.st_mtime))
+    if response is None:
+        content_type = _stored_content_type(path) or "application/octet-stream"
+        accel = getattr(settings, "MEDIA_ACCEL_REDIRECT", "")
+        if accel == "nginx":
+            # O nginx resolve Range/ETag por conta própria
+            response = HttpResponse(content_type=content_type)
+            response["X-Accel-Redirect"] = settings.MEDIA_ACCEL_PREFIX.rstrip("/") + "/" + path
+        elif accel == "sendfile":
+            response = HttpResponse(content_type=content_type)
+            response["X-Sendfile"] = full_path
+        else:
+            response = _file_response(request, full_path, stat.st_size, etag, content_type)
+        if content_type not in settings.ALLOWED_MEDIA_CONTENT_TYPES:
+            response["Content-Disposition"] = "attachment"
+    response["ETag"] = etag
+    response["Last-Modified"] = http_date(stat.st_mtime)
+    response["Accept-Ranges"] = "bytes"
+    if _content_addressed(path):
+        patch_cache_control(response, public=True, max_age=ONE_YEAR, immutable=True)
+    else:
+        patch_cache_control(response, public=True, no_cache=True)
+    return response
+
+
+def _file_response(request, full_path, size, etag, content_type):
+    byte_range = None
+    header = request.headers.get("Range")
+    if_range = request.headers.get("If-Range")
+    # If-Range com ETag diferente: o cliente tem outra versão, manda o arquivo inteiro
+    if header and (not if_range or etag in parse_etags(if_range)):
+        try:
+            byte_range = _parse_range(header, size)
+        except ValueError:
+            response = HttpResponse(status=416)
+            response["Content-Range"] = f"bytes */{size}"
+            return response
+
+    f = open(full_path, "rb")
+    if byte_range is None:
+        response = FileResponse(f, content_type=content_type)
+        response["Content-Length"] = str(size)
+        return response
+
+    start, end = byte_range
+    length = end - start + 1
+    response = FileResponse(RangeFile(f, start, length), status=206, content_type=content_type)
+    response["Content-Length"] = str(length)
+    response["Content-Range"] = f"bytes {start}-{end}/{size}"
+    return response
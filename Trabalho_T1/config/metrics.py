@@ -0,0 +1,271 @@
+"""
+Métricas da aplicação no formato texto do Prometheus (GET /metrics).
+
+Cada processo acumula contadores e histogramas em memória. Com METRICS_DIR
+definido (produção, vários workers do gunicorn), cada worker grava seu estado
+em METRICS_DIR/metrics-<pid>.json no máximo a cada METRICS_FLUSH_INTERVAL
+segundos, e /metrics soma os arquivos de todos os workers. Os arquivos de
+workers já reciclados (max_requests) são somados em metrics-dead.json e
+apagados (child_exit do gunicorn e a cada coleta): os contadores nunca andam
+para trás e o custo do scrape acompanha os workers vivos, não todos os que já
+existiram. O diretório é de um único host e deve ser esvaziado ao subir o
+servidor (ver entrypoint.sh).
+"""
+import atexit
+import fcntl
+import glob
+import ipaddress
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.http import Http404, HttpResponse, HttpResponseForbidden
+from django.utils.crypto import constant_time_compare
+from django.views.decorators.http import require_safe
+
+from config.throttle import client_ip
+
+# Soma dos processos que já terminaram (ver Registry.fold)
+DEAD_FILE = "metrics-dead.json"
+
+# Limites (em segundos) dos buckets do histograma de latência
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# nome -> (tipo, ajuda)
+METRICS = {
+    "http_requests_total": ("counter", "Requisições atendidas, por view, método e status."),
+    "http_request_duration_seconds": ("histogram", "Latência das requisições, por view e método."),
+    "http_response_size_bytes_total": ("counter", "Bytes de corpo de resposta enviados, por view."),
+    "http_slow_requests_total": ("counter", "Requisições acima de SLOW_REQUEST_MS, por view."),
+    "http_throttled_total": ("counter", "Requisições barradas pelo ThrottleMiddleware, por view e motivo."),
+    "db_queries_total": ("counter", "Queries SQL executadas, por view."),
+    "db_query_duration_seconds_total": ("counter", "Tempo gasto em queries SQL, por view."),
+    "template_render_duration_seconds_total": ("counter", "Tempo de renderização de templates, por view."),
+    "jobs_processed_total": ("counter", "Jobs executados pelo run_worker, por tarefa e resultado."),
+    "job_duration_seconds": ("histogram", "Duração dos jobs, por tarefa."),
+    "jobs_queue_depth": ("gauge", "Jobs na fila, por status."),
+    "jobs_queue_lag_seconds": ("gauge", "Há quanto tempo o job pronto mais antigo espera."),
+}
+
+
+class Registry:
+    """Contadores e histogramas com labels; thread-safe (gunicorn --threads)."""
+    def __init__(self, directory=None, flush_interval=1.0):
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self.lock = threading.Lock()
+        self.counters = defaultdict(float)   # (nome, labels) -> valor
+        self.histograms = {}                 # (nome, labels) -> [contagem por bucket..., soma, total]
+        self.gauges = {}                     # nome -> função que devolve [(labels, valor), ...]
+        self.last_flush = 0.0
+
+    def inc(self, name, labels, value=1):
+        with self.lock:
+            self.counters[(name, labels)] += value
+
+    def observe(self, name, labels, value, buckets=LATENCY_BUCKETS):
+        with self.lock:
+            h = self.histograms.setdefault((name, labels), [0] * len(buckets) + [0.0, 0])
+            for i, bound in enumerate(buckets):
+                if value <= bound:
+                    h[i] += 1
+                    break
+            h[-2] += value
+            h[-1] += 1
+
+    def gauge(self, name, func):
+        """Gauge calculado a cada scrape (ex.: tamanho da fila no banco), não acumulado."""
+        self.gauges[name] = func
+
+    # --- vários processos ---------------------------------------------------
+    def _path(self):
+        return os.path.join(self.directory, f"metrics-{os.getpid()}.json")
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                "counters": [[n, list(l), v] for (n, l), v in self.counters.items()],
+                "histograms": [[n, list(l), list(h)] for (n, l), h in self.histograms.items()],
+            }
+
+    def flush(self):
+        """Grava o estado deste processo (arquivo temporário + rename atômico)."""
+        if not self.directory:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path()
+        tmp = f"{path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.snapshot(), f, separators=(",", ":"))
+        os.replace(tmp, path)
+        self.last_flush = time.monotonic()
+
+    def maybe_flush(self):
+        if self.directory and time.monotonic() - self.last_flush >= self.flush_interval:
+            self.flush()
+
+    def _finished_files(self, pids=None):
+        """Arquivos dos processos `pids` ou, sem eles, dos que não existem mais."""
+        paths = []
+        for path in glob.glob(os.path.join(self.directory, "metrics-*.json")):
+            pid = os.path.basename(path)[len("metrics-"):-len(".json")]
+            if not pid.isdigit():
+                continue  # DEAD_FILE
+            pid = int(pid)
+            if (pid in pids) if pids else (pid != os.getpid() and not _pid_alive(pid)):
+                paths.append(path)
+        return paths
+
+    def fold(self, pids=None):
+        """
+        Soma em DEAD_FILE os arquivos de processos que já terminaram e os apaga.
+        Retorna quantos arquivos foram somados.
+        """
+        if not self.directory or not self._finished_files(pids):
+            return 0
+        # Exclusivo: dois scrapes (ou o master e um scrape) não somam o mesmo arquivo duas vezes
+        with self._dir_lock(fcntl.LOCK_EX):
+            paths = self._finished_files(pids)
+            dead = os.path.join(self.directory, DEAD_FILE)
+            counters, histograms = _merge(_read_snapshots([dead] + paths))
+            tmp = f"{dead}.tmp"
+            with open(tmp, "w") as f:
+                json.dump({
+                    "counters": [[n, list(l), v] for (n, l), v in counters.items()],
+                    "histograms": [[n, list(l), h] for (n, l), h in histograms.items()],
+                }, f, separators=(",", ":"))
+            os.replace(tmp, dead)
+            for path in paths:
+                os.remove(path)
+        return len(paths)
+
+    def collect(self):
+        """Estado somado de todos os processos (ou só deste, sem METRICS_DIR)."""
+        if not self.directory:
+            return _merge([self.snapshot()])
+        self.flush()
+        self.fold()
+        # Compartilhado: não lê no meio de um fold (arquivo já somado e ainda não apagado)
+        with self._dir_lock(fcntl.LOCK_SH):
+            return _merge(_read_snapshots(glob.glob(os.path.join(self.directory, "metrics-*.json"))))
+
+    @contextmanager
+    def _dir_lock(self, mode):
+        os.makedirs(self.directory, exist_ok=True)
+        with open(os.path.join(self.directory, "metrics.lock"), "a") as lock:
+            fcntl.flock(lock, mode)
+            yield
+
+    # --- exposição ----------------------------------------------------------
+    def render(self):
+        counters, histograms = self.collect()
+        lines = []
+        for name, (kind, help_text) in METRICS.items():
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            if kind == "counter":
+                for (n, labels), value in sorted(counters.items()):
+                    if n == name:
+                        lines.append(f"{name}{_labels(labels)} {_number(value)}")
+            elif kind == "gauge":
+                func = self.gauges.get(name)
+                for labels, value in (func() if func else ()):
+                    lines.append(f"{name}{_labels(labels)} {_number(value)}")
+            else:
+                for (n, labels), h in sorted(histograms.items()):
+                    if n != name:
+                        continue
+                    cumulative = 0
+                    for bound, count in zip(LATENCY_BUCKETS, h):
+                        cumulative += count
+                        lines.append(f"{name}_bucket{_labels(labels + (('le', _number(bound)),))} {cumulative}")
+                    lines.append(f"{name}_bucket{_labels(labels + (('le', '+Inf'),))} {h[-1]}")
+                    lines.append(f"{name}_sum{_labels(labels)} {_number(h[-2])}")
+                    lines.append(f"{name}_count{_labels(labels)} {h[-1]}")
+        return "\n".join(lines) + "\n"
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass  # existe, de outro usuário
+    return True
+
+
+def _read_snapshots(paths):
+    snapshots = []
+    for path in paths:
+        try:
+            with open(path) as f:
+                snapshots.append(json.load(f))
+        except (OSError, ValueError):
+            continue  # arquivo sumiu/está sendo trocado: entra na próxima coleta
+    return snapshots
+
+
+def _merge(snapshots):
+    """Soma snapshots em (contadores, histogramas) indexados por (nome, labels)."""
+    counters, histograms = defaultdict(float), {}
+    for snap in snapshots:
+        for name, labels, value in snap["counters"]:
+            counters[(name, tuple(map(tuple, labels)))] += value
+        for name, labels, h in snap["histograms"]:
+            key = (name, tuple(map(tuple, labels)))
+            acc = histograms.setdefault(key, [0] * len(h))
+            for i, v in enumerate(h):
+                acc[i] += v
+    return counters, histograms
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels) + "}"
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+registry = Registry(
+    directory=os.getenv("METRICS_DIR") or None,
+    flush_interval=float(os.getenv("METRICS_FLUSH_INTERVAL", "1")),
+)
+# Worker reciclado (max_requests, reload) grava o que ainda não tinha gravado
+atexit.register(registry.flush)
+
+
+def _private_client(request):
+    """Cliente em loopback/rede privada (atrás de THROTTLE_PROXIES, pelo X-Forwarded-For)."""
+    try:
+        addr = ipaddress.ip_address(client_ip(request, settings.THROTTLE_PROXIES))
+    except ValueError:
+        return False
+    return addr.is_loopback or addr.is_private
+
+
+@require_safe
+def metrics_view(request):
+    """
+    GET /metrics; com METRICS_TOKEN definido exige "Authorization: Bearer <token>".
+    Sem token, em produção (DEBUG=0) só responde a endereços locais/privados.
+    """
+    token = getattr(settings, "METRICS_TOKEN", "")
+    if token:
+        auth = request.headers.get("Authorization", "")
+        if not constant_time_compare(auth, f"Bearer {token}"):
+            return HttpResponseForbidden()
+    elif not settings.DEBUG and not _private_client(request):
+        raise Http404
+    return HttpResponse(registry.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
@@ -1,3 +1,20 @@
+import logging
+import math
+import time
+from contextlib import ExitStack
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+from django.http import HttpResponse
+from whitenoise.middleware import WhiteNoiseMiddleware
+
+from config import routers, throttle
+from config.metrics import registry
+
+logger = logging.getLogger("config.instrumentation")
+
+
 class DisableCSRFMiddleware:
     """
     Bypass global do CSRF APENAS para desenvolvimento.
@@ -11,3 +28,222 @@ class DisableCSRFMiddleware:
         # Flag interna que faz o CsrfViewMiddleware pular a validação
         setattr(request, "_dont_enforce_csrf_checks", True)
         return self.get_response(request)
+
+
+class AsyncWhiteNoiseMiddleware(WhiteNoiseMiddleware):
+    """
+    WhiteNoise que também roda em modo async.
+    O WhiteNoiseMiddleware original é só síncrono: sob ASGI o Django pula para
+    uma thread a cada request para atravessá-lo, o que serializa as views async
+    (API JSON, SSE) na thread única do sync_to_async.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response=None, settings=settings):
+        super().__init__(get_response, settings)
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        if self.autorefresh:
+            static_file = await sync_to_async(self.find_file)(request.path_info)
+        else:
+            static_file = self.files.get(request.path_info)
+        if static_file is not None:
+            return await sync_to_async(self.serve)(static_file, request)
+        return await self.get_response(request)
+
+
+class RequestTiming:
+    """Tempos de uma requisição, acumulados pelo InstrumentationMiddleware."""
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.queries = 0
+        self.db = 0.0
+        self.template = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        # connection.execute_wrapper: conta e cronometra cada query
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db += time.perf_counter() - start
+            self.queries += 1
+
+
+class InstrumentationMiddleware:
+    """
+    Mede cada requisição: latência por view, número e tempo de queries SQL,
+    tempo de renderização de templates e tamanho da resposta. Alimenta o
+    /metrics (config.metrics), registra requisições lentas no log e, com
+    SERVER_TIMING=1, devolve o header Server-Timing.
+    Deve ser o primeiro da lista MIDDLEWARE para cobrir toda a pilha.
+    Em modo async (API sob ASGI) as queries rodam em outra thread e não são
+    contadas; latência e tamanho são.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.slow_seconds = getattr(settings, "SLOW_REQUEST_MS", 500) / 1000
+        self.server_timing = getattr(settings, "SERVER_TIMING", False)
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        timing = request.timing = RequestTiming()
+        with ExitStack() as stack:
+            for conn in connections.all():
+                stack.enter_context(conn.execute_wrapper(timing))
+            response = self.get_response(request)
+        self.record(request, response, timing)
+        return response
+
+    async def __acall__(self, request):
+        timing = request.timing = RequestTiming()
+        response = await self.get_response(request)
+        self.record(request, response, timing)
+        return response
+
+    def process_template_response(self, request, response):
+        # Chamado logo antes do render() do TemplateResponse; o callback fecha a conta
+        timing = getattr(request, "timing", None)
+        if timing is not None:
+            start = time.perf_counter()
+
+            def rendered(response):
+                timing.template += time.perf_counter() - start
+            response.add_post_render_callback(rendered)
+        return response
+
+    def record(self, request, response, timing):
+        elapsed = time.perf_counter() - timing.start
+        match = request.resolver_match
+        view = match.view_name if match else "unresolved"
+        if response.streaming:
+            size = int(response.get("Content-Length") or 0)
+        else:
+            size = len(response.content)
+
+        registry.inc("http_requests_total", (("view", view), ("method", request.method), ("status", str(response.status_code))))
+        registry.observe("http_request_duration_seconds", (("view", view), ("method", request.method)), elapsed)
+        labels = (("view", view),)
+        registry.inc("http_response_size_bytes_total", labels, size)
+        if timing.queries:
+            registry.inc("db_queries_total", labels, timing.queries)
+            registry.inc("db_query_duration_seconds_total", labels, timing.db)
+        if timing.template:
+            registry.inc("template_render_duration_seconds_total", labels, timing.template)
+        if elapsed >= self.slow_seconds:
+            registry.inc("http_slow_requests_total", labels)
+            logger.warning(
+                "Requisição lenta: %s %s (%s) %.0fms, %d queries em %.0fms, template %.0fms, %d bytes",
+                request.method, request.get_full_path(), view, elapsed * 1000,
+                timing.queries, timing.db * 1000, timing.template * 1000, size,
+            )
+        registry.maybe_flush()
+
+        if self.server_timing:
+            response["Server-Timing"] = ", ".join([
+                f'db;dur={timing.db * 1000:.1f};desc="{timing.queries} queries"',
+                f"tpl;dur={timing.template * 1000:.1f}",
+                f"total;dur={elapsed * 1000:.1f}",
+            ])
+
+
+class PrimaryPinMiddleware:
+    """
+    Read-your-writes com réplicas: a requisição que escreveu no default devolve
+    um cookie que, por DATABASE_PIN_SECONDS, faz as leituras do mesmo cliente
+    irem ao default (config.routers.ReplicaRouter). O cookie só guarda o
+    horário de expiração; forjá-lo apenas manda as leituras para o primário.
+    """
+    cookie_name = "primary_pin"
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        try:
+            pinned = float(request.COOKIES.get(self.cookie_name, 0)) > time.time()
+        except ValueError:
+            pinned = False
+        tokens = routers.begin_request(pinned)
+        try:
+            response = self.get_response(request)
+        finally:
+            wrote = routers.end_request(tokens)
+        seconds = settings.DATABASE_PIN_SECONDS
+        if wrote and seconds and settings.DATABASE_READ_ALIASES:
+            response.set_cookie(
+                self.cookie_name, str(int(time.time() + seconds)),
+                max_age=seconds, httponly=True, samesite="Lax", secure=request.is_secure(),
+            )
+        return response
+
+
+class ThrottleMiddleware:
+    """
+    Token bucket + vagas de concorrência nas views de escrita (config.throttle).
+    Fica antes do CsrfViewMiddleware: o process_view dele lê request.POST, e a
+    requisição barrada aqui não deve custar parsing nem hash de senha.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        slot = getattr(request, "_throttle_slot", None)
+        if slot:
+            throttle.release_slot(slot)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if not settings.THROTTLE_ENABLED or request.method in ("GET", "HEAD", "OPTIONS"):
+            return None
+        view = request.resolver_match.view_name
+        rates = settings.THROTTLE_RATES.get(view)
+        group = settings.THROTTLE_GROUPS.get(view)
+        if not rates and not group:
+            return None
+
+        for scope, rate in (rates or {}).items():
+            rate = throttle.parse_rate(rate)
+            if rate is None:
+                continue
+            if scope == "user":
+                if not request.user.is_authenticated:
+                    continue
+                ident = request.user.pk
+            elif scope == "ip":
+                ident = throttle.client_ip(request, settings.THROTTLE_PROXIES)
+            else:
+                ident = ""
+            wait = throttle.take(f"throttle:{view}:{scope}:{ident}", rate)
+            if wait:
+                return self.reject(view, scope, 429, wait, "Muitas tentativas")
+
+        limit = settings.THROTTLE_CONCURRENCY.get(group, 0)
+        if limit:
+            request._throttle_slot = throttle.acquire_slot(group, limit, settings.THROTTLE_SLOT_TIMEOUT)
+            if request._throttle_slot is None:
+                return self.reject(view, "concurrency", 503, 1, "Servidor ocupado")
+        return None
+
+    def reject(self, view, reason, status, wait, message):
+        registry.inc("http_throttled_total", (("view", view), ("reason", reason)))
+        wait = max(1, math.ceil(wait))
+        return HttpResponse(
+            f"{message}; tente de novo em {wait} s.\n", status=status,
+            content_type="text/plain; charset=utf-8", headers={"Retry-After": str(wait)},
+        )
@@ -0,0 +1,55 @@
+import random
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+# Estado da requisição atual (ContextVar: vale para threads e para asyncio)
+_pinned = ContextVar("primary_pinned", default=False)
+_wrote = ContextVar("wrote_primary", default=False)
+
+
+def begin_request(pinned):
+    """Marca o início de uma requisição; devolve tokens para end_request()."""
+    return _pinned.set(pinned), _wrote.set(False)
+
+
+def end_request(tokens):
+    """Restaura o estado anterior; devolve True se a requisição escreveu no default."""
+    wrote = _wrote.get()
+    pinned_token, wrote_token = tokens
+    _pinned.reset(pinned_token)
+    _wrote.reset(wrote_token)
+    return wrote
+
+
+def primary_pinned():
+    return _pinned.get()
+
+
+class ReplicaRouter:
+    """
+    Leituras vão para uma das réplicas de settings.DATABASE_READ_ALIASES;
+    escritas e migrações ficam no default. As leituras também ficam no default:
+    - dentro de uma transação no default (atomic), para enxergar o que ela gravou;
+    - quando o cliente escreveu há pouco (PrimaryPinMiddleware), para o autor ver
+      as próprias mudanças antes de chegarem às réplicas.
+    """
+    def db_for_read(self, model, **hints):
+        aliases = settings.DATABASE_READ_ALIASES
+        if not aliases:
+            return None
+        if _pinned.get() or _wrote.get() or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return random.choice(aliases)
+
+    def db_for_write(self, model, **hints):
+        _wrote.set(True)
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Réplicas têm os mesmos dados do default
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db not in settings.DATABASE_READ_ALIASES
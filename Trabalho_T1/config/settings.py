@@ -2,6 +2,9 @@
 from pathlib import Path
 import os
 import dj_database_url
+from django.core.exceptions import ImproperlyConfigured
+
+from config.throttle import parse_rate
 
 # -----------------------------------------------------------------------------
 # Paths
@@ -42,15 +45,18 @@ INSTALLED_APPS = [
     "django.contrib.contenttypes",
     "django.contrib.sessions",
     "django.contrib.messages",
+    "posts",  # antes do staticfiles: o collectstatic de posts (com build_css) prevalece
     "django.contrib.staticfiles",
-    "posts",
 ]
 
 MIDDLEWARE = [
+    "config.middleware.InstrumentationMiddleware",  # métricas (/metrics) e Server-Timing
+    "config.middleware.PrimaryPinMiddleware",       # lê do default logo depois de escrever
     "django.middleware.security.SecurityMiddleware",
-    "whitenoise.middleware.WhiteNoiseMiddleware",
+    "config.middleware.AsyncWhiteNoiseMiddleware",  # WhiteNoise, também em modo async
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
+    "config.middleware.ThrottleMiddleware",        # 429/503 antes do CSRF ler o corpo
     "django.middleware.csrf.CsrfViewMiddleware",   # CSRF ativo por padrão
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
@@ -68,6 +74,16 @@ if DISABLE_CSRF:
     # Requer um middleware seu em config/middleware.py que ignore a checagem.
     MIDDLEWARE.insert(idx, "config.middleware.DisableCSRFMiddleware")
 
+# --- Instrumentação (config.middleware.InstrumentationMiddleware) ---
+# Requisições acima deste tempo vão para o log (logger "config.instrumentation")
+SLOW_REQUEST_MS = int(os.getenv("SLOW_REQUEST_MS", "500"))
+# Header Server-Timing nas respostas (expõe tempos de banco; ligado em DEV por padrão)
+SERVER_TIMING = os.getenv("SERVER_TIMING", "1" if DEBUG else "0") == "1"
+# Se definido, GET /metrics exige "Authorization: Bearer <METRICS_TOKEN>"; sem
+# ele, com DEBUG=0 só clientes em loopback/rede privada (404 para os demais).
+# Com vários workers, defina METRICS_DIR (ver config/metrics.py).
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+
 ROOT_URLCONF = "config.urls"
 
 TEMPLATES = [
@@ -103,16 +119,209 @@ DATABASES = {
     )
 }
 
+# --- Perfil SQLite (vários workers do gunicorn no mesmo arquivo) ---
+# WAL: leitores não bloqueiam o escritor (e vice-versa); busy_timeout: quem
+# encontra o banco travado espera em vez de falhar; synchronous=NORMAL é seguro
+# com WAL (perde no máximo as últimas transações numa queda de energia).
+# Os pragmas são aplicados a cada conexão nova (config.sqlite, connection_created).
+SQLITE_PRAGMAS = {
+    # busy_timeout primeiro: a troca de journal_mode também pode esperar por lock
+    "busy_timeout": int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000")),
+    "journal_mode": os.getenv("SQLITE_JOURNAL_MODE", "wal"),
+    "synchronous": os.getenv("SQLITE_SYNCHRONOUS", "normal"),
+    "mmap_size": int(os.getenv("SQLITE_MMAP_SIZE", str(128 * 1024 * 1024))),  # 128 MB
+    "cache_size": int(os.getenv("SQLITE_CACHE_SIZE", "-32000")),  # negativo = KiB (32 MB)
+    "temp_store": "memory",
+}
+# Alias "readonly": mesmo arquivo, outra conexão com query_only. Com o router
+# (config.routers), leituras fora de transações de escrita vão para ele.
+SQLITE_READONLY_ALIAS = os.getenv("SQLITE_READONLY_ALIAS", "0" if DEBUG else "1") == "1"
+
+_SQLITE_ENGINES = ("django.db.backends.sqlite3", "config.sqlite")
+
+
+def _read_only(db):
+    """Alias só de leitura a partir da configuração de um banco (réplica ou o próprio default)."""
+    db = {**db, "TEST": {"MIRROR": "default"}}
+    if db["ENGINE"] in _SQLITE_ENGINES:
+        db.update({
+            "ENGINE": "config.sqlite",
+            "PRAGMAS": {**SQLITE_PRAGMAS, "query_only": 1},
+            "TRANSACTION_MODE": "DEFERRED",
+        })
+    elif db["ENGINE"] == "django.db.backends.postgresql":
+        db["OPTIONS"] = {**db.get("OPTIONS", {}), "options": "-c default_transaction_read_only=on"}
+    return db
+
+
+if DATABASES["default"]["ENGINE"] in _SQLITE_ENGINES:
+    DATABASES["default"].update({
+        "ENGINE": "config.sqlite",
+        "PRAGMAS": SQLITE_PRAGMAS,
+        # Escritas pegam o lock no BEGIN e esperam o busy_timeout (sem "database is locked")
+        "TRANSACTION_MODE": os.getenv("SQLITE_TRANSACTION_MODE", "IMMEDIATE"),
+    })
+
+# --- Réplicas de leitura (config.routers.ReplicaRouter) ---
+# DATABASE_REPLICA_URLS="postgres://u:p@replica1:5432/db,postgres://u:p@replica2:5432/db"
+# Leituras vão para uma réplica sorteada; escritas, migrações e transações, para
+# o default. Local: DATABASE_REPLICA_URLS=sqlite:///.../replica.sqlite3 e
+# `manage.py sync_sqlite_replica --loop` copiando o default para ela.
+_replica_urls = [u.strip() for u in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if u.strip()]
+for _i, _url in enumerate(_replica_urls, 1):
+    DATABASES[f"replica{_i}"] = _read_only(dj_database_url.parse(_url, conn_max_age=600))
+DATABASE_READ_ALIASES = [f"replica{i}" for i in range(1, len(_replica_urls) + 1)]
+
+# Sem réplicas: conexão query_only no mesmo arquivo SQLite (não há atraso de réplica)
+if not DATABASE_READ_ALIASES and SQLITE_READONLY_ALIAS and DATABASES["default"]["ENGINE"] == "config.sqlite":
+    DATABASES["readonly"] = _read_only(DATABASES["default"])
+    DATABASE_READ_ALIASES = ["readonly"]
+
+# Depois de uma escrita, o cliente lê do default por este tempo (cobre o atraso
+# das réplicas: o autor vê o próprio post/edição/exclusão). 0 desliga.
+DATABASE_PIN_SECONDS = int(os.getenv("DATABASE_PIN_SECONDS", "10"))
+DATABASE_ROUTERS = ["config.routers.ReplicaRouter"]
+
+# -----------------------------------------------------------------------------
+# Cache
+# -----------------------------------------------------------------------------
+# CACHE_BACKEND=locmem (padrão em DEV, por processo) | file (padrão com DEBUG=0:
+# compartilhado entre workers do gunicorn na mesma máquina) | redis
+# (CACHE_LOCATION=redis://host:6379/0). Versões da timeline/cards, sessões e
+# limites só valem para todos os workers num cache compartilhado: o gunicorn
+# recusa locmem com mais de um worker (config/gunicorn.py).
+# MAX_ENTRIES limita o tamanho; ao atingir, 1/CULL_FREQUENCY das entradas é despejado.
+_cache_backends = {
+    "locmem": "django.core.cache.backends.locmem.LocMemCache",
+    "file": "django.core.cache.backends.filebased.FileBasedCache",
+    "redis": "django.core.cache.backends.redis.RedisCache",
+}
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "locmem" if DEBUG else "file")
+CACHE_SHARED = CACHE_BACKEND != "locmem"
+# Produção com locmem: cada processo veria só o próprio cache
+_CACHE_PER_WORKER = not CACHE_SHARED and not DEBUG
+_cache_locations = {
+    "locmem": "minitwitter",
+    "file": str(BASE_DIR / ".django_cache"),
+    "redis": "redis://127.0.0.1:6379/0",
+}
+CACHES = {
+    "default": {
+        "BACKEND": _cache_backends[CACHE_BACKEND],
+        "LOCATION": os.getenv("CACHE_LOCATION", _cache_locations[CACHE_BACKEND]),
+        "TIMEOUT": int(os.getenv("CACHE_TIMEOUT", "300")),
+    }
+}
+if CACHE_BACKEND in ("locmem", "file"):
+    CACHES["default"]["OPTIONS"] = {
+        "MAX_ENTRIES": int(os.getenv("CACHE_MAX_ENTRIES", "5000")),
+        "CULL_FREQUENCY": int(os.getenv("CACHE_CULL_FREQUENCY", "3")),
+    }
+
+# Tempo de vida dos fragmentos HTML dos cards de post (invalidados por signals)
+POST_CARD_CACHE_TIMEOUT = int(os.getenv("POST_CARD_CACHE_TIMEOUT", "3600"))
+
+# Cache de página inteira para leitores anônimos (timeline e detalhe)
+PAGE_CACHE_TIMEOUT = int(os.getenv("PAGE_CACHE_TIMEOUT", "600"))
+
 # -----------------------------------------------------------------------------
 # Autenticação / Senhas
 # -----------------------------------------------------------------------------
 # Para o seu trabalho, sem validadores "chatos".
 AUTH_PASSWORD_VALIDATORS = []
 
+# --- Limites do caminho de escrita (config.throttle, ThrottleMiddleware) ---
+# Token bucket por view (nome da URL) e escopo: user | ip | endpoint (todos somados).
+# Sobrescreva com THROTTLE_<VIEW>_<ESCOPO>, ex.: THROTTLE_LOGIN_IP=20/m ("0" desliga).
+THROTTLE_ENABLED = os.getenv("THROTTLE_ENABLED", "1") == "1"
+if THROTTLE_ENABLED and _CACHE_PER_WORKER:
+    # Baldes e vagas por processo: cada limite valeria N vezes (N = workers)
+    raise ImproperlyConfigured("THROTTLE_ENABLED=1 com DEBUG=0 pede CACHE_BACKEND=file ou redis.")
+_throttle_defaults = {
+    "login": {"ip": "10/m", "endpoint": "120/m"},
+    "signup": {"ip": "5/h", "endpoint": "30/m"},
+    "password_reset": {"ip": "5/h", "endpoint": "30/m"},
+    "posts:create": {"user": "20/m", "ip": "60/m"},
+    "posts:update": {"user": "30/m"},
+}
+THROTTLE_RATES = {
+    view: {
+        scope: os.getenv(f"THROTTLE_{view.split(':')[-1].upper()}_{scope.upper()}", rate)
+        for scope, rate in scopes.items()
+    }
+    for view, scopes in _throttle_defaults.items()
+}
+# Taxa malformada falha aqui, no start, e não com 500 em cada POST da view
+for _view, _scopes in THROTTLE_RATES.items():
+    for _scope, _rate in _scopes.items():
+        try:
+            parse_rate(_rate)
+        except ValueError as e:
+            raise ImproperlyConfigured(f"THROTTLE_{_view.split(':')[-1].upper()}_{_scope.upper()}: {e}")
+# Vagas simultâneas por grupo: hash de senha (PBKDF2) e gravação com anexos.
+# Mantenha abaixo de workers x threads para sobrar capacidade para as leituras.
+THROTTLE_GROUPS = {
+    "login": "auth", "signup": "auth", "password_reset": "auth",
+    "posts:create": "write", "posts:update": "write",
+}
+THROTTLE_CONCURRENCY = {
+    "auth": int(os.getenv("THROTTLE_AUTH_CONCURRENCY", "1")),
+    "write": int(os.getenv("THROTTLE_WRITE_CONCURRENCY", "2")),
+}
+# Vaga de um worker que morreu no meio da requisição expira sozinha (~ TIMEOUT do gunicorn)
+THROTTLE_SLOT_TIMEOUT = int(os.getenv("THROTTLE_SLOT_TIMEOUT", "120"))
+# Proxies reversos confiáveis na frente do app (X-Forwarded-For); 0 = REMOTE_ADDR
+THROTTLE_PROXIES = int(os.getenv("THROTTLE_PROXIES", "0"))
+
 LOGIN_URL = "login"
 LOGIN_REDIRECT_URL = "posts:list"
 LOGOUT_REDIRECT_URL = "login"
 
+# Usuário logado vem do cache (config.auth.CachedModelBackend), invalidado
+# pelos signals quando o usuário, a senha ou as permissões mudam. O ModelBackend
+# continua na lista: sessões abertas antes guardam o caminho dele e seriam
+# derrubadas (o login errado não passa por ele: um hash de senha só).
+# Em produção com cache por processo (locmem), logout e troca de senha só
+# limpariam o cache de um worker: usuário e sessão voltam a vir do banco.
+AUTHENTICATION_BACKENDS = ["django.contrib.auth.backends.ModelBackend"]
+if not _CACHE_PER_WORKER:
+    AUTHENTICATION_BACKENDS.insert(0, "config.auth.CachedModelBackend")
+AUTH_USER_CACHE_TIMEOUT = int(os.getenv("AUTH_USER_CACHE_TIMEOUT", "300"))
+
+# Sessões: SESSION_MODE=db (uma linha por sessão, SELECT a cada request) |
+# cached_db (padrão com cache compartilhado ou em DEV: lê do cache, grava no
+# cache e no banco) | signed_cookies (sem banco; o logout não invalida cópias
+# antigas do cookie).
+_session_engines = {
+    "db": "django.contrib.sessions.backends.db",
+    "cached_db": "django.contrib.sessions.backends.cached_db",
+    "signed_cookies": "django.contrib.sessions.backends.signed_cookies",
+}
+SESSION_MODE = os.getenv("SESSION_MODE", "db" if _CACHE_PER_WORKER else "cached_db")
+if SESSION_MODE == "cached_db" and _CACHE_PER_WORKER:
+    raise ImproperlyConfigured("SESSION_MODE=cached_db com DEBUG=0 pede CACHE_BACKEND=file ou redis.")
+SESSION_ENGINE = _session_engines[SESSION_MODE]
+SESSION_COOKIE_HTTPONLY = True
+
+# -----------------------------------------------------------------------------
+# Timeline ao vivo (Server-Sent Events em /api/events/, servido só sob ASGI)
+# -----------------------------------------------------------------------------
+# EVENTS_MODE=memory (padrão: eventos só dentro do processo, um worker uvicorn) |
+# redis (pub/sub entre workers/máquinas; requer o pacote redis).
+_events_backends = {
+    "memory": "posts.events.MemoryBackend",
+    "redis": "posts.events.RedisBackend",
+}
+EVENTS_MODE = os.getenv("EVENTS_MODE", "memory")
+EVENTS_BACKEND = _events_backends[EVENTS_MODE]
+EVENTS_REDIS_URL = os.getenv("EVENTS_REDIS_URL", "redis://127.0.0.1:6379/0")
+# Eventos na fila de cada cliente antes de mandá-lo recarregar (memória por conexão)
+EVENTS_CLIENT_BUFFER = int(os.getenv("EVENTS_CLIENT_BUFFER", "16"))
+# Conexões SSE por processo; acima disso responde 503
+EVENTS_MAX_CLIENTS = int(os.getenv("EVENTS_MAX_CLIENTS", "10000"))
+# Comentário ": ping" a cada N segundos mantém proxies e o EventSource conectados
+EVENTS_KEEPALIVE = float(os.getenv("EVENTS_KEEPALIVE", "25"))
+
 # -----------------------------------------------------------------------------
 # i18n / fuso horário
 # -----------------------------------------------------------------------------
@@ -126,21 +335,50 @@ USE_TZ = True
 # -----------------------------------------------------------------------------
 STATIC_URL = "static/"
 STATIC_ROOT = BASE_DIR / "staticfiles"
-STATICFILES_DIRS = [BASE_DIR / "static"]
+# Bundle CSS gerado pelo build_css (o collectstatic roda antes de copiar): ver posts.cssbundle
+ASSETS_DIR = BASE_DIR / "assets"
+ASSETS_BUILD_DIR = ASSETS_DIR / "build"
+STATICFILES_DIRS = [BASE_DIR / "static", ASSETS_BUILD_DIR]
+
+# Bootstrap vendorizado: versionado em assets/vendor/ (baixado se faltar) e conferido pelo SRI.
+# Também é o <link> de fallback enquanto o bundle não foi gerado (dev sem collectstatic).
+CSS_VENDOR_URL = "https://cdn.jsdelivr.net/npm/bootstrap@5.3.8/dist/css/bootstrap.min.css"
+CSS_VENDOR_INTEGRITY = "sha384-sRIl4kxILFvY47J16cr9ZwB07vP4J8+LH7qKQnuqkuIAvNWLzeN8tE5YBujZqJLB"
+# CSS embutido no <head>: o que o topo das páginas usa (navbar, timeline, cards)
+CSS_CRITICAL_TEMPLATES = [
+    "base.html",
+    "posts/post_list.html",
+    "posts/includes/post_card_list.html",
+    "posts/includes/media_filter.html",
+]
+# Classes que só aparecem em tempo de execução (fora de posts/templates e posts/*.py)
+CSS_SAFELIST = [c for c in os.getenv("CSS_SAFELIST", "").split(",") if c]
 
 # Django 5 recomenda STORAGES; mantém WhiteNoise comprimindo e com manifest.
 STORAGES = {
     "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
     "staticfiles": {"BACKEND": "whitenoise.storage.CompressedManifestStaticFilesStorage"},
+    # Anexos endereçados por conteúdo (SHA-256): uploads idênticos são gravados uma vez
+    "attachments": {"BACKEND": "posts.storage.ContentAddressedStorage"},
 }
 
 # Mídia (uploads de usuários)
 MEDIA_URL = "/media/"
 MEDIA_ROOT = BASE_DIR / "media"
 
-# Limites de upload (opcional)
-FILE_UPLOAD_MAX_MEMORY_SIZE = 25 * 1024 * 1024  # 25 MB
-DATA_UPLOAD_MAX_MEMORY_SIZE = 25 * 1024 * 1024  # 25 MB
+# Servir /media/ pelo Django (config.media.serve_media), inclusive com DEBUG=0
+MEDIA_SERVE = os.getenv("MEDIA_SERVE", "1") == "1"
+# Offload para o proxy: "" (gunicorn via sendfile) | "nginx" (X-Accel-Redirect) | "sendfile" (X-Sendfile)
+MEDIA_ACCEL_REDIRECT = os.getenv("MEDIA_ACCEL_REDIRECT", "")
+# Location "internal" do nginx que aponta para MEDIA_ROOT
+MEDIA_ACCEL_PREFIX = os.getenv("MEDIA_ACCEL_PREFIX", "/protected-media/")
+
+# Limites de upload
+# Uploads maiores que isso vão para arquivo temporário em disco em vez de RAM.
+# (Anexos de posts sempre vão para disco: ver posts.uploadhandlers.)
+FILE_UPLOAD_MAX_MEMORY_SIZE = int(2.5 * 1024 * 1024)  # 2.5 MB (padrão do Django)
+# Limite do corpo do request sem contar arquivos (campos de texto)
+DATA_UPLOAD_MAX_MEMORY_SIZE = int(2.5 * 1024 * 1024)  # 2.5 MB
 
 # Tipos permitidos para anexos (usados na validação do form)
 ALLOWED_MEDIA_CONTENT_TYPES = [
@@ -153,6 +391,22 @@ ALLOWED_MEDIA_CONTENT_TYPES = [
 ]
 MAX_UPLOAD_SIZE_BYTES = 25 * 1024 * 1024  # 25 MB
 
+# Larguras (px) das renditions geradas por `manage.py process_renditions`
+ATTACHMENT_RENDITION_WIDTHS = [320, 640, 1280]
+
+# -----------------------------------------------------------------------------
+# Fila de tarefas em segundo plano (posts.jobs / manage.py run_worker)
+# -----------------------------------------------------------------------------
+JOBS_CONCURRENCY = int(os.getenv("JOBS_CONCURRENCY", "2"))      # threads por worker
+JOBS_MAX_ATTEMPTS = int(os.getenv("JOBS_MAX_ATTEMPTS", "5"))
+# Espera antes da 2ª tentativa; dobra a cada falha até JOBS_RETRY_MAX_DELAY
+JOBS_RETRY_BACKOFF = float(os.getenv("JOBS_RETRY_BACKOFF", "10"))
+JOBS_RETRY_MAX_DELAY = float(os.getenv("JOBS_RETRY_MAX_DELAY", "3600"))
+# Job "running" há mais tempo que isso é de um worker que morreu: volta para a fila
+JOBS_LOCK_TIMEOUT = int(os.getenv("JOBS_LOCK_TIMEOUT", "600"))
+# JOBS_EAGER=1: executa no próprio processo após o commit (dev sem worker rodando)
+JOBS_EAGER = os.getenv("JOBS_EAGER", "0") == "1"
+
 # -----------------------------------------------------------------------------
 # E-mail (dev: console)
 # -----------------------------------------------------------------------------
@@ -0,0 +1,17 @@
+"""
+Backend SQLite do projeto (ENGINE "config.sqlite"): o backend padrão do Django
+mais os pragmas de cada alias (DATABASES[alias]["PRAGMAS"]), aplicados a cada
+conexão nova pelo signal connection_created, e BEGIN IMMEDIATE nas transações.
+"""
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+
+@receiver(connection_created)
+def apply_sqlite_pragmas(sender, connection, **kwargs):
+    if connection.vendor != "sqlite":
+        return
+    pragmas = connection.settings_dict.get("PRAGMAS") or {}
+    with connection.cursor() as cursor:
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name} = {value}")
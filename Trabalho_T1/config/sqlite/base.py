@@ -0,0 +1,18 @@
+from django.db.backends.sqlite3 import base
+
+from . import apply_sqlite_pragmas  # noqa: F401  (registra o receiver antes da 1ª conexão)
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """
+    SQLite com modo de transação configurável (DATABASES[alias]["TRANSACTION_MODE"]).
+
+    Com o BEGIN (DEFERRED) padrão, uma transação que lê e depois escreve tenta
+    promover o lock no meio do caminho; se outro processo já escreve, o SQLite
+    devolve "database is locked" na hora, sem respeitar o busy_timeout.
+    BEGIN IMMEDIATE pega o lock de escrita no início e espera na fila.
+    (O Django 5.1 traz isso nativo como OPTIONS["transaction_mode"].)
+    """
+    def _start_transaction_under_autocommit(self):
+        mode = self.settings_dict.get("TRANSACTION_MODE") or "DEFERRED"
+        self.cursor().execute(f"BEGIN {mode}")
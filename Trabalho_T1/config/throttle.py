@@ -0,0 +1,79 @@
+"""
+Limites do caminho de escrita (login, cadastro, reset de senha, novo post).
+
+- Token bucket no cache por view e escopo (THROTTLE_RATES): "user" (usuário
+  logado), "ip" (cliente) e "endpoint" (todos os clientes somados). Uma taxa
+  "10/m" é um balde de 10 fichas que se recompõe a 10 por minuto; sem ficha,
+  429 com Retry-After;
+- vagas de concorrência por grupo (THROTTLE_CONCURRENCY): no máximo N
+  requisições de escrita/hash de senha ao mesmo tempo, 503 para as demais; o
+  resto dos workers fica livre para as leituras.
+
+Tudo roda no process_view do ThrottleMiddleware, antes do CsrfViewMiddleware
+ler o corpo: a requisição barrada não custa parsing de formulário nem PBKDF2.
+Baldes e vagas ficam no cache compartilhado (file/redis) e valem para todos os
+workers; o settings recusa THROTTLE_ENABLED com locmem em produção. get/set sem
+lock: sob corrida passam algumas requisições a mais, o que não muda a ordem de
+grandeza do limite.
+"""
+import math
+import time
+
+from django.core.cache import cache
+
+PERIODS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+
+def parse_rate(rate):
+    """"10/m" -> (10, 60); vazio ou "0" desliga o escopo (None); ValueError se malformada."""
+    if not rate or rate == "0":
+        return None
+    count, _, period = rate.partition("/")
+    if not count.isdigit() or int(count) < 1 or not period.isalpha() or period[:1] not in PERIODS:
+        raise ValueError(f"taxa inválida {rate!r} (use <n>/s|m|h|d, ex.: 10/m; \"0\" desliga)")
+    return int(count), PERIODS[period[:1]]
+
+
+def take(key, rate):
+    """
+    Consome uma ficha do balde `key`. Retorna 0 se passou, ou os segundos até a
+    próxima ficha. O balde cheio não ocupa o cache: a entrada expira quando
+    teria se recomposto por inteiro.
+    """
+    capacity, period = rate
+    refill = capacity / period  # fichas por segundo
+    now = time.time()
+    tokens, updated = cache.get(key, (capacity, now))
+    tokens = min(capacity, tokens + (now - updated) * refill)
+    if tokens < 1:
+        return (1 - tokens) / refill
+    cache.set(key, (tokens - 1, now), math.ceil((capacity - tokens + 1) / refill))
+    return 0
+
+
+def acquire_slot(group, limit, timeout):
+    """
+    Uma das `limit` vagas do grupo (cache.add de uma chave por vaga), ou None.
+    A vaga expira sozinha em `timeout` se o worker morrer sem liberá-la.
+    """
+    for i in range(limit):
+        key = f"throttle:slot:{group}:{i}"
+        if cache.add(key, 1, timeout):
+            return key
+    return None
+
+
+def release_slot(key):
+    cache.delete(key)
+
+
+def client_ip(request, proxies=0):
+    """
+    IP do cliente. Atrás de `proxies` proxies confiáveis, o endereço que o mais
+    externo deles anexou ao X-Forwarded-For (o resto do header é do cliente).
+    """
+    if proxies:
+        forwarded = [ip.strip() for ip in request.META.get("HTTP_X_FORWARDED_FOR", "").split(",") if ip.strip()]
+        if len(forwarded) >= proxies:
+            return forwarded[-proxies]
+    return request.META.get("REMOTE_ADDR", "")
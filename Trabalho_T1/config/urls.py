@@ -2,23 +2,27 @@ from django.contrib import admin
 from django.urls import path, include
 from django.contrib.auth import views as auth_views
 
+from posts.forms import QueuedPasswordResetForm
 from posts.views import PublicLoginView, SignUpView
 
 from django.conf import settings
-from django.conf.urls.static import static
+
+from config.media import serve_media
+from config.metrics import metrics_view
 
 
 urlpatterns = [
     path("admin/", admin.site.urls),
+    path("metrics", metrics_view, name="metrics"),  # Prometheus
 
     # Autenticação
     path("accounts/login/", PublicLoginView.as_view(), name="login"),
     path("accounts/logout/", auth_views.LogoutView.as_view(), name="logout"),
     path("accounts/signup/", SignUpView.as_view(), name="signup"),
 
-    # Recuperação de senha
+    # Recuperação de senha (e-mail enviado pelo run_worker)
     path("password_reset/", auth_views.PasswordResetView.as_view(
-        template_name="registration/password_reset.html"
+        template_name="registration/password_reset.html", form_class=QueuedPasswordResetForm
     ), name="password_reset"),
 
     path("password_reset/done/", auth_views.PasswordResetDoneView.as_view(
@@ -40,5 +44,9 @@ urlpatterns = [
     # App de posts
     path("", include("posts.urls")),
 ]
-if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+# Mídia com suporte a Range/ETag, em dev e em produção (MEDIA_SERVE=0 quando o
+# proxy serve /media/ direto do disco)
+if settings.MEDIA_SERVE:
+    urlpatterns += [
+        path(f"{settings.MEDIA_URL.strip('/')}/<path:path>", serve_media, name="media"),
+    ]
@@ -1,36 +1,45 @@
 #!/usr/bin/env bash
 set -e
 
-# Migrações
-python manage.py migrate --noinput
+# Uso: entrypoint.sh [web|setup|migrate|collectstatic|worker|<comando>]
+#   web (padrão)  -> só sobe o servidor (gunicorn com config/gunicorn.py ou runserver)
+#   setup         -> passo único antes do deploy/scale-out: migrações + superusuário
+#   migrate       -> só as migrações
+#   collectstatic -> estáticos (a imagem de produção já roda no build)
+#   worker        -> fila de jobs (manage.py run_worker)
 
-# Cria superusuário se não existir (usa variáveis ou defaults)
-PY_SUPERUSER_USERNAME="${DJANGO_SUPERUSER_USERNAME:-admin}"
-PY_SUPERUSER_EMAIL="${DJANGO_SUPERUSER_EMAIL:-admin@example.com}"
-PY_SUPERUSER_PASSWORD="${DJANGO_SUPERUSER_PASSWORD:-admin123}"
+setup() {
+  python manage.py migrate --noinput
+  # Cria superusuário se não existir (DJANGO_SUPERUSER_USERNAME/EMAIL/PASSWORD ou defaults)
+  python manage.py ensure_superuser
+}
 
-python manage.py shell <<'PYCODE'
-from django.contrib.auth import get_user_model
-import os
-User = get_user_model()
-u = os.environ.get("DJANGO_SUPERUSER_USERNAME","admin")
-e = os.environ.get("DJANGO_SUPERUSER_EMAIL","admin@example.com")
-p = os.environ.get("DJANGO_SUPERUSER_PASSWORD","admin123")
-if not User.objects.filter(username=u).exists():
-    User.objects.create_superuser(u, e, p)
-    print(f"Superuser '{u}' criado.")
-else:
-    print(f"Superuser '{u}' já existe.")
-PYCODE
-
-# Coleta estáticos (se quiser usar em prod com DEBUG=0)
-if [ "${DEBUG:-1}" = "0" ]; then
-  python manage.py collectstatic --noinput || true
-fi
-
-# Sobe o servidor (padrão: runserver pra casar com seu comando)
-if [ "${USE_GUNICORN:-0}" = "1" ]; then
-  exec gunicorn config.wsgi:application --bind 0.0.0.0:8000 --workers ${WORKERS:-2} --timeout ${TIMEOUT:-120}
-else
-  exec python manage.py runserver 0.0.0.0:8000
-fi
+case "${1:-web}" in
+  setup)
+    setup
+    ;;
+  migrate)
+    exec python manage.py migrate --noinput
+    ;;
+  collectstatic)
+    exec python manage.py collectstatic --noinput
+    ;;
+  worker)
+    exec python manage.py run_worker
+    ;;
+  web)
+    if [ "${USE_GUNICORN:-0}" = "1" ]; then
+      # Métricas de todos os workers do gunicorn somadas em /metrics (config/metrics.py)
+      export METRICS_DIR="${METRICS_DIR:-/tmp/minitwitter-metrics}"
+      rm -rf "$METRICS_DIR" && mkdir -p "$METRICS_DIR"
+      # Perfil de produção: preload, workers pelas CPUs, WORKER_CLASS=sync|gthread|asgi
+      exec gunicorn -c python:config.gunicorn
+    fi
+    # Dev (runserver): mantém a conveniência de migrar a cada start
+    setup
+    exec python manage.py runserver 0.0.0.0:8000
+    ;;
+  *)
+    exec "$@"
+    ;;
+esac
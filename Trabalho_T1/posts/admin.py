@@ -1,5 +1,10 @@
 from django.contrib import admin
-from .models import Post, Attachment
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+from django.utils import timezone
+
+from .models import Post, Attachment, AuthorStats, Job
+from .search import match_subquery
 
 class AttachmentInline(admin.TabularInline):
     model = Attachment
@@ -11,6 +16,36 @@ class PostAdmin(admin.ModelAdmin):
     search_fields = ("author__username", "message")
     list_filter = ("created_at",)
 
+    def get_search_results(self, request, queryset, search_term):
+        """Usa o índice de texto completo em vez de LIKE '%termo%' na tabela toda."""
+        match = match_subquery(search_term)
+        if match is None:
+            return super().get_search_results(request, queryset, search_term)
+        sql, params = match
+        queryset = queryset.filter(
+            Q(pk__in=RawSQL(sql, params)) | Q(author__username=search_term.strip())
+        )
+        return queryset, False
+
 @admin.register(Attachment)
 class AttachmentAdmin(admin.ModelAdmin):
-    list_display = ("id", "post", "content_type", "original_name", "uploaded_at")
+    list_display = ("id", "post", "content_type", "original_name", "renditions_status", "uploaded_at")
+    list_filter = ("renditions_status",)
+
+@admin.register(AuthorStats)
+class AuthorStatsAdmin(admin.ModelAdmin):
+    list_display = ("user", "post_count", "attachment_count")
+    search_fields = ("user__username",)
+    # Mantidos pelos signals / recount_author_stats
+    readonly_fields = ("post_count", "attachment_count")
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ("id", "name", "status", "attempts", "max_attempts", "run_at", "locked_by")
+    list_filter = ("status", "name")
+    readonly_fields = ("attempts", "locked_by", "locked_at", "last_error", "created_at")
+    actions = ["requeue"]
+
+    @admin.action(description="Recolocar na fila")
+    def requeue(self, request, queryset):
+        queryset.exclude(status=Job.RUNNING).update(status=Job.QUEUED, attempts=0, run_at=timezone.now())
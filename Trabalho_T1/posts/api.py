@@ -0,0 +1,171 @@
+"""
+API JSON somente leitura (timeline, detalhe e posts por autor) e o stream SSE
+da timeline ao vivo (/api/events/, alimentado por posts.events).
+
+Views async com o ORM async do Django e sem templates: sob ASGI (uvicorn)
+cada worker atende muitas requisições concorrentes no mesmo event loop.
+"""
+import asyncio
+import hashlib
+import json
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import quote_etag
+from django.views.decorators.http import require_safe
+
+from .cache import atimeline_state
+from .events import RESET, broadcaster, encode, get_backend
+from .models import Post, Attachment
+from .pagination import KeysetPaginator
+
+MAX_LIMIT = 100
+DEFAULT_LIMIT = 20
+
+
+def _queryset():
+    return (
+        Post.objects.select_related("author")
+        .prefetch_related("attachments")
+        .only("id", "message", "created_at", "updated_at", "author__username")
+    )
+
+
+def serialize_post(post):
+    """Representação compacta: chaves curtas e sem campos nulos/vazios."""
+    data = {
+        "id": post.pk,
+        "author": post.author.username,
+        "message": post.message,
+        "created_at": post.created_at.isoformat(),
+    }
+    if post.updated_at != post.created_at:
+        data["updated_at"] = post.updated_at.isoformat()
+    attachments = []
+    for a in post.attachments.all():
+        item = {"url": a.file.url, "type": a.content_type, "kind": a.kind}
+        if a.duration is not None:
+            item["duration"] = round(a.duration, 1)
+        attachments.append(item)
+    if attachments:
+        data["attachments"] = attachments
+    return data
+
+
+def _dumps(data):
+    return json.dumps(data, separators=(",", ":"), ensure_ascii=False)
+
+
+def _json(body, etag=None):
+    response = HttpResponse(body, content_type="application/json")
+    # Sob ASGI a API roda sem middlewares (ver config/asgi.py): header de segurança aqui
+    response["X-Content-Type-Options"] = "nosniff"
+    if etag:
+        response["ETag"] = etag
+    return response
+
+
+def _media(request, queryset):
+    """?media=image|audio|video, como na timeline HTML (MediaFilterMixin)."""
+    kind = request.GET.get("media", "")
+    if not kind:
+        return queryset
+    if kind not in (Attachment.KIND_IMAGE, Attachment.KIND_AUDIO, Attachment.KIND_VIDEO):
+        raise Http404
+    return queryset.with_media(kind)
+
+
+def _limit(request):
+    try:
+        return max(1, min(int(request.GET.get("limit", DEFAULT_LIMIT)), MAX_LIMIT))
+    except ValueError:
+        return DEFAULT_LIMIT
+
+
+async def _page(request, queryset):
+    """
+    Página da timeline em JSON. O corpo serializado fica em cache sob a versão
+    da timeline (a mesma do cache de página HTML, invalidada pelos signals).
+    """
+    version, _ = await atimeline_state()
+    etag = quote_etag(f"api-{version}")
+    not_modified = get_conditional_response(request, etag=etag)
+    if not_modified is not None:
+        return not_modified
+
+    key = f"api:{hashlib.md5(request.get_full_path().encode()).hexdigest()}:{version}"
+    body = await cache.aget(key)
+    if body is None:
+        paginator = KeysetPaginator(queryset, _limit(request))
+        page = await paginator.apage(after=request.GET.get("after"), before=request.GET.get("before"))
+        body = _dumps({
+            "results": [serialize_post(p) for p in page],
+            "next": page.next_cursor,
+            "previous": page.previous_cursor,
+        })
+        await cache.aset(key, body, getattr(settings, "PAGE_CACHE_TIMEOUT", 600))
+    return _json(body, etag)
+
+
+@require_safe
+async def timeline(request):
+    """GET /api/posts/?after=<cursor>&limit=<n>&media=<kind>"""
+    return await _page(request, _media(request, _queryset()))
+
+
+@require_safe
+async def author_posts(request, username):
+    """GET /api/u/<username>/posts/"""
+    # Resolve o id antes: filter(author_id) usa post_author_created_id_idx
+    author_id = await User.objects.filter(username=username).values_list("pk", flat=True).afirst()
+    if author_id is None:
+        raise Http404
+    return await _page(request, _media(request, _queryset().filter(author_id=author_id)))
+
+
+@require_safe
+async def post_detail(request, pk):
+    """GET /api/posts/<pk>/"""
+    try:
+        post = await _queryset().aget(pk=pk)
+    except Post.DoesNotExist:
+        raise Http404
+    return _json(_dumps(serialize_post(post)))
+
+
+async def _event_stream():
+    subscription = broadcaster.subscribe(settings.EVENTS_CLIENT_BUFFER)
+    try:
+        yield b"retry: 5000\n\n"
+        while True:
+            try:
+                message = await asyncio.wait_for(subscription.get(), settings.EVENTS_KEEPALIVE)
+            except asyncio.TimeoutError:
+                yield b": ping\n\n"
+                continue
+            if message is RESET:
+                yield encode("reset", {})
+                return
+            yield message
+    finally:
+        # Desconexão do cliente cancela o gerador (ASGIHandler do Django 5)
+        broadcaster.unsubscribe(subscription)
+
+
+@require_safe
+async def timeline_events(request):
+    """GET /api/events/ — SSE com "post"/"edit" (card em HTML) e "delete"."""
+    if not hasattr(request, "scope"):
+        # Sob WSGI cada conexão prenderia uma thread: 204 faz o EventSource desistir
+        return HttpResponse(status=204)
+    if len(broadcaster.subscribers) >= settings.EVENTS_MAX_CLIENTS:
+        return HttpResponse(status=503, headers={"Retry-After": "30"})
+    await get_backend().start()
+    response = StreamingHttpResponse(_event_stream(), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"  # nginx: não bufferiza o stream
+    response["X-Content-Type-Options"] = "nosniff"
+    return response
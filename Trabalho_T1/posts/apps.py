@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class PostsConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "posts"
+
+    def ready(self):
+        from . import signals, tasks  # noqa: F401  (registra os receivers e as tarefas)
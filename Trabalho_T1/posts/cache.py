@@ -0,0 +1,140 @@
+import hashlib
+import time
+import uuid
+
+from asgiref.sync import sync_to_async
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Max
+from django.http import HttpResponse
+from django.template.loader import render_to_string
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+from django.utils.safestring import mark_safe
+
+from .models import Post
+
+# Variantes de card e o template parcial de cada uma
+CARD_TEMPLATES = {
+    "list": "posts/includes/post_card_list.html",
+    "detail": "posts/includes/post_card_detail.html",
+    "recent": "posts/includes/post_card_recent.html",
+}
+
+
+def _post_version_key(post_id):
+    return f"post:ver:{post_id}"
+
+
+def _author_version_key(author_id):
+    return f"author:ver:{author_id}"
+
+
+def _new_version():
+    # Token aleatório (e não contador): se a chave de versão for despejada do
+    # cache, a próxima leitura gera outro token e nunca reaproveita um fragmento velho.
+    return uuid.uuid4().hex[:12]
+
+
+def bump_post_version(post_id):
+    """Invalida todos os fragmentos renderizados do post."""
+    cache.set(_post_version_key(post_id), _new_version(), None)
+
+
+def bump_author_version(author_id):
+    """Invalida os fragmentos de todos os posts do autor (ex.: troca de username)."""
+    cache.set(_author_version_key(author_id), _new_version(), None)
+
+
+TIMELINE_STATE_KEY = "timeline:state"
+
+
+def bump_timeline_version():
+    """Invalida as páginas cacheadas da timeline e marca o instante da mudança."""
+    cache.set(TIMELINE_STATE_KEY, (_new_version(), time.time()), None)
+
+
+def timeline_state():
+    """(versão, last_modified) da timeline; só consulta o banco com o cache frio."""
+    state = cache.get(TIMELINE_STATE_KEY)
+    if state is None:
+        newest = Post.objects.aggregate(m=Max("updated_at"))["m"]
+        cache.add(TIMELINE_STATE_KEY, (_new_version(), newest.timestamp() if newest else time.time()), None)
+        state = cache.get(TIMELINE_STATE_KEY)
+    return state
+
+
+async def atimeline_state():
+    """timeline_state() para views async: o caminho quente é só um get no cache."""
+    state = await cache.aget(TIMELINE_STATE_KEY)
+    if state is None:
+        state = await sync_to_async(timeline_state)()
+    return state
+
+
+def post_versions(post_id, author_id):
+    """Tokens de versão (post, autor) que compõem as chaves de cache do post."""
+    keys = [_post_version_key(post_id), _author_version_key(author_id)]
+    found = cache.get_many(keys)
+    versions = []
+    for key in keys:
+        if key not in found:
+            # add() evita sobrescrever um token criado por outro worker em paralelo
+            cache.add(key, _new_version(), None)
+            found[key] = cache.get(key)
+        versions.append(found[key])
+    return versions
+
+
+def render_post_card(post, variant="list"):
+    """Renderiza o corpo do card do post, reaproveitando o fragmento em cache."""
+    post_ver, author_ver = post_versions(post.pk, post.author_id)
+    key = f"post:card:{variant}:{post.pk}:{post_ver}:{author_ver}"
+    html = cache.get(key)
+    if html is None:
+        html = render_to_string(CARD_TEMPLATES[variant], {"post": post})
+        cache.set(key, html, getattr(settings, "POST_CARD_CACHE_TIMEOUT", 3600))
+    return mark_safe(html)
+
+
+class AnonymousPageCacheMixin:
+    """
+    Cache da resposta inteira para GETs anônimos, com ETag/Last-Modified.
+    As views definem `page_cache_state()` -> (versão, last_modified) ou None.
+    Usuários autenticados (botões de editar/excluir) sempre renderizam a página.
+    """
+    def page_cache_state(self):
+        return None  # sem estado definido pela view: renderiza sem cache
+
+    def get(self, request, *args, **kwargs):
+        # Mensagens pendentes (cookie do messages framework) também não podem ser cacheadas
+        if request.user.is_authenticated or "messages" in request.COOKIES:
+            return super().get(request, *args, **kwargs)
+        state = self.page_cache_state()
+        if state is None:
+            return super().get(request, *args, **kwargs)
+        version, last_modified = state
+        etag = quote_etag(version)
+        last_modified = int(last_modified)
+
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            path = hashlib.md5(request.get_full_path().encode()).hexdigest()
+            key = f"page:{path}:{version}"
+            cached = cache.get(key)
+            if cached is not None:
+                content, content_type = cached
+                response = HttpResponse(content, content_type=content_type)
+            else:
+                response = super().get(request, *args, **kwargs)
+                if hasattr(response, "render"):
+                    response.render()
+                if response.status_code == 200:
+                    cache.set(key, (response.content, response["Content-Type"]),
+                              getattr(settings, "PAGE_CACHE_TIMEOUT", 600))
+        response.headers.setdefault("ETag", etag)
+        response.headers.setdefault("Last-Modified", http_date(last_modified))
+        patch_cache_control(response, max_age=0, must_revalidate=True)
+        patch_vary_headers(response, ["Cookie"])
+        return response
@@ -0,0 +1,207 @@
+"""
+Bundle CSS servido pelo próprio site (manage.py build_css, rodado pelo collectstatic).
+
+O Bootstrap fica versionado em assets/vendor/ (se faltar, é baixado uma vez
+do CDN e conferido pelo hash SRI de CSS_VENDOR_INTEGRITY) e é combinado com
+static/main.css. Com DEBUG=0 uma falha do build derruba o collectstatic.
+Do resultado saem, em ASSETS_BUILD_DIR (um dos STATICFILES_DIRS):
+
+- css/app.css: só as regras cujos seletores de classe/id aparecem nos
+  templates e no código de posts/ (mesmo extrator do PurgeCSS: qualquer
+  palavra [A-Za-z0-9_-] conta como uso);
+- css/critical.css: o subconjunto usado por CSS_CRITICAL_TEMPLATES,
+  embutido no <head> pelo {% css_bundle %}.
+
+O collectstatic em seguida dá nome com hash (manifest) e gera .gz/.br
+(WhiteNoise); o WhiteNoise serve os nomes com hash com Cache-Control immutable.
+"""
+import base64
+import hashlib
+import re
+import urllib.request
+from pathlib import Path
+
+from django.conf import settings
+
+BUNDLE_NAME = "css/app.css"
+CRITICAL_NAME = "css/critical.css"
+
+TOKEN_RE = re.compile(r"[A-Za-z0-9_-]+")
+# .classe / #id de um seletor, fora de [atributos] e (argumentos)
+SELECTOR_NAME_RE = re.compile(r"[.#](-?[_a-zA-Z][\w-]*)")
+NESTED_AT_RULES = ("@media", "@supports", "@container", "@layer")
+
+
+# ---------------------------
+# Conteúdo que usa as classes
+# ---------------------------
+def content_files():
+    """Templates e módulos Python de posts/ (classes em widgets, JS inline etc.)."""
+    root = Path(settings.BASE_DIR) / "posts"
+    files = sorted((root / "templates").rglob("*.html")) + sorted(root.glob("*.py"))
+    return [f for f in files if f.name != "tests.py"]
+
+
+def used_tokens(files):
+    tokens = set(settings.CSS_SAFELIST)
+    for path in files:
+        tokens.update(TOKEN_RE.findall(Path(path).read_text(encoding="utf-8")))
+    return tokens
+
+
+# ---------------------------
+# Purga
+# ---------------------------
+def _blocks(css):
+    """
+    Itens de um nível do CSS: (prelúdio, corpo) para blocos `x { ... }` e
+    (instrução, None) para `@charset ...;`. Respeita strings e comentários;
+    comentários /*! (licença) no topo viram itens (texto, "").
+    """
+    i, n, start = 0, len(css), 0
+    while i < n:
+        c = css[i]
+        if c == "/" and css.startswith("/*", i):
+            end = css.find("*/", i + 2)
+            end = n if end < 0 else end + 2
+            if css.startswith("/*!", i) and not css[start:i].strip():
+                yield css[i:end], ""
+            css = css[:i] + " " * (end - i) + css[end:]  # apaga o comentário sem mudar os índices
+            i = end
+            start = start if css[start:i].strip() else i
+        elif c in "\"'":
+            i = _skip_string(css, i)
+        elif c == ";":
+            statement = css[start:i].strip()
+            if statement:
+                yield statement, None
+            i = start = i + 1
+        elif c == "{":
+            prelude = css[start:i].strip()
+            depth, j = 1, i + 1
+            while j < n and depth:
+                if css[j] in "\"'":
+                    j = _skip_string(css, j)
+                    continue
+                depth += {"{": 1, "}": -1}.get(css[j], 0)
+                j += 1
+            yield prelude, css[i + 1:j - 1]
+            i = start = j
+        else:
+            i += 1
+
+
+def _skip_string(css, i):
+    quote, j = css[i], i + 1
+    while j < len(css) and css[j] != quote:
+        j += 2 if css[j] == "\\" else 1
+    return j + 1
+
+
+def _split_selectors(prelude):
+    """Separa "a, b:is(c, d)" nas vírgulas de primeiro nível."""
+    parts, depth, start = [], 0, 0
+    for i, c in enumerate(prelude):
+        if c in "([":
+            depth += 1
+        elif c in ")]":
+            depth -= 1
+        elif c == "," and depth == 0:
+            parts.append(prelude[start:i].strip())
+            start = i + 1
+    parts.append(prelude[start:].strip())
+    return parts
+
+
+def _strip_groups(selector):
+    # Remove [atributos] e (argumentos): :not(.x) casa justamente quando .x não é usado
+    out, depth = [], 0
+    for c in selector:
+        if c in "([":
+            depth += 1
+        elif c in ")]":
+            depth -= 1
+        elif depth == 0:
+            out.append(c)
+    return "".join(out)
+
+
+def selector_used(selector, used):
+    return all(name in used for name in SELECTOR_NAME_RE.findall(_strip_groups(selector)))
+
+
+def purge(css, used):
+    """CSS só com os seletores cujas classes/ids estão em `used` (e os @keyframes referenciados)."""
+    out, keyframes = [], []
+    for prelude, body in _blocks(css):
+        if body is None:
+            out.append(prelude + ";")
+        elif body == "" and prelude.startswith("/*!"):
+            out.append(prelude)
+        elif prelude.startswith("@"):
+            name = prelude.split(None, 1)[0].lower()
+            if name in NESTED_AT_RULES:
+                inner = purge(body, used)
+                if inner:
+                    out.append(f"{prelude}{{{inner}}}")
+            elif name.endswith("keyframes"):
+                keyframes.append((prelude.split(None, 1)[1].strip(), f"{prelude}{{{body}}}"))
+            else:
+                out.append(f"{prelude}{{{body}}}")  # @font-face, @page...
+        else:
+            selectors = [s for s in _split_selectors(prelude) if selector_used(s, used)]
+            if selectors:
+                out.append(f"{','.join(selectors)}{{{body.strip()}}}")
+    text = "".join(out)
+    # Animações só se alguma regra mantida ainda usa o nome
+    text += "".join(rule for name, rule in keyframes if re.search(rf"\b{re.escape(name)}\b", text))
+    return text
+
+
+# ---------------------------
+# Fonte (Bootstrap vendorizado) e build
+# ---------------------------
+def vendor_path():
+    name = settings.CSS_VENDOR_URL.rstrip("/").rsplit("/", 1)[-1]
+    version = re.search(r"@([\w.-]+)/", settings.CSS_VENDOR_URL)
+    stem, suffix = name.split(".", 1)
+    return Path(settings.ASSETS_DIR) / "vendor" / (f"{stem}-{version.group(1)}.{suffix}" if version else name)
+
+
+def check_integrity(data, integrity):
+    """Confere o conteúdo contra um hash SRI ("sha384-<base64>")."""
+    algorithm, _, expected = integrity.partition("-")
+    digest = base64.b64encode(hashlib.new(algorithm, data).digest()).decode()
+    return digest == expected
+
+
+def vendor_css():
+    """Bootstrap de assets/vendor/; baixa (e confere o SRI) só na primeira vez."""
+    path = vendor_path()
+    if not path.exists():
+        with urllib.request.urlopen(settings.CSS_VENDOR_URL, timeout=30) as response:
+            data = response.read()
+        if not check_integrity(data, settings.CSS_VENDOR_INTEGRITY):
+            raise ValueError(f"{settings.CSS_VENDOR_URL} não confere com CSS_VENDOR_INTEGRITY.")
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(data)
+    return path.read_text(encoding="utf-8")
+
+
+def build(source=None):
+    """Gera app.css e critical.css em ASSETS_BUILD_DIR; devolve {nome: bytes}."""
+    css = Path(source).read_text(encoding="utf-8") if source else vendor_css()
+    css += "\n" + (Path(settings.BASE_DIR) / "static" / "main.css").read_text(encoding="utf-8")
+
+    templates = Path(settings.BASE_DIR) / "posts" / "templates"
+    outputs = {
+        BUNDLE_NAME: purge(css, used_tokens(content_files())),
+        CRITICAL_NAME: purge(css, used_tokens(templates / t for t in settings.CSS_CRITICAL_TEMPLATES)),
+    }
+    sizes = {}
+    for name, text in outputs.items():
+        path = Path(settings.ASSETS_BUILD_DIR) / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(text, encoding="utf-8")
+        sizes[name] = len(text.encode())
+    return sizes
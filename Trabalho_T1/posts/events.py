@@ -0,0 +1,172 @@
+"""
+Pub/sub da timeline ao vivo (Server-Sent Events em /api/events/, só sob ASGI).
+
+Os signals de Post publicam depois do commit um evento já codificado em SSE:
+"post" (novo) ou "edit" (editado), com o card renderizado uma vez e
+compartilhado por todos os clientes, ou "delete". Cada processo ASGI tem um Broadcaster com a
+fila de cada cliente conectado; o backend leva o evento até os broadcasters:
+
+- MemoryBackend (padrão): só o próprio processo (um worker uvicorn);
+- RedisBackend: PUBLISH em um canal; cada processo mantém UMA assinatura e
+  reparte localmente (vários workers/máquinas). Requer o pacote redis.
+
+Memória por cliente limitada: até EVENTS_CLIENT_BUFFER eventos na fila (os
+bytes são os mesmos para todos); um cliente lento demais recebe "reset" e
+recarrega a página em vez de acumular eventos.
+"""
+import asyncio
+import functools
+import json
+import logging
+
+from django.conf import settings
+from django.template.loader import render_to_string
+from django.utils.module_loading import import_string
+
+from .models import Post
+
+logger = logging.getLogger(__name__)
+
+# Marcador na fila: o cliente perdeu eventos e deve recarregar
+RESET = object()
+
+
+def encode(event, data):
+    """Mensagem SSE pronta para envio: nome do evento + uma linha de JSON compacto."""
+    payload = json.dumps(data, separators=(",", ":"), ensure_ascii=False)
+    return f"event: {event}\ndata: {payload}\n\n".encode()
+
+
+class Subscription:
+    """Fila limitada de um cliente SSE."""
+    __slots__ = ("queue",)
+
+    def __init__(self, size):
+        self.queue = asyncio.Queue(size)
+
+    def push(self, message):
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            # Cliente lento: descarta o acumulado e pede recarga (memória limitada)
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(RESET)
+
+    async def get(self):
+        return await self.queue.get()
+
+
+class Broadcaster:
+    """Clientes SSE conectados neste processo (todos no mesmo event loop)."""
+    def __init__(self):
+        self.subscribers = set()
+        self.loop = None
+
+    def subscribe(self, size):
+        self.loop = asyncio.get_running_loop()
+        subscription = Subscription(size)
+        self.subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        self.subscribers.discard(subscription)
+
+    def fanout(self, message):
+        """Entrega local; roda no event loop."""
+        for subscription in list(self.subscribers):
+            subscription.push(message)
+
+    def deliver(self, message):
+        """Entrega a partir de qualquer thread (os signals rodam fora do event loop)."""
+        if self.loop is None or not self.subscribers:
+            return
+        try:
+            self.loop.call_soon_threadsafe(self.fanout, message)
+        except RuntimeError:
+            pass  # loop encerrado (fim do processo)
+
+
+broadcaster = Broadcaster()
+
+
+# ---------------------------
+# Backends
+# ---------------------------
+class MemoryBackend:
+    """Eventos só dentro do processo: suficiente com um único worker ASGI."""
+    def __init__(self, broadcaster):
+        self.broadcaster = broadcaster
+
+    def has_listeners(self):
+        return bool(self.broadcaster.subscribers)
+
+    def publish(self, message):
+        self.broadcaster.deliver(message)
+
+    async def start(self):
+        pass
+
+
+class RedisBackend:
+    """Eventos entre processos via Redis pub/sub (EVENTS_REDIS_URL)."""
+    channel = "minitwitter:timeline"
+
+    def __init__(self, broadcaster):
+        import redis  # opcional (redis>=5): só exigido com EVENTS_MODE=redis
+        from redis import asyncio as aioredis
+        self.redis, self.aioredis = redis, aioredis
+        self.broadcaster = broadcaster
+        self.url = settings.EVENTS_REDIS_URL
+        self.client = None
+        self.listener = None
+
+    def has_listeners(self):
+        return True  # os clientes podem estar em outros processos
+
+    def publish(self, message):
+        if self.client is None:
+            self.client = self.redis.Redis.from_url(self.url)
+        self.client.publish(self.channel, message)
+
+    async def start(self):
+        # Uma assinatura por processo, criada com o primeiro cliente (e recriada se cair)
+        if self.listener is None or self.listener.done():
+            self.listener = asyncio.create_task(self.listen())
+
+    async def listen(self):
+        client = self.aioredis.Redis.from_url(self.url)
+        try:
+            async with client.pubsub() as pubsub:
+                await pubsub.subscribe(self.channel)
+                async for item in pubsub.listen():
+                    if item["type"] == "message":
+                        self.broadcaster.fanout(item["data"])
+        except Exception:
+            logger.exception("Assinatura Redis da timeline caiu; recria no próximo cliente")
+        finally:
+            await client.aclose()
+
+
+@functools.cache
+def get_backend():
+    return import_string(settings.EVENTS_BACKEND)(broadcaster)
+
+
+def publish_post(event, post_id):
+    """Publica "post"/"edit" (card renderizado) ou "delete"; chamado pelos signals no on_commit."""
+    backend = get_backend()
+    if not backend.has_listeners():
+        return  # ninguém conectado: nem renderiza
+    if event == "delete":
+        message = encode("delete", {"id": post_id})
+    else:
+        post = (
+            Post.objects.select_related("author").prefetch_related("attachments__renditions")
+            .filter(pk=post_id).first()
+        )
+        if post is None:
+            return
+        html = render_to_string("posts/includes/post_live.html", {"post": post})
+        message = encode(event, {"id": post_id, "html": html})
+    backend.publish(message)
@@ -0,0 +1,189 @@
+"""
+Feeds Atom e JSON Feed (1.1) da timeline e de cada autor, para leitores de
+feed e bots que antes raspavam o HTML.
+
+- ?since_id=<id>: só posts com id maior (range scan na chave primária), do
+  mais antigo para o mais novo em blocos de FEED_LIMIT: o cliente guarda o
+  maior id recebido e nunca perde posts, mesmo depois de muito tempo offline;
+- ETag/If-None-Match e Last-Modified pela versão da timeline (a mesma do cache
+  de páginas, trocada pelos signals): poll sem mudanças responde 304 sem
+  nenhuma query (no feed de autor, só a busca do autor, para o 404 valer);
+- corpo serializado em cache sob essa versão, com chave pelo host, caminho e
+  since_id (outros parâmetros da query string não geram entradas novas): só é
+  gerado de novo quando algum post muda.
+"""
+import hashlib
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.http import Http404
+from django.urls import reverse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.feedgenerator import Atom1Feed, Enclosure
+from django.utils.http import http_date, quote_etag
+from django.utils.text import Truncator
+from django.views.decorators.http import require_safe
+
+from .api import _dumps, _json, _queryset
+from .cache import atimeline_state
+
+FEED_LIMIT = 50
+FEED_TITLE = "MiniTwitter"
+
+
+def _since_id(request):
+    value = request.GET.get("since_id", "")
+    if not value:
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        raise Http404("since_id inválido.")
+
+
+async def _fetch(queryset, since_id):
+    if since_id is None:
+        # Feed completo: os mais recentes (post_created_id_idx)
+        return [p async for p in queryset[:FEED_LIMIT]]
+    # Incremental: o bloco mais antigo acima de since_id, exibido do mais novo ao mais antigo
+    posts = [p async for p in queryset.filter(pk__gt=since_id).order_by("id")[:FEED_LIMIT]]
+    return posts[::-1]
+
+
+def _feed_url(request, since_id):
+    """URL canônica do feed: só o parâmetro que muda o conteúdo."""
+    query = "" if since_id is None else f"?since_id={since_id}"
+    return request.build_absolute_uri(request.path + query)
+
+
+def _size(attachment):
+    # os.stat por anexo: os renderizadores rodam fora do event loop (sync_to_async)
+    try:
+        return attachment.file.size
+    except OSError:
+        return 0
+
+
+def _atom(request, posts, title, home_url, feed_url):
+    feed = Atom1Feed(
+        title=title, link=home_url, description="",
+        feed_url=feed_url, language=settings.LANGUAGE_CODE,
+    )
+    for post in posts:
+        feed.add_item(
+            title=Truncator(post.message).chars(60),
+            link=request.build_absolute_uri(reverse("posts:detail", args=[post.pk])),
+            description=post.message,
+            pubdate=post.created_at,
+            updateddate=post.updated_at,
+            author_name=post.author.username,
+            author_link=request.build_absolute_uri(reverse("posts:author", args=[post.author.username])),
+            enclosures=[
+                Enclosure(request.build_absolute_uri(a.file.url), str(_size(a)), a.content_type)
+                for a in post.attachments.all()
+            ],
+        )
+    return feed.writeString("utf-8")
+
+
+def _json_feed(request, posts, title, home_url, feed_url):
+    items = []
+    for post in posts:
+        item = {
+            "id": str(post.pk),
+            "url": request.build_absolute_uri(reverse("posts:detail", args=[post.pk])),
+            "content_text": post.message,
+            "date_published": post.created_at.isoformat(),
+            "authors": [{
+                "name": post.author.username,
+                "url": request.build_absolute_uri(reverse("posts:author", args=[post.author.username])),
+            }],
+        }
+        if post.updated_at != post.created_at:
+            item["date_modified"] = post.updated_at.isoformat()
+        attachments = [
+            {"url": request.build_absolute_uri(a.file.url), "mime_type": a.content_type,
+             "size_in_bytes": _size(a)}
+            for a in post.attachments.all()
+        ]
+        if attachments:
+            item["attachments"] = attachments
+        items.append(item)
+    return _dumps({
+        "version": "https://jsonfeed.org/version/1.1",
+        "title": title,
+        "home_page_url": home_url,
+        "feed_url": feed_url,
+        "language": settings.LANGUAGE_CODE,
+        "items": items,
+    })
+
+
+FORMATS = {
+    "atom": (_atom, "application/atom+xml; charset=utf-8"),
+    "json": (_json_feed, "application/feed+json"),
+}
+
+
+async def _feed(request, fmt, username=None):
+    since_id = _since_id(request)
+    author_id = None
+    if username is not None:
+        # Antes do 304: autor inexistente é 404 mesmo com um If-None-Match que casa
+        author_id = await User.objects.filter(username=username).values_list("pk", flat=True).afirst()
+        if author_id is None:
+            raise Http404
+    version, last_modified = await atimeline_state()
+    etag = quote_etag(f"feed-{version}")
+    last_modified = int(last_modified)
+    # Sem query de posts: o 304 sai só com o estado da timeline (cache)
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        # O host entra na chave (o corpo contém links absolutos); a query string, só since_id
+        feed_url = _feed_url(request, since_id)
+        key = f"feed:{hashlib.md5(feed_url.encode()).hexdigest()}:{version}"
+        body = await cache.aget(key)
+        if body is None:
+            queryset = _queryset()
+            if author_id is None:
+                title, home_url = FEED_TITLE, request.build_absolute_uri(reverse("posts:list"))
+            else:
+                queryset = queryset.filter(author_id=author_id)
+                title = f"@{username} · {FEED_TITLE}"
+                home_url = request.build_absolute_uri(reverse("posts:author", args=[username]))
+            render, _ = FORMATS[fmt]
+            posts = await _fetch(queryset, since_id)
+            body = await sync_to_async(render)(request, posts, title, home_url, feed_url)
+            await cache.aset(key, body, settings.PAGE_CACHE_TIMEOUT)
+        response = _json(body)
+        response["Content-Type"] = FORMATS[fmt][1]
+    response.headers.setdefault("ETag", etag)
+    response.headers.setdefault("Last-Modified", http_date(last_modified))
+    patch_cache_control(response, max_age=0, must_revalidate=True)
+    return response
+
+
+@require_safe
+async def timeline_atom(request):
+    """GET /api/feed.atom?since_id=<id>"""
+    return await _feed(request, "atom")
+
+
+@require_safe
+async def timeline_json(request):
+    """GET /api/feed.json?since_id=<id>"""
+    return await _feed(request, "json")
+
+
+@require_safe
+async def author_atom(request, username):
+    """GET /api/u/<username>/feed.atom"""
+    return await _feed(request, "atom", username)
+
+
+@require_safe
+async def author_json(request, username):
+    """GET /api/u/<username>/feed.json"""
+    return await _feed(request, "json", username)
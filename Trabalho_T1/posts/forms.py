@@ -1,10 +1,11 @@
 from django import forms
-from django.contrib.auth.forms import UserCreationForm
+from django.contrib.auth.forms import PasswordResetForm, UserCreationForm
 from django.contrib.auth.models import User
-from django.forms import inlineformset_factory
+from django.forms import BaseInlineFormSet, inlineformset_factory
 from django.conf import settings
 
 
+from .jobs import enqueue
 from .models import Post, Attachment
 
 class PostForm(forms.ModelForm):
@@ -37,34 +38,78 @@ class SignUpForm(UserCreationForm):
         self.fields["password1"].widget.attrs.update({"placeholder": "Senha"})
         self.fields["password2"].widget.attrs.update({"placeholder": "Confirme a senha"})
 
+class QueuedPasswordResetForm(PasswordResetForm):
+    """Deixa a renderização e o envio do e-mail de recuperação para o worker."""
+    def send_mail(self, subject_template_name, email_template_name, context, from_email, to_email,
+                  html_email_template_name=None):
+        # O job guarda só o id do usuário: o link com o token é gerado no worker, na hora
+        # do envio, e nunca fica no payload (nem em jobs falhos no admin)
+        user = context["user"]
+        context = {k: v for k, v in context.items() if k not in ("user", "uid", "token")}
+        enqueue(
+            "mail.password_reset", user_id=user.pk, to=to_email, context=context,
+            subject_template_name=subject_template_name, email_template_name=email_template_name,
+            html_email_template_name=html_email_template_name, from_email=from_email,
+        )
+
 class AttachmentForm(forms.ModelForm):
     """Formulário para anexos de mídia (imagens, áudio, vídeo)."""
     class Meta:
-        """Define o modelo, campos, widgets e validações do formulário de anexos."""
+        """Define o modelo, campos e widgets do formulário de anexos."""
         model = Attachment
         fields = ["file"]
         widgets = {
             "file": forms.ClearableFileInput(attrs={"accept": "image/*,audio/*,video/*"})
         }
 
-        def clean_file(self):
-            """Valida tamanho e tipo do arquivo."""
-            f = self.cleaned_data.get("file")
-            if not f:
-                return f
-            if f.size > getattr(settings, "MAX_UPLOAD_SIZE_BYTES", 25 * 1024 * 1024):
-                raise forms.ValidationError("Arquivo excede o tamanho máximo permitido.")
-            content_type = getattr(f, "content_type", None)
-            if content_type and content_type not in getattr(settings, "ALLOWED_MEDIA_CONTENT_TYPES", []):
-                raise forms.ValidationError("Tipo de arquivo não permitido.")
+    def __init__(self, *args, upload_error=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Motivo da rejeição pelo upload handler (o arquivo nem chega em self.files)
+        self.upload_error = upload_error
+
+    def has_changed(self):
+        # Form extra vazio é ignorado pelo formset; com erro de upload ele precisa validar
+        return bool(self.upload_error) or super().has_changed()
+
+    def full_clean(self):
+        super().full_clean()
+        if self.upload_error:
+            # Substitui o "campo obrigatório": o arquivo foi descartado durante o upload
+            self._errors["file"] = self.error_class([self.upload_error])
+            self.cleaned_data.pop("file", None)
+
+    def clean_file(self):
+        """Valida tamanho e tipo do arquivo."""
+        f = self.cleaned_data.get("file")
+        if not f:
             return f
+        if f.size > getattr(settings, "MAX_UPLOAD_SIZE_BYTES", 25 * 1024 * 1024):
+            raise forms.ValidationError("Arquivo excede o tamanho máximo permitido.")
+        content_type = getattr(f, "content_type", None)
+        if content_type and content_type not in getattr(settings, "ALLOWED_MEDIA_CONTENT_TYPES", []):
+            raise forms.ValidationError("Tipo de arquivo não permitido.")
+        if content_type:
+            # Tipo já validado (detectado pelos magic bytes no upload handler)
+            self.instance.content_type = content_type
+        return f
+
+class BaseAttachmentFormSet(BaseInlineFormSet):
+    """Repassa a cada form os erros registrados pelo StreamingAttachmentUploadHandler."""
+    def __init__(self, *args, upload_errors=None, **kwargs):
+        self.upload_errors = upload_errors or {}
+        super().__init__(*args, **kwargs)
+
+    def _construct_form(self, i, **kwargs):
+        kwargs["upload_error"] = self.upload_errors.get(f"{self.add_prefix(i)}-file")
+        return super()._construct_form(i, **kwargs)
 
 # Formset: até 1 anexo por submissão (pode aumentar o 'extra')
 AttachmentFormSet = inlineformset_factory(
     Post,
     Attachment,
     form=AttachmentForm,
+    formset=BaseAttachmentFormSet,
     fields=["file"],
     extra=1,
     can_delete=True,
-)
\ No newline at end of file
+)
@@ -0,0 +1,274 @@
+"""
+Fila de tarefas em segundo plano guardada no banco (modelo Job).
+
+As views chamam enqueue("nome", **payload) e respondem logo; `manage.py
+run_worker` reserva os jobs prontos e executa as funções registradas com
+@task. O job é gravado na mesma transação da requisição: se ela for desfeita,
+o job some junto (nunca roda sobre dados que não existem).
+
+Reserva: no Postgres, SELECT ... FOR UPDATE SKIP LOCKED (workers pegam lotes
+diferentes sem esperar uns pelos outros); no SQLite, sem lock de linha, um
+UPDATE condicional por id (como renditions.claim_pending) garante que só um
+worker muda o job de "queued" para "running". Falhas voltam para a fila com
+backoff exponencial até max_attempts. Enquanto roda, o job renova locked_at a
+cada JOBS_LOCK_TIMEOUT/3 segundos (heartbeat); sem renovação por
+JOBS_LOCK_TIMEOUT segundos o worker morreu, e o job volta para a fila (e o
+on_stale da tarefa desfaz o estado que ela deixou no meio, ex.: anexo
+"processing").
+"""
+import logging
+import os
+import random
+import socket
+import threading
+import time
+import traceback
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+from django.db.models import Count, F, Min
+from django.utils import timezone
+
+from config.metrics import registry
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+# nome -> função (preenchido por @task ao importar posts.tasks)
+TASKS = {}
+
+
+def task(name, max_attempts=None, on_stale=None):
+    """
+    Registra a função como tarefa; o payload do job vira os kwargs da chamada.
+    `on_stale(**payload)` roda quando um job do worker que morreu é recuperado.
+    """
+    def decorator(func):
+        func.task_name = name
+        func.max_attempts = max_attempts
+        func.on_stale = on_stale
+        TASKS[name] = func
+        return func
+    return decorator
+
+
+def enqueue(name, /, delay=0, **payload):
+    """Grava um job (payload precisa ser serializável em JSON). Retorna o Job."""
+    func = TASKS.get(name)
+    if func is None:
+        raise LookupError(f"Tarefa desconhecida: {name}")
+    job = Job.objects.create(
+        name=name, payload=payload,
+        run_at=timezone.now() + timedelta(seconds=delay),
+        max_attempts=func.max_attempts or settings.JOBS_MAX_ATTEMPTS,
+    )
+    if settings.JOBS_EAGER:
+        # Dev sem worker: executa no próprio processo, depois do commit
+        transaction.on_commit(lambda: _run_eager(job.pk))
+    return job
+
+
+def _run_eager(pk):
+    job = claim(1, "eager", pk=pk)
+    if job:
+        execute(job[0])
+
+
+# ---------------------------
+# Reserva e execução
+# ---------------------------
+def claim(limit, worker_id, **filters):
+    """Reserva até `limit` jobs prontos para este worker (status -> running)."""
+    now = timezone.now()
+    ready = Job.objects.filter(status=Job.QUEUED, run_at__lte=now, **filters).order_by("run_at", "id")
+    lock = {"status": Job.RUNNING, "locked_by": worker_id, "locked_at": now, "attempts": F("attempts") + 1}
+    # atomic: com o ReplicaRouter as leituras também vão para o primário
+    with transaction.atomic():
+        if connection.features.has_select_for_update_skip_locked:
+            ids = list(ready.select_for_update(skip_locked=True).values_list("id", flat=True)[:limit])
+            Job.objects.filter(pk__in=ids).update(**lock)
+        else:
+            ids = [
+                pk for pk in ready.values_list("id", flat=True)[:limit]
+                if Job.objects.filter(pk=pk, status=Job.QUEUED).update(**lock)
+            ]
+    return list(Job.objects.filter(pk__in=ids))
+
+
+def retry_delay(attempts):
+    """Backoff exponencial com jitter: base, 2*base, 4*base... até JOBS_RETRY_MAX_DELAY."""
+    delay = min(settings.JOBS_RETRY_BACKOFF * 2 ** (attempts - 1), settings.JOBS_RETRY_MAX_DELAY)
+    return delay * random.uniform(0.9, 1.1)
+
+
+def _beat(job):
+    """Renova locked_at: o job segue vivo e recover_stale não o devolve à fila."""
+    Job.objects.filter(pk=job.pk, status=Job.RUNNING, locked_by=job.locked_by).update(locked_at=timezone.now())
+
+
+def _heartbeat(job, done):
+    try:
+        while not done.wait(settings.JOBS_LOCK_TIMEOUT / 3):
+            _beat(job)
+    finally:
+        connection.close()  # conexão própria desta thread
+
+
+def execute(job):
+    """Roda um job reservado. Retorna "done", "retry" ou "failed"."""
+    start = time.perf_counter()
+    done = threading.Event()
+    heartbeat = threading.Thread(target=_heartbeat, args=(job, done), name=f"heartbeat-{job.pk}", daemon=True)
+    heartbeat.start()
+    try:
+        func = TASKS.get(job.name)
+        if func is None:
+            raise LookupError(f"Tarefa desconhecida: {job.name}")
+        func(**job.payload)
+    except Exception:
+        logger.exception("Job %s (%s) falhou na tentativa %s", job.pk, job.name, job.attempts)
+        status = "retry" if job.attempts < job.max_attempts else "failed"
+        Job.objects.filter(pk=job.pk).update(
+            status=Job.QUEUED if status == "retry" else Job.FAILED,
+            run_at=timezone.now() + timedelta(seconds=retry_delay(job.attempts)),
+            locked_by="", locked_at=None, last_error=traceback.format_exc()[-4000:],
+        )
+    else:
+        status = "done"
+        Job.objects.filter(pk=job.pk).delete()
+    finally:
+        done.set()
+        heartbeat.join()
+    registry.inc("jobs_processed_total", (("job", job.name), ("status", status)))
+    registry.observe("job_duration_seconds", (("job", job.name),), time.perf_counter() - start)
+    registry.maybe_flush()
+    return status
+
+
+def recover_stale(timeout=None):
+    """
+    Devolve à fila jobs "running" sem heartbeat há JOBS_LOCK_TIMEOUT segundos
+    (worker morreu), ou marca como falhos. O UPDATE é condicional por job: um
+    heartbeat que chegou no meio tempo mantém o job com o worker e não roda o
+    on_stale.
+    """
+    cutoff = timezone.now() - timedelta(seconds=timeout or settings.JOBS_LOCK_TIMEOUT)
+    jobs = Job.objects.filter(status=Job.RUNNING, locked_at__lt=cutoff).values_list(
+        "id", "name", "payload", "attempts", "max_attempts"
+    )
+    recovered = 0
+    for pk, name, payload, attempts, max_attempts in list(jobs):
+        stale = Job.objects.filter(pk=pk, status=Job.RUNNING, locked_at__lt=cutoff)
+        if attempts >= max_attempts:
+            changed = stale.update(
+                status=Job.FAILED, locked_by="", locked_at=None, last_error="Worker interrompido durante a execução."
+            )
+        else:
+            changed = stale.update(status=Job.QUEUED, locked_by="", locked_at=None)
+        on_stale = getattr(TASKS.get(name), "on_stale", None)
+        if changed and on_stale:
+            on_stale(**payload)
+        recovered += changed
+    return recovered
+
+
+# ---------------------------
+# Estatísticas
+# ---------------------------
+def queue_stats():
+    """Profundidade da fila por status e atraso (s) do job pronto mais antigo."""
+    now = timezone.now()
+    counts = dict(Job.objects.order_by().values_list("status").annotate(n=Count("id")))
+    oldest = Job.objects.filter(status=Job.QUEUED, run_at__lte=now).aggregate(m=Min("run_at"))["m"]
+    return {
+        "depth": {status: counts.get(status, 0) for status, _ in Job.STATUS_CHOICES},
+        "lag": (now - oldest).total_seconds() if oldest else 0.0,
+    }
+
+
+# Calculadas na hora do scrape: valem para a fila inteira, não para um processo
+registry.gauge("jobs_queue_depth", lambda: [
+    ((("status", status),), n) for status, n in queue_stats()["depth"].items()
+])
+registry.gauge("jobs_queue_lag_seconds", lambda: [((), queue_stats()["lag"])])
+
+
+# ---------------------------
+# Worker
+# ---------------------------
+class Worker:
+    """Reserva jobs e os executa em até `concurrency` threads."""
+    def __init__(self, concurrency=1, worker_id=None, stats_interval=60.0, report=None):
+        self.concurrency = max(1, concurrency)
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+        self.stats_interval = stats_interval
+        self.report = report or (lambda line: logger.info(line))
+        self.stopping = threading.Event()
+        self.processed = Counter()   # resultado -> quantidade, na janela atual
+        self.lock = threading.Lock()
+        self.window_start = time.monotonic()
+
+    def stop(self):
+        self.stopping.set()
+
+    def _execute(self, job):
+        # Cada thread tem sua conexão: fecha como no fim de um request
+        close_old_connections()
+        try:
+            self.count(execute(job))
+        finally:
+            close_old_connections()
+
+    def count(self, status):
+        with self.lock:
+            self.processed[status] += 1
+
+    def run_once(self):
+        """Executa (sem threads) tudo que estiver pronto agora. Retorna quantos rodaram."""
+        total = 0
+        while jobs := claim(self.concurrency, self.worker_id):
+            for job in jobs:
+                self.count(execute(job))
+            total += len(jobs)
+        return total
+
+    def run(self, interval=1.0):
+        """Laço principal até stop(): mantém as threads ocupadas enquanto houver jobs."""
+        recover_stale()
+        inflight = set()
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="job") as pool:
+            while not self.stopping.is_set():
+                free = self.concurrency - len(inflight)
+                jobs = claim(free, self.worker_id) if free else []
+                inflight.update(pool.submit(self._execute, job) for job in jobs)
+                self.maybe_report()
+                if jobs and len(inflight) < self.concurrency:
+                    continue  # ainda há vagas: tenta reservar mais
+                if inflight:
+                    _, inflight = wait(inflight, timeout=interval, return_when=FIRST_COMPLETED)
+                else:
+                    recover_stale()
+                    self.stopping.wait(interval)
+            wait(inflight)  # termina o que já foi reservado antes de sair
+        self.maybe_report(force=True)
+
+    def maybe_report(self, force=False):
+        elapsed = time.monotonic() - self.window_start
+        if not force and elapsed < self.stats_interval:
+            return
+        with self.lock:
+            processed, self.processed = self.processed, Counter()
+            self.window_start = time.monotonic()
+        stats = queue_stats()
+        done = sum(processed.values())
+        depth = " ".join(f"{k}={v}" for k, v in stats["depth"].items())
+        self.report(
+            f"{done} jobs em {elapsed:.0f}s ({done / elapsed if elapsed else 0:.1f}/s; "
+            f"ok={processed['done']} retry={processed['retry']} falhas={processed['failed']}) | "
+            f"fila: {depth} atraso={stats['lag']:.1f}s"
+        )
+        registry.maybe_flush()
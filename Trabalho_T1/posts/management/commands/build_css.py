@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import cssbundle
+
+
+class Command(BaseCommand):
+    help = (
+        "Gera o CSS do site em ASSETS_BUILD_DIR: Bootstrap vendorizado + static/main.css "
+        "sem os seletores que os templates não usam (css/app.css) e o CSS crítico "
+        "embutido no <head> (css/critical.css). Roda sozinho dentro do collectstatic."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--source", help="CSS de origem local no lugar do Bootstrap vendorizado (offline).")
+
+    def handle(self, *args, source, **options):
+        try:
+            sizes = cssbundle.build(source)
+        except (OSError, ValueError) as exc:
+            raise CommandError(f"Não foi possível gerar o CSS: {exc}")
+        for name, size in sizes.items():
+            self.stdout.write(f"{name}: {size / 1024:.1f} KB")
+        self.stdout.write(self.style.SUCCESS("CSS gerado."))
@@ -0,0 +1,30 @@
+import time
+
+from django.contrib.sessions.models import Session
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+
+class Command(BaseCommand):
+    help = (
+        "Apaga sessões expiradas em lotes pequenos (o clearsessions do Django faz um "
+        "único DELETE, que no SQLite segura o lock de escrita durante a tabela toda)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch", type=int, default=1000, help="Linhas por DELETE.")
+        parser.add_argument("--sleep", type=float, default=0.05, help="Pausa entre lotes (libera o banco).")
+
+    def handle(self, *args, batch, sleep, **options):
+        now = timezone.now()
+        expired = Session.objects.filter(expire_date__lt=now)
+        deleted = 0
+        while True:
+            keys = list(expired.values_list("session_key", flat=True)[:batch])
+            if not keys:
+                break
+            deleted += Session.objects.filter(session_key__in=keys).delete()[0]
+            if len(keys) < batch:
+                break
+            time.sleep(sleep)
+        self.stdout.write(self.style.SUCCESS(f"{deleted} sessões expiradas removidas."))
@@ -0,0 +1,25 @@
+from django.conf import settings
+from django.contrib.staticfiles.management.commands import collectstatic
+from django.core.management import call_command
+from django.core.management.base import CommandError
+
+
+class Command(collectstatic.Command):
+    """collectstatic que gera o bundle CSS (build_css) antes de copiar, dar hash e comprimir."""
+    help = collectstatic.Command.help + " Antes, gera o bundle CSS (build_css)."
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument("--skip-css", action="store_true", help="Não roda o build_css.")
+
+    def handle(self, **options):
+        if not options["skip_css"] and not options["dry_run"]:
+            try:
+                call_command("build_css", stdout=self.stdout, stderr=self.stderr)
+            except CommandError as exc:
+                # Em produção (DEBUG=0) o deploy para: sem o bundle as páginas dependeriam do CDN.
+                # Em dev cai no <link> do CDN ({% css_bundle %}) e segue.
+                if not settings.DEBUG:
+                    raise
+                self.stderr.write(self.style.WARNING(f"{exc} Seguindo sem o bundle CSS."))
+        return super().handle(**options)
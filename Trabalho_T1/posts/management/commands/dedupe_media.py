@@ -0,0 +1,57 @@
+import os
+
+from django.core.management.base import BaseCommand
+
+from posts.models import Attachment
+from posts.storage import cas_name, content_sha256, sniffed_extension
+
+
+class Command(BaseCommand):
+    help = (
+        "Migra os anexos existentes para o storage endereçado por conteúdo, "
+        "removendo cópias duplicadas de media/ no lugar."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch", type=int, default=500, help="Linhas lidas por lote.")
+        parser.add_argument("--dry-run", action="store_true", help="Só relata, não altera nada.")
+
+    def handle(self, *args, batch, dry_run, **options):
+        moved = deduped = missing = freed = 0
+        qs = Attachment.objects.only("id", "file", "sha256").order_by("id")
+        for attachment in qs.iterator(chunk_size=batch):
+            old_name = attachment.file.name
+            storage = attachment.file.storage
+            if not old_name or not storage.exists(old_name):
+                missing += 1
+                continue
+            with storage.open(old_name, "rb") as f:
+                digest = content_sha256(f)
+                ext = sniffed_extension(f)
+            new_name = cas_name(digest, ext)
+            if new_name == old_name:
+                if attachment.sha256 != digest and not dry_run:
+                    Attachment.objects.filter(pk=attachment.pk).update(sha256=digest)
+                continue
+
+            size = storage.size(old_name)
+            if storage.exists(new_name):
+                deduped += 1
+                freed += size
+                if not dry_run:
+                    Attachment.objects.filter(pk=attachment.pk).update(file=new_name, sha256=digest)
+                    if not Attachment.objects.filter(file=old_name).exists():
+                        storage.delete(old_name)
+            else:
+                moved += 1
+                if not dry_run:
+                    os.makedirs(os.path.dirname(storage.path(new_name)), exist_ok=True)
+                    # Mesmo filesystem: rename, sem cópia de bytes
+                    os.replace(storage.path(old_name), storage.path(new_name))
+                    Attachment.objects.filter(file=old_name).update(file=new_name, sha256=digest)
+
+        prefix = "[dry-run] " if dry_run else ""
+        self.stdout.write(
+            f"{prefix}{moved} movido(s), {deduped} duplicado(s) removido(s), "
+            f"{missing} ausente(s), {freed / 1024 / 1024:.1f} MB liberados."
+        )
@@ -0,0 +1,22 @@
+import os
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = (
+        "Cria o superusuário de DJANGO_SUPERUSER_USERNAME/EMAIL/PASSWORD se ainda "
+        "não existir (idempotente; passo único do `entrypoint.sh setup`)."
+    )
+
+    def handle(self, *args, **options):
+        User = get_user_model()
+        username = os.getenv("DJANGO_SUPERUSER_USERNAME", "admin")
+        email = os.getenv("DJANGO_SUPERUSER_EMAIL", "admin@example.com")
+        password = os.getenv("DJANGO_SUPERUSER_PASSWORD", "admin123")
+        if User.objects.filter(username=username).exists():
+            self.stdout.write(f"Superuser '{username}' já existe.")
+            return
+        User.objects.create_superuser(username, email, password)
+        self.stdout.write(self.style.SUCCESS(f"Superuser '{username}' criado."))
@@ -0,0 +1,87 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+
+from posts.models import Post, Attachment
+from posts.transfer import FORMAT_VERSION, copy_media, dump_line, open_stream
+
+USER_FIELDS = ("username", "email", "first_name", "last_name", "is_active", "date_joined")
+POST_FIELDS = ("id", "author__username", "message", "created_at", "updated_at")
+ATTACHMENT_FIELDS = (
+    "id", "post_id", "file", "sha256", "original_name", "content_type", "kind", "uploaded_at",
+    "width", "height", "duration",
+)
+
+
+def _iso(value):
+    return value.isoformat() if hasattr(value, "isoformat") else value
+
+
+class Command(BaseCommand):
+    help = (
+        "Exporta autores, posts e anexos em NDJSON, em lotes por id (memória constante). "
+        "Use com import_posts para backup ou migração entre bancos."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("output", help='Arquivo de saída (".gz" comprime; "-" = stdout).')
+        parser.add_argument("--batch", type=int, default=2000, help="Posts lidos por consulta.")
+        parser.add_argument("--after-id", type=int, default=0, help="Exporta só posts com id maior (export incremental).")
+        parser.add_argument("--with-passwords", action="store_true", help="Inclui os hashes de senha dos autores.")
+        parser.add_argument("--media-dir", help="Copia também os arquivos dos anexos para este diretório.")
+        parser.add_argument("--jobs", type=int, default=4, help="Cópias de arquivo em paralelo (com --media-dir).")
+
+    def handle(self, *args, output, batch, after_id, with_passwords, media_dir, jobs, **options):
+        # Com saída em stdout, o progresso vai para stderr
+        log = self.stderr if output == "-" else self.stdout
+        posts = attachments = 0
+        media = {"copied": 0, "skipped": 0, "missing": 0, "rejected": 0}
+        media_root = Attachment._meta.get_field("file").storage.location
+
+        with open_stream(output, "w") as out:
+            out.write(dump_line({"type": "meta", "version": FORMAT_VERSION}))
+
+            # Autores primeiro: o import cria os usuários antes dos posts que os citam
+            user_fields = USER_FIELDS + (("password",) if with_passwords else ())
+            authors = User.objects.filter(pk__in=Post.objects.values("author_id")).order_by("pk")
+            for row in authors.values(*user_fields).iterator(chunk_size=batch):
+                out.write(dump_line({"type": "user", **{k: _iso(v) for k, v in row.items()}}))
+
+            # Posts em lotes por id (keyset): sem OFFSET e sem cursor aberto a exportação toda
+            last_id = after_id
+            while True:
+                rows = list(
+                    Post.objects.filter(pk__gt=last_id).order_by("pk").values(*POST_FIELDS)[:batch]
+                )
+                if not rows:
+                    break
+                last_id = rows[-1]["id"]
+                by_post = {}
+                for att in Attachment.objects.filter(post_id__in=[r["id"] for r in rows]).order_by("pk").values(*ATTACHMENT_FIELDS):
+                    by_post.setdefault(att["post_id"], []).append(att)
+
+                for row in rows:
+                    out.write(dump_line({
+                        "type": "post", "id": row["id"], "author": row["author__username"],
+                        "message": row["message"], "created_at": _iso(row["created_at"]),
+                        "updated_at": _iso(row["updated_at"]),
+                    }))
+                    for att in by_post.get(row["id"], ()):
+                        out.write(dump_line({
+                            "type": "attachment", **{k: _iso(v) for k, v in att.items() if k != "post_id"},
+                            "post": att["post_id"],
+                        }))
+                        attachments += 1
+                posts += len(rows)
+
+                if media_dir:
+                    names = [a["file"] for atts in by_post.values() for a in atts]
+                    for key, n in copy_media(names, media_root, media_dir, jobs).items():
+                        media[key] += n
+                log.write(f"{posts} posts, {attachments} anexos (último id {last_id})")
+
+        summary = f"Exportados {posts} posts e {attachments} anexos."
+        if media_dir:
+            summary += f" Mídia: {media['copied']} copiados, {media['skipped']} já existiam, {media['missing']} ausentes."
+            if media["rejected"]:
+                summary += f" {media['rejected']} recusados (caminho fora de MEDIA_ROOT)."
+        log.write(self.style.SUCCESS(summary))
@@ -0,0 +1,88 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts.models import Attachment, Rendition
+
+
+class Command(BaseCommand):
+    help = (
+        "Remove de media/ os arquivos que nenhum Attachment/Rendition referencia "
+        "(restos de exclusões antigas, uploads interrompidos .upload-*) e os "
+        "diretórios de shard vazios. Varre o disco em lotes: uma query por lote "
+        "(file IN (...)), nunca uma por arquivo."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch", type=int, default=1000, help="Arquivos comparados por query.")
+        parser.add_argument("--dry-run", action="store_true", help="Só relata, não apaga nada.")
+        parser.add_argument("--min-age", type=float, default=3600,
+                            help="Ignora arquivos modificados há menos de N segundos (uploads em andamento).")
+        parser.add_argument("--rate", type=float, default=0,
+                            help="Máximo de arquivos apagados por segundo (0 = sem limite).")
+
+    def handle(self, *args, batch, dry_run, min_age, rate, **options):
+        cutoff = time.time() - min_age
+        # (prefixo, modelo): renditions usam o storage padrão, com o mesmo MEDIA_ROOT
+        targets = [("attachments", Attachment), ("renditions", Rendition)]
+        scanned = removed = reclaimed = 0
+        empty_dirs = []
+        started = time.monotonic()
+        for prefix, model in targets:
+            storage = model._meta.get_field("file").storage
+            for files in self.scan(storage.location, prefix, batch, cutoff, empty_dirs):
+                scanned += len(files)
+                known = set(model.objects.filter(file__in=list(files)).values_list("file", flat=True))
+                orphans = [(name, size) for name, size in files.items() if name not in known]
+                for name, size in orphans:
+                    if not dry_run:
+                        storage.delete(name)
+                    removed += 1
+                    reclaimed += size
+                if rate and orphans and not dry_run:
+                    # Limita a taxa de unlink para não competir com o servidor pelo disco
+                    time.sleep(max(0.0, removed / rate - (time.monotonic() - started)))
+
+        if not dry_run:
+            for path in empty_dirs:
+                try:
+                    os.rmdir(path)
+                except OSError:
+                    pass  # recebeu um arquivo desde a varredura
+
+        prefix = "[dry-run] " if dry_run else ""
+        self.stdout.write(self.style.SUCCESS(
+            f"{prefix}{scanned} arquivo(s) verificado(s), {removed} órfão(s) removido(s), "
+            f"{len(empty_dirs)} diretório(s) vazio(s), {reclaimed / 1024 / 1024:.1f} MB liberados."
+        ))
+
+    def scan(self, location, prefix, batch, cutoff, empty_dirs):
+        """
+        Percorre location/prefix com os.scandir e gera lotes {nome relativo: bytes}
+        de arquivos mais antigos que `cutoff`. Diretórios já vazios (e antigos) vão
+        para `empty_dirs`; os esvaziados agora ficam para a próxima execução.
+        """
+        root = os.path.join(location, prefix)
+        if not os.path.isdir(root):
+            return
+        files, stack = {}, [root]
+        while stack:
+            directory = stack.pop()
+            with os.scandir(directory) as entries:
+                entries = list(entries)
+            if not entries and directory != root and os.stat(directory).st_mtime < cutoff:
+                empty_dirs.append(directory)
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                    continue
+                stat = entry.stat(follow_symlinks=False)
+                if stat.st_mtime >= cutoff:
+                    continue
+                files[os.path.relpath(entry.path, location).replace(os.sep, "/")] = stat.st_size
+                if len(files) >= batch:
+                    yield files
+                    files = {}
+        if files:
+            yield files
@@ -0,0 +1,183 @@
+import json
+import os
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.utils.dateparse import parse_datetime
+
+from posts.cache import bump_timeline_version
+from posts.mediainfo import media_kind
+from posts.models import Post, Attachment
+from posts.transfer import FORMAT_VERSION, copy_media, keep_timestamps, open_stream
+
+USER_FIELDS = ("email", "first_name", "last_name", "is_active")
+ATTACHMENT_FIELDS = ("file", "sha256", "original_name", "content_type", "width", "height", "duration")
+
+
+class Command(BaseCommand):
+    help = (
+        "Importa o NDJSON gerado por export_posts com bulk_create em lotes. "
+        "Idempotente (linhas já importadas são puladas) e retomável via checkpoint; "
+        "id exportado ocupado por outra linha local interrompe o import."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("input", help='Arquivo NDJSON (".gz" aceito; "-" = stdin, sem checkpoint).')
+        parser.add_argument("--batch", type=int, default=2000, help="Linhas por transação/bulk_create.")
+        parser.add_argument("--checkpoint", help="Arquivo de checkpoint (padrão: <input>.checkpoint).")
+        parser.add_argument("--restart", action="store_true", help="Ignora o checkpoint e lê desde o início.")
+        parser.add_argument("--media-dir", help="Copia os arquivos dos anexos a partir deste diretório.")
+        parser.add_argument("--jobs", type=int, default=4, help="Cópias de arquivo em paralelo (com --media-dir).")
+
+    def handle(self, *args, input, batch, checkpoint, restart, media_dir, jobs, **options):
+        self.media_dir, self.jobs = media_dir, jobs
+        self.media_root = Attachment._meta.get_field("file").storage.location
+        self.author_ids = {}
+        self.counts = {"users": 0, "posts": 0, "attachments": 0}
+
+        if input != "-" and not os.path.exists(input):
+            raise CommandError(f"Arquivo não encontrado: {input}")
+        checkpoint = None if input == "-" else (checkpoint or f"{input}.checkpoint")
+        offset = 0
+        if checkpoint and not restart and os.path.exists(checkpoint):
+            with open(checkpoint) as f:
+                state = json.load(f)
+            offset = state.pop("offset")
+            self.counts.update(state)
+            self.stdout.write(f"Retomando do byte {offset} ({checkpoint}).")
+
+        users, posts, attachments = [], [], []
+        with open_stream(input, "r") as stream, keep_timestamps():
+            if offset:
+                stream.seek(offset)
+            # readline() (e não `for line in`) para que tell() continue disponível
+            for line in iter(stream.readline, b""):
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                kind = record.pop("type", None)
+                if kind == "meta":
+                    if record.get("version") != FORMAT_VERSION:
+                        raise CommandError(f"Versão de formato não suportada: {record.get('version')}")
+                elif kind == "user":
+                    users.append(record)
+                elif kind == "post":
+                    posts.append(record)
+                elif kind == "attachment":
+                    attachments.append(record)
+                else:
+                    raise CommandError(f"Registro desconhecido: {kind!r}")
+
+                if len(users) + len(posts) + len(attachments) >= batch:
+                    self.flush(users, posts, attachments)
+                    users, posts, attachments = [], [], []
+                    self.save_checkpoint(checkpoint, stream)
+            self.flush(users, posts, attachments)
+            self.save_checkpoint(checkpoint, stream)
+
+        self.finish()
+        if checkpoint and os.path.exists(checkpoint):
+            os.remove(checkpoint)  # import completo: a próxima execução começa do zero
+        c = self.counts
+        self.stdout.write(self.style.SUCCESS(
+            f"Importados {c['users']} autores, {c['posts']} posts e {c['attachments']} anexos "
+            "(linhas já existentes são ignoradas)."
+        ))
+
+    # --- lotes -------------------------------------------------------------
+    def resolve_authors(self, usernames):
+        missing = set(usernames) - self.author_ids.keys()
+        if missing:
+            if len(self.author_ids) > 50_000:
+                self.author_ids.clear()  # cache limitado: memória constante
+            self.author_ids.update(User.objects.filter(username__in=missing).values_list("username", "pk"))
+        unknown = set(usernames) - self.author_ids.keys()
+        if unknown:
+            raise CommandError(f"Autores ausentes no arquivo e no banco: {', '.join(sorted(unknown)[:10])}")
+        return self.author_ids
+
+    def flush(self, users, posts, attachments):
+        if not (users or posts or attachments):
+            return
+        new_users, new_posts, new_attachments = [], [], []
+        with transaction.atomic():
+            if users:
+                taken = set(User.objects.filter(username__in=[u["username"] for u in users])
+                            .values_list("username", flat=True))
+                new_users = [u for u in users if u["username"] not in taken]
+                User.objects.bulk_create([
+                    User(
+                        username=u["username"], date_joined=parse_datetime(u["date_joined"]),
+                        # Sem hash exportado: senha inutilizável (recuperar via "esqueci a senha")
+                        password=u.get("password") or make_password(None),
+                        **{k: u[k] for k in USER_FIELDS if k in u},
+                    )
+                    for u in new_users
+                ], ignore_conflicts=True)
+            if posts:
+                authors = self.resolve_authors({p["author"] for p in posts})
+                new_posts = self.new_rows(Post, [
+                    Post(
+                        id=p["id"], author_id=authors[p["author"]], message=p["message"],
+                        created_at=parse_datetime(p["created_at"]), updated_at=parse_datetime(p["updated_at"]),
+                    )
+                    for p in posts
+                ], ("author_id", "created_at"))
+                Post.objects.bulk_create(new_posts)
+            if attachments:
+                new_attachments = self.new_rows(Attachment, [
+                    Attachment(
+                        id=a["id"], post_id=a["post"], uploaded_at=parse_datetime(a["uploaded_at"]),
+                        # bulk_create pula o save(): exports antigos não têm "kind"
+                        kind=a.get("kind") or media_kind(a.get("content_type", "")),
+                        **{k: a[k] for k in ATTACHMENT_FIELDS if k in a},
+                    )
+                    for a in attachments
+                ], ("post_id", "file"))
+                Attachment.objects.bulk_create(new_attachments)
+        # Só as linhas de fato inseridas (reimportação não conta de novo)
+        self.counts["users"] += len(new_users)
+        self.counts["posts"] += len(new_posts)
+        self.counts["attachments"] += len(new_attachments)
+        if self.media_dir and attachments:
+            media = copy_media([a["file"] for a in attachments], self.media_dir, self.media_root, self.jobs)
+            if media["rejected"]:
+                self.stderr.write(f"{media['rejected']} arquivo(s) recusado(s): caminho fora da pasta de mídia.")
+
+    def new_rows(self, model, rows, identity):
+        """
+        Linhas ainda ausentes do banco. Id já ocupado pela mesma linha (mesmos
+        campos `identity`: reimportação) é pulado; ocupado por outra linha local,
+        aborta o lote: os anexos dela iriam parar no post errado.
+        """
+        existing = model.objects.in_bulk([row.id for row in rows])
+        for row in rows:
+            local = existing.get(row.id)
+            if local and any(getattr(local, f) != getattr(row, f) for f in identity):
+                raise CommandError(
+                    f"{model._meta.verbose_name} id={row.id} já existe no banco com outro conteúdo; "
+                    "importe em um banco sem linhas conflitantes."
+                )
+        return [row for row in rows if row.id not in existing]
+
+    def save_checkpoint(self, path, stream):
+        """Grava o byte já importado (após o commit do lote); rename atômico."""
+        if not path:
+            return
+        tmp = f"{path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump({"offset": stream.tell(), **self.counts}, f)
+        os.replace(tmp, path)
+
+    def finish(self):
+        # ids explícitos não avançam as sequences do Postgres
+        with connection.cursor() as cursor:
+            for sql in connection.ops.sequence_reset_sql(no_style(), [Post, Attachment]):
+                cursor.execute(sql)
+        # bulk_create não dispara signals: contadores e caches são acertados aqui
+        call_command("recount_author_stats", stdout=self.stdout)
+        bump_timeline_version()
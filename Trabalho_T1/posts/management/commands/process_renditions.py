@@ -0,0 +1,27 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.renditions import Image, process_pending
+
+
+class Command(BaseCommand):
+    help = "Gera miniaturas (WebP/JPEG) e posters de vídeo para anexos pendentes."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch", type=int, default=20, help="Anexos por lote.")
+        parser.add_argument("--loop", action="store_true", help="Fica rodando como worker.")
+        parser.add_argument("--interval", type=float, default=2.0, help="Espera (s) quando a fila está vazia.")
+
+    def handle(self, *args, batch, loop, interval, **options):
+        if Image is None:
+            # Sem Pillow os anexos ficam pendentes e o template continua usando o original
+            raise CommandError("Pillow não instalado: instale-o para gerar renditions.")
+        while True:
+            done = process_pending(batch)
+            if done:
+                self.stdout.write(f"{done} anexo(s) processado(s).")
+            if not loop:
+                break
+            if not done:
+                time.sleep(interval)
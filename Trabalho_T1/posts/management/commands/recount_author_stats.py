@@ -0,0 +1,37 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count
+
+from posts.models import Attachment, AuthorStats
+
+
+class Command(BaseCommand):
+    help = (
+        "Recalcula os contadores de posts/anexos por autor (AuthorStats). "
+        "Necessário só depois de escritas que não disparam signals (bulk_create, SQL direto)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("usernames", nargs="*", help="Só estes usuários (padrão: todos).")
+
+    def handle(self, *args, usernames, **options):
+        users = User.objects.all()
+        if usernames:
+            users = users.filter(username__in=usernames)
+        posts = dict(users.annotate(n=Count("posts")).values_list("id", "n"))
+        attachments = dict(
+            Attachment.objects.filter(post__author_id__in=list(posts))
+            .values("post__author_id").annotate(n=Count("id"))
+            .values_list("post__author_id", "n")
+        )
+        rows = [
+            AuthorStats(user_id=uid, post_count=n, attachment_count=attachments.get(uid, 0))
+            for uid, n in posts.items()
+        ]
+        with transaction.atomic():
+            AuthorStats.objects.bulk_create(
+                rows, batch_size=500, update_conflicts=True,
+                unique_fields=["user"], update_fields=["post_count", "attachment_count"],
+            )
+        self.stdout.write(self.style.SUCCESS(f"Contadores recalculados para {len(rows)} usuário(s)."))
@@ -0,0 +1,40 @@
+import signal
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from posts.jobs import Worker, queue_stats, recover_stale
+
+
+class Command(BaseCommand):
+    help = (
+        "Executa os jobs da fila em segundo plano (posts.jobs): e-mails, liberação de "
+        "arquivos de anexos apagados e miniaturas de uploads novos. SIGTERM/Ctrl+C "
+        "terminam os jobs em andamento antes de sair."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--concurrency", type=int, default=settings.JOBS_CONCURRENCY,
+                            help="Jobs executados ao mesmo tempo (threads).")
+        parser.add_argument("--interval", type=float, default=1.0, help="Espera (s) quando a fila está vazia.")
+        parser.add_argument("--stats-interval", type=float, default=60.0,
+                            help="Intervalo (s) da linha de vazão/profundidade da fila.")
+        parser.add_argument("--burst", action="store_true", help="Executa o que estiver pronto e sai.")
+        parser.add_argument("--stats", action="store_true", help="Só mostra a fila e sai.")
+
+    def handle(self, *args, concurrency, interval, stats_interval, burst, stats, **options):
+        if stats:
+            s = queue_stats()
+            depth = " ".join(f"{k}={v}" for k, v in s["depth"].items())
+            self.stdout.write(f"fila: {depth} atraso={s['lag']:.1f}s")
+            return
+        worker = Worker(concurrency, stats_interval=stats_interval, report=self.stdout.write)
+        if burst:
+            recover_stale()
+            done = worker.run_once()
+            self.stdout.write(self.style.SUCCESS(f"{done} job(s) executado(s)."))
+            return
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(sig, lambda *_: worker.stop())
+        self.stdout.write(f"Worker {worker.worker_id} com {worker.concurrency} thread(s).")
+        worker.run(interval)
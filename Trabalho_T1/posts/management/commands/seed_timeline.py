@@ -0,0 +1,126 @@
+import hashlib
+import random
+from datetime import timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from posts.cache import bump_timeline_version
+from posts.mediainfo import media_kind
+from posts.models import Post, Attachment
+from posts.transfer import keep_timestamps
+
+WORDS = (
+    "hoje amanhã café código django python deploy bug teste timeline post foto vídeo "
+    "música aula trabalho prova projeto servidor banco cache fila índice consulta "
+    "rápido lento ótimo ruim finalmente alguém sabe como faz isso aqui agora"
+).split()
+
+# (content_type, extensão, peso): maioria de imagens, como numa rede social
+MEDIA_TYPES = (
+    ("image/jpeg", ".jpg", 60), ("image/png", ".png", 15), ("image/webp", ".webp", 5),
+    ("video/mp4", ".mp4", 12), ("audio/mpeg", ".mp3", 8),
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Gera dados sintéticos para benchmarks: usuários, posts e anexos com "
+        "distribuições realistas (poucos autores escrevem muito, picos à noite, "
+        "mensagens curtas). Usa bulk_create em lotes; os anexos não têm arquivo em disco."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=100)
+        parser.add_argument("--posts", type=int, default=10_000)
+        parser.add_argument("--attachment-ratio", type=float, default=0.3, help="Fração de posts com anexo.")
+        parser.add_argument("--days", type=int, default=90, help="Janela de tempo dos posts (dias para trás).")
+        parser.add_argument("--password", default="seed", help="Senha comum dos usuários gerados.")
+        parser.add_argument("--prefix", default="seed", help="Prefixo dos usernames (seed0001, ...).")
+        parser.add_argument("--batch", type=int, default=5000)
+        parser.add_argument("--seed", type=int, default=42, help="Semente do gerador (execuções repetíveis).")
+
+    def handle(self, *args, users, posts, attachment_ratio, days, password, prefix, batch, seed, **options):
+        if users < 1:
+            raise CommandError("--users deve ser pelo menos 1.")
+        rng = random.Random(seed)
+        now = timezone.now()
+
+        # Usuários: hash da senha calculado uma vez (PBKDF2 por usuário levaria minutos)
+        password_hash = make_password(password)
+        width = len(str(users - 1))
+        User.objects.bulk_create(
+            [User(username=f"{prefix}{i:0{width}d}", password=password_hash, date_joined=now - timedelta(days=days))
+             for i in range(users)],
+            batch_size=batch, ignore_conflicts=True,
+        )
+        author_ids = list(
+            User.objects.filter(username__startswith=prefix).order_by("pk").values_list("pk", flat=True)[:users]
+        )
+        # Lei de potência (Zipf, s≈1): o autor i escreve ∝ 1/(i+1)
+        weights = [1 / (i + 1) for i in range(len(author_ids))]
+
+        created_posts = created_attachments = 0
+        with keep_timestamps():
+            for start in range(0, posts, batch):
+                n = min(batch, posts - start)
+                rows = [self.make_post(rng, author_ids, weights, now, days) for _ in range(n)]
+                # ids em ordem cronológica, como numa timeline real
+                rows.sort(key=lambda p: p.created_at)
+                with transaction.atomic():
+                    rows = Post.objects.bulk_create(rows)
+                    attachments = [
+                        self.make_attachment(rng, post, j)
+                        for post in rows if rng.random() < attachment_ratio
+                        for j in range(min(4, int(rng.expovariate(1.2)) + 1))
+                    ]
+                    Attachment.objects.bulk_create(attachments, batch_size=batch)
+                created_posts += len(rows)
+                created_attachments += len(attachments)
+                self.stdout.write(f"{created_posts}/{posts} posts, {created_attachments} anexos")
+
+        # bulk_create não dispara signals
+        call_command("recount_author_stats", stdout=self.stdout)
+        bump_timeline_version()
+        self.stdout.write(self.style.SUCCESS(
+            f"Gerados {created_posts} posts e {created_attachments} anexos para {len(author_ids)} usuários "
+            f"(senha: {password!r})."
+        ))
+
+    def make_post(self, rng, author_ids, weights, now, days):
+        # Mais recentes mais prováveis; horário com pico entre 19h e 23h
+        age = timedelta(days=min(days, rng.expovariate(3 / days)))
+        created = now - age
+        hour = int(rng.triangular(7, 24, 21)) % 24
+        created = created.replace(hour=hour, minute=rng.randrange(60), second=rng.randrange(60))
+        if created > now:
+            created -= timedelta(days=1)
+        # Mensagens curtas na maioria (log-normal, mediana ~12 palavras), até 500 caracteres
+        length = max(1, min(80, int(rng.lognormvariate(2.5, 0.7))))
+        message = " ".join(rng.choice(WORDS) for _ in range(length))[:500]
+        edited = created + timedelta(minutes=rng.randrange(120)) if rng.random() < 0.1 else created
+        return Post(
+            author_id=rng.choices(author_ids, weights)[0], message=message,
+            created_at=created, updated_at=edited,
+        )
+
+    def make_attachment(self, rng, post, index):
+        content_type, ext, _ = rng.choices(MEDIA_TYPES, [w for *_, w in MEDIA_TYPES])[0]
+        digest = hashlib.sha256(f"{post.pk}:{index}".encode()).hexdigest()
+        landscape = rng.random() < 0.6
+        width, height = (1600, 1200) if landscape else (1080, 1350)
+        kind = media_kind(content_type)
+        visual = kind in (Attachment.KIND_IMAGE, Attachment.KIND_VIDEO)
+        timed = kind in (Attachment.KIND_AUDIO, Attachment.KIND_VIDEO)
+        return Attachment(
+            post=post, file=f"attachments/{digest[:2]}/{digest[2:4]}/{digest}{ext}", sha256=digest,
+            original_name=f"arquivo{index}{ext}", content_type=content_type, kind=kind, uploaded_at=post.created_at,
+            width=width if visual else None, height=height if visual else None,
+            duration=round(rng.uniform(5, 180), 1) if timed else None,
+            # Sem arquivo em disco: nada para o worker de renditions processar
+            renditions_status=Attachment.RENDITIONS_DONE,
+        )
@@ -0,0 +1,46 @@
+import sqlite3
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+class Command(BaseCommand):
+    help = (
+        "Copia o banco SQLite default para as réplicas SQLite de DATABASE_REPLICA_URLS "
+        "(API de backup do SQLite: cópia consistente mesmo com o site no ar). "
+        "Simula a replicação para testar o ReplicaRouter localmente."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--loop", action="store_true", help="Continua copiando a cada --interval segundos.")
+        parser.add_argument("--interval", type=float, default=2.0, help="Atraso simulado da réplica.")
+        parser.add_argument("--source", help="Arquivo de origem (padrão: NAME do default).")
+        parser.add_argument("--target", action="append", help="Arquivo de réplica (padrão: as réplicas SQLite).")
+
+    def handle(self, *args, loop, interval, source, target, **options):
+        source = source or self.sqlite_name(DEFAULT_DB_ALIAS)
+        if not source:
+            raise CommandError("O banco default não é SQLite.")
+        targets = target or [
+            name for name in map(self.sqlite_name, settings.DATABASE_READ_ALIASES) if name and name != source
+        ]
+        if not targets:
+            raise CommandError("Nenhuma réplica SQLite em DATABASE_REPLICA_URLS.")
+
+        busy = settings.SQLITE_PRAGMAS["busy_timeout"] / 1000
+        while True:
+            started = time.monotonic()
+            with sqlite3.connect(source, timeout=busy) as src:
+                for name in targets:
+                    with sqlite3.connect(name, timeout=busy) as dst:
+                        src.backup(dst)
+            self.stdout.write(f"{len(targets)} réplica(s) sincronizada(s) em {time.monotonic() - started:.2f}s")
+            if not loop:
+                break
+            time.sleep(interval)
+
+    def sqlite_name(self, alias):
+        db = connections[alias]
+        return str(db.settings_dict["NAME"]) if db.vendor == "sqlite" else None
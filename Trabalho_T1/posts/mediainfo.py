@@ -0,0 +1,49 @@
+"""
+Metadados de mídia calculados uma vez: o tipo (kind) e as dimensões de imagens
+no upload (Attachment.save), a duração de áudio/vídeo pelo worker de renditions.
+Pillow e ffprobe são opcionais: sem eles os campos ficam nulos.
+"""
+import shutil
+import subprocess
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+KINDS = ("image", "audio", "video")
+
+
+def media_kind(content_type):
+    """"image/png" -> "image"; tipos fora de imagem/áudio/vídeo viram "other"."""
+    major = (content_type or "").split("/", 1)[0]
+    return major if major in KINDS else "other"
+
+
+def image_size(fileobj):
+    """(largura, altura) lendo só o cabeçalho da imagem, ou None."""
+    if Image is None:
+        return None
+    try:
+        fileobj.seek(0)
+        with Image.open(fileobj) as img:  # abertura preguiçosa: não decodifica os pixels
+            return img.size
+    except Exception:
+        return None
+    finally:
+        fileobj.seek(0)
+
+
+def probe_duration(path):
+    """Duração em segundos via ffprobe (se disponível), ou None."""
+    ffprobe = shutil.which("ffprobe")
+    if not ffprobe:
+        return None
+    try:
+        out = subprocess.run(
+            [ffprobe, "-v", "error", "-show_entries", "format=duration", "-of", "csv=p=0", path],
+            check=True, capture_output=True, text=True, timeout=30,
+        ).stdout
+        return float(out.strip())
+    except (subprocess.SubprocessError, ValueError):
+        return None
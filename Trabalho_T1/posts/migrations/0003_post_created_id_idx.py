@@ -0,0 +1,23 @@
+# Generated by Django 5.0.7 on 2026-10-17 21:34
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("posts", "0002_attachment"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name="post",
+            options={"ordering": ["-created_at", "-id"]},
+        ),
+        migrations.AddIndex(
+            model_name="post",
+            index=models.Index(fields=["-created_at", "-id"], name="post_created_id_idx"),
+        ),
+    ]
@@ -0,0 +1,69 @@
+from django.db import migrations
+
+# Índice de texto completo de Post.message.
+# - SQLite: tabela virtual FTS5 com conteúdo externo, sincronizada por triggers.
+# - Postgres: índice GIN de expressão sobre to_tsvector (sincronizado pelo próprio banco).
+# Outros bancos ficam sem índice (posts.search cai para LIKE).
+
+SQLITE_FORWARD = [
+    """
+    CREATE VIRTUAL TABLE posts_post_fts USING fts5(
+        message, content='posts_post', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER posts_post_fts_ai AFTER INSERT ON posts_post BEGIN
+        INSERT INTO posts_post_fts(rowid, message) VALUES (new.id, new.message);
+    END
+    """,
+    """
+    CREATE TRIGGER posts_post_fts_ad AFTER DELETE ON posts_post BEGIN
+        INSERT INTO posts_post_fts(posts_post_fts, rowid, message) VALUES ('delete', old.id, old.message);
+    END
+    """,
+    """
+    CREATE TRIGGER posts_post_fts_au AFTER UPDATE OF message ON posts_post BEGIN
+        INSERT INTO posts_post_fts(posts_post_fts, rowid, message) VALUES ('delete', old.id, old.message);
+        INSERT INTO posts_post_fts(rowid, message) VALUES (new.id, new.message);
+    END
+    """,
+    "INSERT INTO posts_post_fts(posts_post_fts) VALUES ('rebuild')",
+]
+
+SQLITE_BACKWARD = [
+    "DROP TRIGGER IF EXISTS posts_post_fts_ai",
+    "DROP TRIGGER IF EXISTS posts_post_fts_ad",
+    "DROP TRIGGER IF EXISTS posts_post_fts_au",
+    "DROP TABLE IF EXISTS posts_post_fts",
+]
+
+POSTGRES_FORWARD = [
+    "CREATE INDEX posts_post_message_fts ON posts_post "
+    "USING GIN (to_tsvector('portuguese', message))",
+]
+
+POSTGRES_BACKWARD = [
+    "DROP INDEX IF EXISTS posts_post_message_fts",
+]
+
+
+def _run(statements_by_vendor):
+    def run(apps, schema_editor):
+        for sql in statements_by_vendor.get(schema_editor.connection.vendor, []):
+            schema_editor.execute(sql)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("posts", "0003_post_created_id_idx"),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            _run({"sqlite": SQLITE_FORWARD, "postgresql": POSTGRES_FORWARD}),
+            _run({"sqlite": SQLITE_BACKWARD, "postgresql": POSTGRES_BACKWARD}),
+        ),
+    ]
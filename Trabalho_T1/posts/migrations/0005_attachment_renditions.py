@@ -0,0 +1,44 @@
+# Generated by Django 5.0.7 on 2026-10-17 21:40
+
+import django.db.models.deletion
+import posts.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("posts", "0004_post_message_fts"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="attachment",
+            name="height",
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="attachment",
+            name="renditions_status",
+            field=models.CharField(choices=[("pending", "Pendente"), ("processing", "Processando"), ("done", "Pronto"), ("failed", "Falhou")], db_index=True, default="pending", max_length=10),
+        ),
+        migrations.AddField(
+            model_name="attachment",
+            name="width",
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name="Rendition",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("file", models.FileField(upload_to=posts.models.rendition_upload_to)),
+                ("format", models.CharField(max_length=10)),
+                ("width", models.PositiveIntegerField()),
+                ("height", models.PositiveIntegerField()),
+                ("attachment", models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name="renditions", to="posts.attachment")),
+            ],
+            options={
+                "ordering": ["width", "id"],
+            },
+        ),
+    ]
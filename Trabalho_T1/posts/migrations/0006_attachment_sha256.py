@@ -0,0 +1,25 @@
+# Generated by Django 5.0.7 on 2026-10-17 21:45
+
+import posts.models
+import posts.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("posts", "0005_attachment_renditions"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="attachment",
+            name="sha256",
+            field=models.CharField(blank=True, db_index=True, max_length=64),
+        ),
+        migrations.AlterField(
+            model_name="attachment",
+            name="file",
+            field=models.FileField(storage=posts.storage.attachment_storage, upload_to=posts.models.attachment_upload_to),
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.0.7 on 2026-10-17 21:55
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_author_stats(apps, schema_editor):
+    """Contadores iniciais de todos os usuários existentes."""
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split("."))
+    AuthorStats = apps.get_model("posts", "AuthorStats")
+    Attachment = apps.get_model("posts", "Attachment")
+    posts = dict(User.objects.annotate(n=models.Count("posts")).values_list("id", "n"))
+    attachments = dict(
+        Attachment.objects.values("post__author_id").annotate(n=models.Count("id"))
+        .values_list("post__author_id", "n")
+    )
+    AuthorStats.objects.bulk_create(
+        [AuthorStats(user_id=uid, post_count=n, attachment_count=attachments.get(uid, 0)) for uid, n in posts.items()],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("auth", "0012_alter_user_first_name_max_length"),
+        ("posts", "0006_attachment_sha256"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="AuthorStats",
+            fields=[
+                ("user", models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name="post_stats", serialize=False, to=settings.AUTH_USER_MODEL)),
+                ("post_count", models.PositiveIntegerField(default=0)),
+                ("attachment_count", models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name="post",
+            index=models.Index(fields=["author", "-created_at", "-id"], name="post_author_created_id_idx"),
+        ),
+        migrations.RunPython(backfill_author_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.0.7 on 2026-10-17 22:22
+
+import mimetypes
+
+from django.db import migrations, models
+
+
+def backfill_kind(apps, schema_editor):
+    """Um UPDATE por tipo (content_type LIKE 'image/%'); sem content_type, pela extensão."""
+    Attachment = apps.get_model("posts", "Attachment")
+    for kind in ("image", "audio", "video"):
+        Attachment.objects.filter(content_type__startswith=f"{kind}/").update(kind=kind)
+    for pk, name in Attachment.objects.filter(content_type="").values_list("id", "file").iterator():
+        guess, _ = mimetypes.guess_type(name or "")
+        kind = (guess or "").split("/", 1)[0]
+        if kind in ("image", "audio", "video"):
+            Attachment.objects.filter(pk=pk).update(kind=kind, content_type=guess)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("posts", "0008_jobs"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="attachment",
+            name="duration",
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="attachment",
+            name="kind",
+            field=models.CharField(choices=[("image", "Imagem"), ("audio", "Áudio"), ("video", "Vídeo"), ("other", "Outro")], default="other", max_length=5),
+        ),
+        migrations.RunPython(backfill_kind, migrations.RunPython.noop),
+        # Índice depois do backfill: construído uma vez em vez de atualizado linha a linha
+        migrations.AddIndex(
+            model_name="attachment",
+            index=models.Index(fields=["kind", "post"], name="attachment_kind_post_idx"),
+        ),
+    ]
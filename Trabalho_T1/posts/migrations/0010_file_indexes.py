@@ -0,0 +1,25 @@
+# Generated by Django 5.0.7 on 2026-10-17 23:33
+
+import posts.models
+import posts.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0009_attachment_kind'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='attachment',
+            name='file',
+            field=models.FileField(db_index=True, storage=posts.storage.attachment_storage, upload_to=posts.models.attachment_upload_to),
+        ),
+        migrations.AlterField(
+            model_name='rendition',
+            name='file',
+            field=models.FileField(db_index=True, upload_to=posts.models.rendition_upload_to),
+        ),
+    ]
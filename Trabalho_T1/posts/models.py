@@ -1,7 +1,18 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import User
+from django.utils import timezone
 import mimetypes
 
+from .mediainfo import image_size, media_kind
+from .storage import attachment_storage, content_sha256
+
+
+class PostQuerySet(models.QuerySet):
+    def with_media(self, kind):
+        """Posts com ao menos um anexo do tipo `kind` (EXISTS em attachment_kind_post_idx)."""
+        return self.filter(models.Exists(Attachment.objects.filter(post=models.OuterRef("pk"), kind=kind)))
+
+
 class Post(models.Model):
     """Modelo de post na timeline."""
     author = models.ForeignKey(User, on_delete=models.CASCADE, related_name="posts")
@@ -9,36 +20,200 @@ class Post(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = PostQuerySet.as_manager()
+
     class Meta:
         """ Define a ordenação padrão dos posts: mais recentes primeiro. """
-        ordering = ["-created_at"]
+        ordering = ["-created_at", "-id"]
+        indexes = [
+            # Índice composto usado pela paginação por cursor da timeline
+            models.Index(fields=["-created_at", "-id"], name="post_created_id_idx"),
+            # Timeline por autor (/u/<username>/): filtro + ordenação no mesmo índice
+            models.Index(fields=["author", "-created_at", "-id"], name="post_author_created_id_idx"),
+        ]
 
     def __str__(self):
         return f"{self.author.username}: {self.message[:30]}"
 
+class AuthorStats(models.Model):
+    """
+    Contadores desnormalizados por usuário (cabeçalho do perfil sem COUNT(*)).
+    Mantidos pelos signals com UPDATE ... SET n = n + 1 na mesma transação da
+    escrita; `manage.py recount_author_stats` recalcula em caso de divergência.
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name="post_stats")
+    post_count = models.PositiveIntegerField(default=0)
+    attachment_count = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.user_id}: {self.post_count} posts, {self.attachment_count} anexos"
+
 def attachment_upload_to(instance, filename):
-    """ Salva o anexo separado por ano/mes/dia """
-    return f"attachments/{instance.post_id or 'tmp'}/{filename}"
+    """ Nome provisório: o caminho final vem do hash do conteúdo (ContentAddressedStorage) """
+    return f"attachments/{filename}"
 
 class Attachment(models.Model):
     """Modelo de anexo de arquivo para posts."""
+    RENDITIONS_PENDING = "pending"
+    RENDITIONS_PROCESSING = "processing"
+    RENDITIONS_DONE = "done"
+    RENDITIONS_FAILED = "failed"
+    RENDITIONS_STATUS_CHOICES = [
+        (RENDITIONS_PENDING, "Pendente"),
+        (RENDITIONS_PROCESSING, "Processando"),
+        (RENDITIONS_DONE, "Pronto"),
+        (RENDITIONS_FAILED, "Falhou"),
+    ]
+    KIND_IMAGE = "image"
+    KIND_AUDIO = "audio"
+    KIND_VIDEO = "video"
+    KIND_OTHER = "other"
+    KIND_CHOICES = [
+        (KIND_IMAGE, "Imagem"),
+        (KIND_AUDIO, "Áudio"),
+        (KIND_VIDEO, "Vídeo"),
+        (KIND_OTHER, "Outro"),
+    ]
+
     post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name="attachments")
-    file = models.FileField(upload_to=attachment_upload_to)
+    # Indexado: o servidor de mídia acha o Content-Type pelo caminho
+    file = models.FileField(upload_to=attachment_upload_to, storage=attachment_storage, db_index=True)
+    # SHA-256 do conteúdo; também conta quantas linhas compartilham o mesmo arquivo
+    sha256 = models.CharField(max_length=64, blank=True, db_index=True)
     original_name = models.CharField(max_length=255, blank=True)
     content_type = models.CharField(max_length=100, blank=True)
+    # Derivado do content_type no upload: templates e filtros (?media=) não comparam strings
+    kind = models.CharField(max_length=5, choices=KIND_CHOICES, default=KIND_OTHER)
     uploaded_at = models.DateTimeField(auto_now_add=True)
+    # Dimensões do original: imagens no upload (save), quadro do vídeo pelo worker de renditions
+    width = models.PositiveIntegerField(null=True, blank=True)
+    height = models.PositiveIntegerField(null=True, blank=True)
+    # Duração (s) de áudio/vídeo, preenchida pelo worker (ffprobe)
+    duration = models.FloatField(null=True, blank=True)
+    # Fila do worker de renditions (manage.py process_renditions)
+    renditions_status = models.CharField(
+        max_length=10, choices=RENDITIONS_STATUS_CHOICES, default=RENDITIONS_PENDING, db_index=True
+    )
 
     class Meta:
         """ Define a ordenação padrão dos anexos: ordem de upload. """
         ordering = ["id"]
+        indexes = [
+            # Timeline filtrada (?media=video): EXISTS (kind = ? AND post_id = ?) por índice
+            models.Index(fields=["kind", "post"], name="attachment_kind_post_idx"),
+        ]
 
     def save(self, *args, **kwargs):
-        if self.file and not self.content_type:
-            guess, _ = mimetypes.guess_type(self.file.name)
-            self.content_type = guess or ""
-        if self.file and not self.original_name:
-            self.original_name = getattr(self.file, "name", "") or self.original_name
+        new_file = bool(self.file) and not self.file._committed
+        # Metadados calculados uma vez (linha nova ou arquivo trocado), nunca nos saves do worker
+        if new_file or self._state.adding:
+            if self.file and not self.content_type:
+                guess, _ = mimetypes.guess_type(self.file.name)
+                self.content_type = guess or ""
+            if self.file and not self.original_name:
+                self.original_name = getattr(self.file, "name", "") or self.original_name
+            self.kind = media_kind(self.content_type)
+        if new_file:
+            # Arquivo novo: o hash define o caminho no storage e vai para a linha
+            self.sha256 = content_sha256(self.file.file)
+            size = image_size(self.file.file) if self.kind == self.KIND_IMAGE else None
+            self.width, self.height = size or (None, None)
+            self.duration = None
         super().save(*args, **kwargs)
+        if new_file:
+            # Um release_file concorrente pode ter apagado o arquivo reaproveitado pelo
+            # storage antes desta linha existir: confere depois do commit e regrava
+            storage, name, content = self.file.storage, self.file.name, self.file.file
+            transaction.on_commit(lambda: storage.ensure(name, content))
+
+    def __str__(self):
+        return self.original_name or self.file.name
+
+    # --- renditions (usam o cache do prefetch_related("attachments__renditions")) ---
+    def _renditions(self, fmt):
+        return [r for r in self.renditions.all() if r.format == fmt]
+
+    def _srcset(self, fmt):
+        return ", ".join(f"{r.file.url} {r.width}w" for r in self._renditions(fmt))
+
+    @property
+    def srcset_webp(self):
+        return self._srcset(Rendition.FORMAT_WEBP)
+
+    @property
+    def srcset_jpeg(self):
+        return self._srcset(Rendition.FORMAT_JPEG)
+
+    @property
+    def fallback_rendition(self):
+        """Maior JPEG até 640px: o src padrão para navegadores sem srcset/WebP."""
+        jpegs = self._renditions(Rendition.FORMAT_JPEG)
+        small = [r for r in jpegs if r.width <= 640]
+        return (small or jpegs or [None])[-1]
+
+    @property
+    def poster(self):
+        """Quadro do vídeo em JPEG (maior largura disponível)."""
+        jpegs = self._renditions(Rendition.FORMAT_JPEG)
+        return jpegs[-1] if jpegs else None
+
+def rendition_upload_to(instance, filename):
+    """ Renditions ficam separadas dos originais, por anexo """
+    return f"renditions/{instance.attachment_id}/{filename}"
+
+class Rendition(models.Model):
+    """Versão derivada (redimensionada) de um anexo de imagem ou vídeo."""
+    FORMAT_WEBP = "webp"
+    FORMAT_JPEG = "jpeg"
+
+    attachment = models.ForeignKey(Attachment, on_delete=models.CASCADE, related_name="renditions")
+    file = models.FileField(upload_to=rendition_upload_to, db_index=True)
+    format = models.CharField(max_length=10)
+    width = models.PositiveIntegerField()
+    height = models.PositiveIntegerField()
+
+    class Meta:
+        """ Menor largura primeiro (ordem natural do srcset). """
+        ordering = ["width", "id"]
+
+    def __str__(self):
+        return f"{self.attachment_id} {self.width}w {self.format}"
+
+
+class Job(models.Model):
+    """
+    Tarefa em segundo plano (posts.jobs): criada pela view na mesma transação da
+    escrita e executada por `manage.py run_worker`. Jobs concluídos são apagados;
+    os que esgotam as tentativas ficam como "failed" para inspeção no admin.
+    """
+    QUEUED = "queued"
+    RUNNING = "running"
+    FAILED = "failed"
+    STATUS_CHOICES = [
+        (QUEUED, "Na fila"),
+        (RUNNING, "Executando"),
+        (FAILED, "Falhou"),
+    ]
+
+    name = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=5)
+    # Próxima execução permitida (agendamento e backoff entre tentativas)
+    run_at = models.DateTimeField(default=timezone.now)
+    locked_by = models.CharField(max_length=100, blank=True)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        """ Ordem de execução: mais antigos primeiro. """
+        ordering = ["run_at", "id"]
+        indexes = [
+            # Reserva do worker: status = 'queued' AND run_at <= agora ORDER BY run_at
+            models.Index(fields=["status", "run_at"], name="job_status_run_at_idx"),
+        ]
 
     def __str__(self):
-        return self.original_name or self.file.name
\ No newline at end of file
+        return f"{self.name} #{self.pk} ({self.status})"
@@ -0,0 +1,131 @@
+import base64
+import json
+
+from django.db.models import Q
+from django.http import Http404
+
+
+def encode_cursor(values):
+    """Serializa os valores das chaves de ordenação em um cursor opaco para a URL."""
+    raw = json.dumps([v.isoformat() if hasattr(v, "isoformat") else v for v in values])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor, size):
+    """Inverso de encode_cursor; cursor malformado vira 404 (como o Paginator do Django)."""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        if not isinstance(values, list) or len(values) != size:
+            raise ValueError
+        return values
+    except Exception:
+        raise Http404("Cursor de paginação inválido.")
+
+
+class KeysetPage:
+    """Página de uma paginação por cursor (sem COUNT e sem OFFSET)."""
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+
+class KeysetPaginator:
+    """
+    Paginação por cursor sobre campos em ordem decrescente (padrão: created_at, id).
+    O cursor guarda os valores das chaves do último/primeiro item da página, então
+    cada página é um range scan no índice composto, com custo igual em qualquer
+    profundidade.
+    """
+    def __init__(self, queryset, per_page, keys=("created_at", "id")):
+        self.queryset = queryset
+        self.per_page = per_page
+        self.keys = tuple(keys)
+
+    # --- cursores ---------------------------------------------------------
+    def encode_cursor(self, obj):
+        return encode_cursor([getattr(obj, k) for k in self.keys])
+
+    def decode_cursor(self, cursor):
+        values = decode_cursor(cursor, len(self.keys))
+        opts = self.queryset.model._meta
+        try:
+            return [opts.get_field(k).to_python(v) for k, v in zip(self.keys, values)]
+        except Exception:
+            raise Http404("Cursor de paginação inválido.")
+
+    def _seek(self, values, older):
+        """Filtro (k1, k2, ...) < valores (ou > para páginas mais novas)."""
+        op = "lt" if older else "gt"
+        q = Q()
+        for i, key in enumerate(self.keys):
+            cond = Q(**{f"{key}__{op}": values[i]})
+            for prev, value in zip(self.keys[:i], values[:i]):
+                cond &= Q(**{prev: value})
+            q |= cond
+        return q
+
+    # --- páginas ----------------------------------------------------------
+    def _window(self, after, before):
+        """Queryset com LIMIT n+1 na direção pedida (mais antigos por padrão)."""
+        n = self.per_page
+        if before:
+            qs = self.queryset.filter(self._seek(self.decode_cursor(before), older=False))
+            return qs.order_by(*self.keys)[:n + 1]
+        qs = self.queryset
+        if after:
+            qs = qs.filter(self._seek(self.decode_cursor(after), older=True))
+        return qs.order_by(*[f"-{k}" for k in self.keys])[:n + 1]
+
+    def _build_page(self, rows, after, before):
+        n = self.per_page
+        has_more = len(rows) > n
+        rows = rows[:n]
+        if before:
+            rows = rows[::-1]
+            next_cursor = self.encode_cursor(rows[-1]) if rows else None
+            previous_cursor = self.encode_cursor(rows[0]) if rows and has_more else None
+        else:
+            next_cursor = self.encode_cursor(rows[-1]) if rows and has_more else None
+            previous_cursor = self.encode_cursor(rows[0]) if rows and after else None
+        return KeysetPage(rows, next_cursor, previous_cursor)
+
+    def page(self, after=None, before=None):
+        """Página após o cursor `after` (mais antigos) ou antes de `before` (mais novos)."""
+        return self._build_page(list(self._window(after, before)), after, before)
+
+    async def apage(self, after=None, before=None):
+        """Versão async de page(), para views async (ORM async do Django)."""
+        rows = [obj async for obj in self._window(after, before)]
+        return self._build_page(rows, after, before)
+
+
+class KeysetPaginationMixin:
+    """
+    Troca a paginação por OFFSET do ListView pela paginação por cursor.
+    Usa os parâmetros ?after=<cursor> (mais antigos) e ?before=<cursor> (mais novos).
+    """
+    keyset_keys = ("created_at", "id")
+
+    def paginate_queryset(self, queryset, page_size):
+        paginator = KeysetPaginator(queryset, page_size, keys=self.keyset_keys)
+        page = paginator.page(
+            after=self.request.GET.get("after"),
+            before=self.request.GET.get("before"),
+        )
+        return paginator, page, page.object_list, page.has_other_pages()
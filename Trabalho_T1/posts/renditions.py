@@ -0,0 +1,148 @@
+"""
+Geração de renditions (miniaturas WebP/JPEG e poster de vídeo) e duração de
+áudio/vídeo fora do request. Executado pelo worker `manage.py process_renditions`.
+"""
+import io
+import logging
+import os
+import shutil
+import subprocess
+import tempfile
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+
+from .mediainfo import probe_duration
+from .models import Attachment, Rendition
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Pillow é opcional: sem ele, o template usa o original
+    Image = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WIDTHS = (320, 640, 1280)
+SAVE_OPTIONS = {
+    Rendition.FORMAT_WEBP: ("WEBP", {"quality": 80, "method": 4}),
+    Rendition.FORMAT_JPEG: ("JPEG", {"quality": 82, "optimize": True, "progressive": True}),
+}
+
+
+def _target_widths(original_width):
+    widths = getattr(settings, "ATTACHMENT_RENDITION_WIDTHS", DEFAULT_WIDTHS)
+    # Nunca amplia; se o original for menor que todas, gera uma no tamanho dele
+    return [w for w in widths if w < original_width] or [original_width]
+
+
+def _video_frame(attachment):
+    """Extrai um quadro do vídeo com ffmpeg (se disponível) e devolve uma imagem PIL."""
+    ffmpeg = shutil.which("ffmpeg")
+    if not ffmpeg:
+        return None
+    try:
+        source = attachment.file.path
+    except NotImplementedError:  # storage remoto: sem caminho local
+        return None
+    with tempfile.TemporaryDirectory() as tmp:
+        out = os.path.join(tmp, "poster.png")
+        subprocess.run(
+            [ffmpeg, "-loglevel", "error", "-ss", "1", "-i", source, "-frames:v", "1", out],
+            check=True, timeout=60,
+        )
+        if not os.path.exists(out):
+            return None
+        frame = Image.open(out)
+        frame.load()
+        return frame
+
+
+def _open_source(attachment):
+    if attachment.kind == Attachment.KIND_IMAGE:
+        with attachment.file.open("rb") as f:
+            img = Image.open(f)
+            img.load()
+        # Respeita a orientação EXIF das fotos de celular
+        return ImageOps.exif_transpose(img)
+    if attachment.kind == Attachment.KIND_VIDEO:
+        return _video_frame(attachment)
+    return None
+
+
+def generate_renditions(attachment):
+    """Gera as renditions de um anexo. Retorna quantas foram criadas."""
+    if Image is None:
+        return 0
+    img = _open_source(attachment)
+    if img is None:
+        return 0
+
+    attachment.width, attachment.height = img.size
+    if img.mode not in ("RGB", "L"):
+        img = img.convert("RGB")
+
+    # Anexos de vídeo só recebem o poster em JPEG
+    formats = [Rendition.FORMAT_JPEG]
+    if attachment.kind == Attachment.KIND_IMAGE:
+        formats.insert(0, Rendition.FORMAT_WEBP)
+
+    # Regeração: apaga também os arquivos, senão os novos ganham sufixo e os antigos ficam órfãos
+    for old in attachment.renditions.all():
+        old.file.delete(save=False)
+    attachment.renditions.all().delete()
+    created = 0
+    for width in _target_widths(img.width):
+        height = max(1, round(img.height * width / img.width))
+        resized = img.resize((width, height), Image.LANCZOS) if width != img.width else img
+        for fmt in formats:
+            pil_format, options = SAVE_OPTIONS[fmt]
+            buf = io.BytesIO()
+            resized.save(buf, pil_format, **options)
+            rendition = Rendition(attachment=attachment, format=fmt, width=width, height=height)
+            rendition.file.save(f"{width}.{fmt}", ContentFile(buf.getvalue()), save=True)
+            created += 1
+    return created
+
+
+def claim_pending(batch_size):
+    """Reserva anexos pendentes; o UPDATE condicional evita dois workers no mesmo anexo."""
+    ids = list(
+        Attachment.objects.filter(renditions_status=Attachment.RENDITIONS_PENDING)
+        .order_by("id").values_list("id", flat=True)[:batch_size]
+    )
+    claimed = []
+    for pk in ids:
+        if Attachment.objects.filter(pk=pk, renditions_status=Attachment.RENDITIONS_PENDING).update(
+            renditions_status=Attachment.RENDITIONS_PROCESSING
+        ):
+            claimed.append(pk)
+    return Attachment.objects.filter(pk__in=claimed)
+
+
+def _fill_duration(attachment):
+    if attachment.kind in (Attachment.KIND_AUDIO, Attachment.KIND_VIDEO) and attachment.duration is None:
+        try:
+            attachment.duration = probe_duration(attachment.file.path)
+        except NotImplementedError:  # storage remoto: sem caminho local
+            pass
+
+
+def process_attachment(attachment):
+    try:
+        _fill_duration(attachment)
+        generate_renditions(attachment)
+        attachment.renditions_status = Attachment.RENDITIONS_DONE
+    except Exception:
+        logger.exception("Falha ao gerar renditions do anexo %s", attachment.pk)
+        attachment.renditions_status = Attachment.RENDITIONS_FAILED
+    # save() dispara o signal que invalida o card em cache do post
+    attachment.save(update_fields=["renditions_status", "width", "height", "duration"])
+
+
+def process_pending(batch_size=20):
+    """Processa um lote de anexos pendentes. Retorna quantos foram processados."""
+    done = 0
+    for attachment in claim_pending(batch_size):
+        process_attachment(attachment)
+        done += 1
+    return done
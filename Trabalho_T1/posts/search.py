@@ -0,0 +1,116 @@
+import math
+import re
+
+from django.db import connection
+from django.http import Http404
+
+from .models import Post
+from .pagination import encode_cursor, decode_cursor
+
+# Configuração de texto do Postgres usada no índice GIN (ver migração 0004)
+PG_TS_CONFIG = "portuguese"
+MAX_TERMS = 8
+
+
+def _terms(query):
+    """Só palavras: a sintaxe de busca do usuário nunca chega ao MATCH/tsquery."""
+    return re.findall(r"\w+", query or "")[:MAX_TERMS]
+
+
+def _fts5_query(terms):
+    # Cada termo entre aspas (E implícito); o último também casa como prefixo
+    quoted = [f'"{t}"' for t in terms]
+    quoted[-1] += "*"
+    return " ".join(quoted)
+
+
+def match_subquery(query):
+    """
+    (sql, params) de um SELECT com os ids de posts que casam com a busca, usando o
+    índice de texto do banco atual. None se não houver termos ou índice.
+    """
+    terms = _terms(query)
+    if not terms:
+        return None
+    if connection.vendor == "sqlite":
+        return "SELECT rowid FROM posts_post_fts WHERE posts_post_fts MATCH %s", [_fts5_query(terms)]
+    if connection.vendor == "postgresql":
+        return (
+            f"SELECT id FROM posts_post WHERE to_tsvector('{PG_TS_CONFIG}', message) "
+            f"@@ plainto_tsquery('{PG_TS_CONFIG}', %s)",
+            [" ".join(terms)],
+        )
+    return None
+
+
+def _ranked_sql(terms):
+    """SELECT (id, score) com maior score = mais relevante."""
+    if connection.vendor == "sqlite":
+        # bm25() é menor quanto mais relevante; negado para ordenar igual ao Postgres
+        return (
+            "SELECT rowid AS id, -bm25(posts_post_fts) AS score FROM posts_post_fts "
+            "WHERE posts_post_fts MATCH %s",
+            [_fts5_query(terms)],
+        )
+    if connection.vendor == "postgresql":
+        return (
+            f"SELECT id, ts_rank(to_tsvector('{PG_TS_CONFIG}', message), q) AS score "
+            f"FROM posts_post, plainto_tsquery('{PG_TS_CONFIG}', %s) q "
+            f"WHERE to_tsvector('{PG_TS_CONFIG}', message) @@ q",
+            [" ".join(terms)],
+        )
+    return None
+
+
+def _decode_after(after):
+    """(score, id) do cursor; os valores vão como parâmetros do SQL, então só números."""
+    score, last_id = decode_cursor(after, 2)
+    if (
+        isinstance(score, bool) or not isinstance(score, (int, float)) or not math.isfinite(score)
+        or isinstance(last_id, bool) or not isinstance(last_id, int)
+    ):
+        raise Http404("Cursor de paginação inválido.")
+    return score, last_id
+
+
+def search_posts(query, after=None, limit=20):
+    """
+    Busca ranqueada com paginação por cursor em (score, id).
+    Retorna (posts, next_cursor); posts já vêm com autor e anexos carregados.
+    """
+    terms = _terms(query)
+    base = Post.objects.select_related("author").prefetch_related("attachments__renditions")
+    if not terms:
+        return [], None
+
+    ranked = _ranked_sql(terms)
+    if ranked is None:
+        # Bancos sem índice de texto: LIKE simples, ordenado por id
+        qs = base.filter(message__icontains=" ".join(terms)).order_by("-id")
+        if after:
+            qs = qs.filter(id__lt=_decode_after(after)[1])
+        rows = list(qs[:limit + 1])
+        next_cursor = encode_cursor([0, rows[limit - 1].pk]) if len(rows) > limit else None
+        return rows[:limit], next_cursor
+
+    sql, params = ranked
+    sql = f"SELECT id, score FROM ({sql}) AS ranked"
+    if after:
+        score, last_id = _decode_after(after)
+        sql += " WHERE score < %s OR (score = %s AND id < %s)"
+        params += [score, score, last_id]
+    sql += " ORDER BY score DESC, id DESC LIMIT %s"
+    params.append(limit + 1)
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        hits = cursor.fetchall()
+
+    page = hits[:limit]
+    by_id = base.in_bulk([pk for pk, _ in page])
+    posts = [by_id[pk] for pk, _ in page if pk in by_id]
+    next_cursor = None
+    if len(hits) > limit:
+        last_id, last_score = page[-1]
+        next_cursor = encode_cursor([last_score, last_id])
+    return posts, next_cursor
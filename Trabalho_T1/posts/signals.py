@@ -0,0 +1,121 @@
+from functools import partial
+
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import F, Subquery
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from config.auth import invalidate_cached_user
+
+from .cache import bump_post_version, bump_author_version, bump_timeline_version
+from .events import publish_post
+from .jobs import enqueue
+from .models import Post, Attachment, AuthorStats
+
+
+@receiver([post_save, post_delete], sender=Post)
+def invalidate_post_caches(sender, instance, **kwargs):
+    bump_post_version(instance.pk)
+    bump_timeline_version()
+
+
+@receiver(post_save, sender=Post)
+def publish_saved_post(sender, instance, created, raw=False, **kwargs):
+    # Depois do commit: o card já sai com os anexos salvos no mesmo atomic (formset)
+    if not raw:
+        event = "post" if created else "edit"
+        transaction.on_commit(partial(publish_post, event, instance.pk), robust=True)
+
+
+@receiver(post_delete, sender=Post)
+def publish_deleted_post(sender, instance, **kwargs):
+    transaction.on_commit(partial(publish_post, "delete", instance.pk), robust=True)
+
+
+@receiver([post_save, post_delete], sender=Attachment)
+def invalidate_attachment_post_caches(sender, instance, **kwargs):
+    bump_post_version(instance.post_id)
+    bump_timeline_version()
+
+
+@receiver(post_save, sender=User)
+def invalidate_author_caches(sender, instance, update_fields=None, **kwargs):
+    # Login salva só last_login; só invalida quando o username pode ter mudado.
+    if update_fields is not None and "username" not in update_fields:
+        return
+    bump_author_version(instance.pk)
+    bump_timeline_version()
+
+
+@receiver([post_save, post_delete], sender=User)
+def invalidate_cached_user_on_change(sender, instance, **kwargs):
+    # Qualquer save (senha, is_active, is_staff...) descarta a cópia em cache. Grupos e
+    # permissões não ficam no objeto em cache: o ModelBackend os consulta por request.
+    invalidate_cached_user(instance.pk)
+
+
+@receiver(post_delete, sender=Attachment)
+def release_attachment_file(sender, instance, **kwargs):
+    if not instance.file:
+        return
+    # Job na mesma transação da exclusão: um rollback não deixa linhas apontando
+    # para arquivo apagado, e o unlink sai do tempo de resposta do DeleteView
+    enqueue("posts.release_file", name=instance.file.name, sha256=instance.sha256, attachment_id=instance.pk)
+
+
+@receiver(post_save, sender=Attachment)
+def enqueue_renditions(sender, instance, created, raw=False, **kwargs):
+    if created and not raw and instance.file and instance.renditions_status == Attachment.RENDITIONS_PENDING:
+        enqueue("posts.renditions", attachment_id=instance.pk)
+
+
+# ---------------------------
+# Contadores por autor (AuthorStats)
+# ---------------------------
+def _bump_stats(stats, **deltas):
+    """UPDATE atômico (n = n + delta); nunca lê o valor para a aplicação."""
+    return stats.update(**{field: F(field) + delta for field, delta in deltas.items()})
+
+
+@receiver(post_save, sender=User)
+def create_author_stats(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        AuthorStats.objects.get_or_create(user=instance)
+
+
+@receiver(post_save, sender=Post)
+def count_created_post(sender, instance, created, raw=False, **kwargs):
+    if not created or raw:
+        return
+    stats = AuthorStats.objects.filter(user_id=instance.author_id)
+    if not _bump_stats(stats, post_count=1):
+        # Usuário anterior à migração/criado em massa: cria a linha e conta de novo
+        AuthorStats.objects.get_or_create(user_id=instance.author_id)
+        _bump_stats(stats, post_count=1)
+
+
+@receiver(post_delete, sender=Post)
+def count_deleted_post(sender, instance, **kwargs):
+    # Na exclusão em cascata do usuário a linha já foi removida: UPDATE de 0 linhas
+    stats = AuthorStats.objects.filter(user_id=instance.author_id, post_count__gt=0)
+    _bump_stats(stats, post_count=-1)
+
+
+def _post_author_stats(post_id):
+    # Subquery em vez de carregar o post: na cascata Post -> Attachment o post
+    # ainda existe quando o post_delete do anexo dispara
+    return AuthorStats.objects.filter(
+        user_id=Subquery(Post.objects.filter(pk=post_id).values("author_id")[:1])
+    )
+
+
+@receiver(post_save, sender=Attachment)
+def count_created_attachment(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        _bump_stats(_post_author_stats(instance.post_id), attachment_count=1)
+
+
+@receiver(post_delete, sender=Attachment)
+def count_deleted_attachment(sender, instance, **kwargs):
+    _bump_stats(_post_author_stats(instance.post_id).filter(attachment_count__gt=0), attachment_count=-1)
@@ -0,0 +1,126 @@
+import hashlib
+import os
+import tempfile
+
+from django.core.files.storage import FileSystemStorage, storages
+from django.core.files.move import file_move_safe
+
+from .uploadhandlers import sniff_content_type
+
+# Extensão gravada no storage para cada tipo detectado; tipo desconhecido fica sem extensão
+MEDIA_EXTENSIONS = {
+    "image/jpeg": ".jpg", "image/png": ".png", "image/gif": ".gif", "image/webp": ".webp",
+    "audio/mpeg": ".mp3", "audio/mp3": ".mp3", "audio/ogg": ".ogg", "audio/wav": ".wav",
+    "video/mp4": ".mp4", "video/webm": ".webm", "video/ogg": ".ogv",
+}
+
+
+def content_sha256(content):
+    """SHA-256 do arquivo; reaproveita o hash calculado no upload handler, se houver."""
+    digest = getattr(content, "sha256", None)
+    if digest:
+        return digest
+    hasher = hashlib.sha256()
+    if hasattr(content, "seek"):
+        content.seek(0)
+    for chunk in content.chunks():
+        hasher.update(chunk)
+    if hasattr(content, "seek"):
+        content.seek(0)
+    digest = hasher.hexdigest()
+    try:
+        content.sha256 = digest
+    except AttributeError:
+        pass
+    return digest
+
+
+def sniffed_extension(content):
+    """Extensão pelos magic bytes do conteúdo; o nome enviado pelo cliente nunca conta."""
+    if hasattr(content, "seek"):
+        content.seek(0)
+    head = content.read(64)
+    if hasattr(content, "seek"):
+        content.seek(0)
+    return MEDIA_EXTENSIONS.get(sniff_content_type(head, getattr(content, "content_type", "") or ""), "")
+
+
+def cas_name(digest, ext="", prefix="attachments"):
+    """attachments/ab/cd/abcd…<ext>: dois níveis de shard para diretórios pequenos."""
+    return f"{prefix}/{digest[:2]}/{digest[2:4]}/{digest}{ext.lower()}"
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    Storage endereçado por conteúdo: o caminho vem do SHA-256 dos bytes, então
+    uploads idênticos viram um único arquivo e a regravação é pulada. Os arquivos
+    são compartilhados entre linhas de Attachment (contagem via Attachment.sha256).
+    """
+    def get_available_name(self, name, max_length=None):
+        # O nome final é decidido em _save(); nunca acrescenta sufixos aleatórios.
+        return name
+
+    def _save(self, name, content):
+        name = cas_name(content_sha256(content), sniffed_extension(content))
+        try:
+            # Mesmo conteúdo já armazenado: nada a gravar. Renova o mtime para o
+            # gc_media (--min-age) não apagar um arquivo que acabou de ser reaproveitado.
+            os.utime(self.path(name))
+            return name
+        except FileNotFoundError:
+            pass  # ainda não existe (ou um release() acabou de tirá-lo do lugar)
+
+        full_path = self.path(name)
+        directory = os.path.dirname(full_path)
+        os.makedirs(directory, exist_ok=True)
+        if hasattr(content, "temporary_file_path") and os.path.exists(content.temporary_file_path()):
+            # Upload já está em disco (StreamingAttachmentUploadHandler): só move
+            file_move_safe(content.temporary_file_path(), full_path, allow_overwrite=True)
+        else:
+            # Grava em arquivo temporário no mesmo diretório e renomeia (atômico);
+            # dois uploads simultâneos do mesmo conteúdo gravam bytes idênticos.
+            fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".upload-")
+            try:
+                with os.fdopen(fd, "wb") as tmp:
+                    if hasattr(content, "seek"):
+                        content.seek(0)
+                    for chunk in content.chunks():
+                        tmp.write(chunk)
+                os.replace(tmp_path, full_path)
+            except BaseException:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+        if self.file_permissions_mode is not None:
+            os.chmod(full_path, self.file_permissions_mode)
+        return name
+
+    # Reaproveitar (_save) e apagar (release) o mesmo arquivo correm entre si: o
+    # upload pode achar o arquivo antes de o worker conferir as referências e só
+    # gravar a linha depois. Cada lado confere de novo depois do seu passo: o
+    # worker tira o arquivo do lugar e o devolve se surgiu referência; o upload,
+    # após o commit, regrava o arquivo se ele sumiu.
+    def ensure(self, name, content):
+        """Regrava `name` a partir de `content` se ele não estiver mais no storage."""
+        if not self.exists(name):
+            self._save(name, content)
+
+    def release(self, name, is_referenced):
+        """Apaga `name` se `is_referenced()` ainda for falso com o arquivo fora do lugar."""
+        path = self.path(name)
+        moved = os.path.join(os.path.dirname(path), f".release-{os.getpid()}-{os.path.basename(path)}")
+        try:
+            os.replace(path, moved)
+        except FileNotFoundError:
+            return False
+        if is_referenced():
+            # Reaproveitado no meio do caminho: devolve (se o upload já regravou, os bytes são os mesmos)
+            os.replace(moved, path)
+            return False
+        os.remove(moved)
+        return True
+
+
+def attachment_storage():
+    """Storage dos anexos (alias "attachments" em settings.STORAGES)."""
+    return storages["attachments"]
@@ -0,0 +1,82 @@
+"""Tarefas executadas pelo `manage.py run_worker` (registradas em posts.jobs.TASKS)."""
+import os
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.tokens import default_token_generator
+from django.core.mail import EmailMultiAlternatives
+from django.template import loader
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_encode
+
+from .jobs import task
+from .models import Attachment, Rendition, rendition_upload_to
+from .renditions import Image, process_attachment
+
+
+@task("posts.release_file")
+def release_file(name, sha256="", attachment_id=None):
+    """
+    Apaga o arquivo do anexo só quando nenhum outro Attachment aponta para ele,
+    e as renditions do anexo excluído (renditions/<id>/ pertence só a ele).
+    """
+    refs = Attachment.objects.filter(sha256=sha256) if sha256 else Attachment.objects.filter(file=name)
+    if not refs.exists():
+        # Confere de novo com o arquivo fora do lugar (corrida com um upload do mesmo conteúdo)
+        Attachment._meta.get_field("file").storage.release(name, refs.exists)
+    if attachment_id is not None:
+        storage = Rendition._meta.get_field("file").storage
+        directory = rendition_upload_to(Rendition(attachment_id=attachment_id), "").rstrip("/")
+        if storage.exists(directory):
+            for filename in storage.listdir(directory)[1]:
+                storage.delete(f"{directory}/{filename}")
+            try:
+                os.rmdir(storage.path(directory))
+            except (OSError, NotImplementedError):
+                pass  # sobrou algo (ou storage sem path): o gc_media cuida depois
+
+
+def _reset_renditions(attachment_id):
+    # Worker morreu no meio: sem isto o UPDATE condicional da nova tentativa não casa nada
+    Attachment.objects.filter(pk=attachment_id, renditions_status=Attachment.RENDITIONS_PROCESSING).update(
+        renditions_status=Attachment.RENDITIONS_PENDING
+    )
+
+
+@task("posts.renditions", on_stale=_reset_renditions)
+def generate_renditions(attachment_id):
+    """Miniaturas logo após o upload (o process_renditions cobre os anexos antigos)."""
+    if Image is None:
+        return  # sem Pillow o anexo fica pendente e o template usa o original
+    # Mesmo UPDATE condicional do claim_pending: não disputa com o process_renditions
+    claimed = Attachment.objects.filter(pk=attachment_id, renditions_status=Attachment.RENDITIONS_PENDING).update(
+        renditions_status=Attachment.RENDITIONS_PROCESSING
+    )
+    if claimed:
+        process_attachment(Attachment.objects.get(pk=attachment_id))
+
+
+@task("mail.send", max_attempts=8)
+def send_mail(subject, body, to, from_email=None, html=None):
+    """Envia um e-mail já renderizado (SMTP lento/instável fica fora da requisição)."""
+    message = EmailMultiAlternatives(subject, body, from_email, to)
+    if html:
+        message.attach_alternative(html, "text/html")
+    message.send()
+
+
+@task("mail.password_reset", max_attempts=8)
+def send_password_reset(user_id, to, context, subject_template_name, email_template_name,
+                        html_email_template_name=None, from_email=None):
+    """Renderiza o e-mail de recuperação com um token gerado agora (o payload não tem o link)."""
+    user = get_user_model()._default_manager.filter(pk=user_id, is_active=True).first()
+    if user is None:
+        return  # removido/desativado desde o pedido: não há o que recuperar
+    context = {
+        **context, "user": user,
+        "uid": urlsafe_base64_encode(force_bytes(user.pk)),
+        "token": default_token_generator.make_token(user),
+    }
+    subject = "".join(loader.render_to_string(subject_template_name, context).splitlines())
+    body = loader.render_to_string(email_template_name, context)
+    html = loader.render_to_string(html_email_template_name, context) if html_email_template_name else None
+    send_mail(subject, body, [to], from_email=from_email, html=html)
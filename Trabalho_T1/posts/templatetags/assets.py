@@ -0,0 +1,38 @@
+import functools
+
+from django import template
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.utils.html import format_html
+from django.utils.safestring import mark_safe
+
+from posts.cssbundle import BUNDLE_NAME, CRITICAL_NAME
+
+register = template.Library()
+
+
+@register.simple_tag
+def css_bundle():
+    """Uso: {% css_bundle %} no <head> — CSS crítico embutido + bundle com hash carregado sem bloquear."""
+    return _css_bundle()
+
+
+@functools.cache
+def _css_bundle():
+    try:
+        href = staticfiles_storage.url(BUNDLE_NAME)
+        with staticfiles_storage.open(staticfiles_storage.stored_name(CRITICAL_NAME)) as f:
+            critical = f.read().decode()
+    except (ValueError, OSError):
+        # Bundle ainda não gerado (dev sem collectstatic, testes): Bootstrap do CDN, como antes
+        return format_html(
+            '<link href="{}" rel="stylesheet" integrity="{}" crossorigin="anonymous">',
+            settings.CSS_VENDOR_URL, settings.CSS_VENDOR_INTEGRITY,
+        )
+    # O CSS vem do nosso build (não de usuários): pode ir cru dentro do <style>
+    return format_html(
+        '<style>{}</style>\n'
+        '<link rel="stylesheet" href="{}" media="print" onload="this.media=\'all\'">\n'
+        '<noscript><link rel="stylesheet" href="{}"></noscript>',
+        mark_safe(critical), href, href,
+    )
@@ -0,0 +1,11 @@
+from django import template
+
+from posts.cache import render_post_card
+
+register = template.Library()
+
+
+@register.simple_tag
+def post_card(post, variant="list"):
+    """Uso: {% post_card p "list" %} — corpo do card com cache de fragmento."""
+    return render_post_card(post, variant)
@@ -1,3 +1,1428 @@
-from django.test import TestCase
+import ast
+import gzip
+import hashlib
+import io
+import json
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import timedelta
+from unittest import mock, skipIf, skipUnless
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core import mail
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import connection, transaction
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.template import Template, Context
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from .api import _event_stream
+from .cssbundle import check_integrity, purge, vendor_path
+from .events import RESET, Subscription, broadcaster, publish_post
+from .jobs import Worker, _beat, claim, enqueue, queue_stats, recover_stale, task
+from .models import Post, Attachment, AuthorStats, Job, Rendition
+from .pagination import encode_cursor
+from .renditions import Image, process_pending
+from .templatetags.assets import _css_bundle
+from .transfer import copy_media
+from .uploadhandlers import sniff_content_type
+
+
+class QueryBudgetMixin:
+    """
+    Harness de orçamento de queries: falha se uma view passar do orçamento ou se o
+    número de queries crescer junto com o volume de dados (sinal de N+1).
+    """
+    def seed_posts(self, n, author=None, attachments_per_post=2):
+        author = author or User.objects.get_or_create(username="seed")[0]
+        posts = Post.objects.bulk_create([Post(author=author, message=f"seed {i}") for i in range(n)])
+        Attachment.objects.bulk_create([
+            Attachment(post=p, file=f"attachments/{p.pk}/{j}.jpg", content_type="image/jpeg")
+            for p in posts for j in range(attachments_per_post)
+        ])
+        return posts
+
+    def count_queries(self, url):
+        # cache frio: mede o custo real de renderização, não o do cache de página
+        cache.clear()
+        url = url() if callable(url) else url
+        with CaptureQueriesContext(connection) as ctx:
+            resp = self.client.get(url)
+        self.assertEqual(resp.status_code, 200)
+        return len(ctx.captured_queries)
+
+    def assertQueryBudget(self, url, budget, grow_by=15):
+        """`url` pode ser callable para ser resolvida de novo após o crescimento dos dados."""
+        before = self.count_queries(url)
+        self.assertLessEqual(before, budget, f"{url}: {before} queries (orçamento {budget})")
+        self.seed_posts(grow_by)
+        after = self.count_queries(url)
+        self.assertEqual(before, after, f"{url}: queries cresceram com os dados ({before} -> {after})")
+
+
+class KeysetPaginationTests(TestCase):
+    """Paginação por cursor da timeline pública."""
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("alice", password="x")
+        Post.objects.bulk_create([Post(author=cls.user, message=f"post {i}") for i in range(45)])
+
+    def setUp(self):
+        cache.clear()
+
+    def test_walks_all_pages_without_gaps_or_duplicates(self):
+        seen, url = [], reverse("posts:list")
+        while url:
+            resp = self.client.get(url)
+            self.assertEqual(resp.status_code, 200)
+            seen.extend(p.pk for p in resp.context["posts"])
+            page = resp.context["page_obj"]
+            url = f"{reverse('posts:list')}?after={page.next_cursor}" if page.has_next() else None
+        expected = list(Post.objects.order_by("-created_at", "-id").values_list("pk", flat=True))
+        self.assertEqual(seen, expected)
+
+    def test_before_cursor_returns_previous_page(self):
+        first = self.client.get(reverse("posts:list")).context["page_obj"]
+        second = self.client.get(reverse("posts:list"), {"after": first.next_cursor}).context["page_obj"]
+        back = self.client.get(reverse("posts:list"), {"before": second.previous_cursor}).context["page_obj"]
+        self.assertEqual([p.pk for p in back], [p.pk for p in first])
+        self.assertFalse(back.has_previous())
+
+    def test_no_count_query(self):
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(reverse("posts:list"))
+        self.assertFalse(any("COUNT(" in q["sql"] for q in ctx.captured_queries))
+
+    def test_invalid_cursor_is_404(self):
+        resp = self.client.get(reverse("posts:list"), {"after": "lixo!"})
+        self.assertEqual(resp.status_code, 404)
+
+
+class QueryBudgetTests(QueryBudgetMixin, TestCase):
+    """Views públicas devem carregar uma página inteira em número fixo de queries."""
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user("bob", password="x")
+        self.seed_posts(5, author=self.user)
+
+    def latest_detail_url(self):
+        return reverse("posts:detail", args=[Post.objects.latest("created_at", "id").pk])
+
+    def test_list_anonymous(self):
+        # posts + anexos + renditions, + Max(updated_at) para o Last-Modified com o cache frio
+        self.assertQueryBudget(reverse("posts:list"), 4)
+
+    def test_list_authenticated(self):
+        self.client.force_login(self.user)
+        # + sessão e usuário, sem cache de página
+        self.assertQueryBudget(reverse("posts:list"), 5)
+
+    def test_detail(self):
+        # + consulta pela PK para ETag/Last-Modified
+        self.assertQueryBudget(self.latest_detail_url, 4)
+
+    def test_login_recent_posts(self):
+        self.assertQueryBudget(reverse("login"), 2)
+
+    def test_author_timeline(self):
+        self.seed_posts(5)  # cresce junto com o autor "seed"
+        # + usuário com contadores (select_related), sem COUNT(*)
+        self.assertQueryBudget(reverse("posts:author", args=["seed"]), 5)
+
+
+class PostCardCacheTests(TestCase):
+    """Cache de fragmentos dos cards com invalidação por signals."""
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user("carol", password="x")
+        self.post = Post.objects.create(author=self.user, message="original")
+
+    def render(self):
+        return self.client.get(reverse("posts:detail", args=[self.post.pk])).content.decode()
+
+    def test_fragment_is_reused(self):
+        self.render()
+        with mock.patch("posts.cache.render_to_string") as rts:
+            self.assertIn("original", self.render())
+        rts.assert_not_called()
+
+    def test_post_edit_invalidates(self):
+        self.render()
+        self.post.message = "editado"
+        self.post.save()
+        self.assertIn("editado", self.render())
+
+    def test_attachment_change_invalidates(self):
+        self.render()
+        Attachment.objects.create(post=self.post, file="attachments/x.png", content_type="image/png")
+        self.assertIn("attachments/x.png", self.render())
+
+    def test_username_change_invalidates(self):
+        self.render()
+        self.user.username = "carolina"
+        self.user.save()
+        self.assertIn("@carolina", self.render())
+
+    def test_evicted_version_does_not_resurrect_stale_fragment(self):
+        self.render()
+        self.post.message = "editado"
+        self.post.save()
+        self.render()
+        cache.delete(f"post:ver:{self.post.pk}")
+        self.assertIn("editado", self.render())
+
+
+class AnonymousPageCacheTests(TestCase):
+    """Cache de página inteira e GET condicional para leitores anônimos."""
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user("dave", password="x")
+        self.post = Post.objects.create(author=self.user, message="primeiro")
+
+    def test_cached_list_needs_no_queries(self):
+        self.client.get(reverse("posts:list"))
+        with self.assertNumQueries(0):
+            resp = self.client.get(reverse("posts:list"))
+        self.assertContains(resp, "primeiro")
+        self.assertIn("ETag", resp)
+        self.assertIn("Last-Modified", resp)
+
+    def test_if_none_match_returns_304(self):
+        for url in (reverse("posts:list"), reverse("posts:detail", args=[self.post.pk])):
+            etag = self.client.get(url)["ETag"]
+            resp = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(resp.status_code, 304)
+
+    def test_edit_through_view_invalidates(self):
+        url = reverse("posts:detail", args=[self.post.pk])
+        etag = self.client.get(url)["ETag"]
+        self.client.get(reverse("posts:list"))
+        author = self.client_class()
+        author.force_login(self.user)
+        author.post(reverse("posts:update", args=[self.post.pk]), {
+            "message": "editado",
+            "attachments-TOTAL_FORMS": "0", "attachments-INITIAL_FORMS": "0",
+        })
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+        self.assertContains(self.client.get(reverse("posts:list")), "editado")
+
+    def test_authenticated_user_gets_own_buttons(self):
+        self.client.get(reverse("posts:list"))
+        self.client.force_login(self.user)
+        self.assertContains(self.client.get(reverse("posts:list")), "Editar")
+
+
+class SearchTests(TestCase):
+    """Busca por texto completo (FTS5 no SQLite) sincronizada com os posts."""
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user("erin", password="x")
+
+    def search(self, q, **params):
+        return self.client.get(reverse("posts:search"), {"q": q, **params}).context
+
+    def test_finds_created_and_forgets_deleted(self):
+        post = Post.objects.create(author=self.user, message="Café com pão de queijo")
+        self.assertEqual([p.pk for p in self.search("cafe")["posts"]], [post.pk])
+        post.delete()
+        self.assertEqual(self.search("cafe")["posts"], [])
+
+    def test_index_follows_edits(self):
+        post = Post.objects.create(author=self.user, message="abacaxi")
+        post.message = "melancia"
+        post.save()
+        self.assertEqual(self.search("abacaxi")["posts"], [])
+        self.assertEqual([p.pk for p in self.search("melancia")["posts"]], [post.pk])
+
+    def test_keyset_pages_cover_all_hits(self):
+        Post.objects.bulk_create([Post(author=self.user, message=f"django {'django ' * (i % 3)}{i}") for i in range(25)])
+        first = self.search("django")
+        second = self.search("django", after=first["next_cursor"])
+        ids = [p.pk for p in first["posts"]] + [p.pk for p in second["posts"]]
+        self.assertEqual(len(ids), 25)
+        self.assertEqual(len(set(ids)), 25)
+        self.assertIsNone(second["next_cursor"])
+
+    def test_cursor_values_must_be_numbers(self):
+        Post.objects.create(author=self.user, message="django")
+        for values in (["x", 1], [1.5, "1 OR 1=1"], [1.0, 2.5], [True, 1]):
+            resp = self.client.get(reverse("posts:search"), {"q": "django", "after": encode_cursor(values)})
+            self.assertEqual(resp.status_code, 404)
+
+    def test_query_syntax_is_not_passed_through(self):
+        Post.objects.create(author=self.user, message="aspas")
+        self.assertEqual(self.client.get(reverse("posts:search"), {"q": '"aspas OR NEAR('}).status_code, 200)
+
+    @override_settings(STORAGES={
+        "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+        "staticfiles": {"BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"},
+    })
+    def test_admin_uses_index(self):
+        post = Post.objects.create(author=self.user, message="pesquisa no admin")
+        Post.objects.create(author=self.user, message="outra coisa")
+        admin = User.objects.create_superuser("root", "root@example.com", "x")
+        self.client.force_login(admin)
+        resp = self.client.get(reverse("admin:posts_post_changelist"), {"q": "pesquisa"})
+        self.assertEqual([p.pk for p in resp.context["cl"].result_list], [post.pk])
+
+
+@skipIf(Image is None, "Pillow não instalado")
+class RenditionTests(TestCase):
+    """Worker de renditions e uso de srcset na timeline."""
+    def setUp(self):
+        cache.clear()
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media, ignore_errors=True)
+        override = override_settings(MEDIA_ROOT=self.media)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.user = User.objects.create_user("fred", password="x")
+        self.post = Post.objects.create(author=self.user, message="foto")
+
+    def make_image(self, size=(1000, 500)):
+        buf = io.BytesIO()
+        Image.new("RGB", size, "red").save(buf, "PNG")
+        return Attachment.objects.create(
+            post=self.post, file=SimpleUploadedFile("foto.png", buf.getvalue()), content_type="image/png"
+        )
+
+    def test_original_used_until_renditions_exist(self):
+        a = self.make_image()
+        self.assertEqual(a.renditions_status, Attachment.RENDITIONS_PENDING)
+        self.assertContains(self.client.get(reverse("posts:list")), a.file.url)
+
+    def test_worker_generates_widths_without_upscaling(self):
+        a = self.make_image()
+        self.assertEqual(process_pending(), 1)
+        a.refresh_from_db()
+        self.assertEqual(a.renditions_status, Attachment.RENDITIONS_DONE)
+        self.assertEqual((a.width, a.height), (1000, 500))
+        got = sorted(a.renditions.values_list("format", "width", "height"))
+        self.assertEqual(got, [
+            (Rendition.FORMAT_JPEG, 320, 160), (Rendition.FORMAT_JPEG, 640, 320),
+            (Rendition.FORMAT_WEBP, 320, 160), (Rendition.FORMAT_WEBP, 640, 320),
+        ])
+        self.assertEqual(process_pending(), 0)
+
+    def test_regeneration_replaces_files(self):
+        from .renditions import generate_renditions
+        a = self.make_image()
+        process_pending()
+        names = sorted(a.renditions.values_list("file", flat=True))
+        generate_renditions(a)
+        self.assertEqual(sorted(a.renditions.values_list("file", flat=True)), names)
+        directory = os.path.join(self.media, os.path.dirname(names[0]))
+        self.assertEqual(sorted(os.listdir(directory)), sorted(os.path.basename(n) for n in names))
+
+    def test_timeline_uses_srcset_and_detail_uses_original(self):
+        a = self.make_image()
+        process_pending()
+        listing = self.client.get(reverse("posts:list")).content.decode()
+        self.assertIn('loading="lazy"', listing)
+        self.assertIn("320w", listing)
+        self.assertNotIn(a.file.url, listing)
+        self.assertContains(self.client.get(reverse("posts:detail", args=[self.post.pk])), a.file.url)
+
+
+PNG_BYTES = b"\x89PNG\r\n\x1a\n" + b"\0" * 64
+
+
+class StreamingUploadTests(TestCase):
+    """Upload handler de anexos: tipo por magic bytes, limite de tamanho e hash."""
+    def setUp(self):
+        cache.clear()
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media, ignore_errors=True)
+        override = override_settings(MEDIA_ROOT=self.media)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.user = User.objects.create_user("gina", password="x")
+        self.client.force_login(self.user)
+
+    def create(self, upload):
+        return self.client.post(reverse("posts:create"), {
+            "message": "com anexo",
+            "attachments-TOTAL_FORMS": "1", "attachments-INITIAL_FORMS": "0",
+            "attachments-0-file": upload,
+        })
+
+    def test_type_comes_from_magic_bytes(self):
+        resp = self.create(SimpleUploadedFile("x.bin", PNG_BYTES, content_type="application/octet-stream"))
+        self.assertEqual(resp.status_code, 302)
+        self.assertEqual(Attachment.objects.get().content_type, "image/png")
+
+    def test_disallowed_content_is_rejected(self):
+        resp = self.create(SimpleUploadedFile("x.png", b"#!/bin/sh\necho oi\n", content_type="image/png"))
+        self.assertEqual(resp.status_code, 200)
+        self.assertContains(resp, "Tipo de arquivo não permitido.")
+        self.assertFalse(Post.objects.exists())
+
+    @override_settings(MAX_UPLOAD_SIZE_BYTES=1024)
+    def test_oversized_upload_is_aborted(self):
+        resp = self.create(SimpleUploadedFile("x.png", PNG_BYTES + b"\0" * 4096, content_type="image/png"))
+        self.assertContains(resp, "Arquivo excede o tamanho máximo permitido.")
+        self.assertFalse(Attachment.objects.exists())
+
+    def test_csrf_still_enforced(self):
+        client = self.client_class(enforce_csrf_checks=True)
+        client.force_login(self.user)
+        resp = client.post(reverse("posts:create"), {"message": "sem token"})
+        self.assertEqual(resp.status_code, 403)
+
+    def test_sniffing(self):
+        self.assertEqual(sniff_content_type(b"\xff\xd8\xff\xe0"), "image/jpeg")
+        self.assertEqual(sniff_content_type(b"RIFF\0\0\0\0WEBPVP8 "), "image/webp")
+        self.assertEqual(sniff_content_type(b"\0\0\0\x18ftypmp42"), "video/mp4")
+        self.assertEqual(sniff_content_type(b"OggS\0", "video/ogg"), "video/ogg")
+        self.assertIsNone(sniff_content_type(b"%PDF-1.7"))
+
+    def test_polyglot_is_served_with_sniffed_type(self):
+        # Passa pelos magic bytes de GIF, mas o nome .html não pode virar text/html
+        self.create(SimpleUploadedFile("x.html", b"GIF89a<script>alert(1)</script>", content_type="text/html"))
+        attachment = Attachment.objects.get()
+        self.assertEqual(attachment.content_type, "image/gif")
+        resp = self.client.get("/media/" + attachment.file.name)
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp["Content-Type"], "image/gif")
+        self.assertFalse(resp.get("Content-Disposition", "").startswith("attachment"))
+
+
+class ContentAddressedStorageTests(TestCase):
+    """Anexos deduplicados por SHA-256 e liberados só quando ninguém mais referencia."""
+    def setUp(self):
+        cache.clear()
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media, ignore_errors=True)
+        override = override_settings(MEDIA_ROOT=self.media)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.user = User.objects.create_user("hugo", password="x")
+        self.post = Post.objects.create(author=self.user, message="meme")
+
+    def attach(self, data=PNG_BYTES, name="meme.png"):
+        # PNG_BYTES não é imagem de verdade: sem job de renditions na fila
+        return Attachment.objects.create(
+            post=self.post, file=SimpleUploadedFile(name, data), content_type="image/png",
+            renditions_status=Attachment.RENDITIONS_DONE,
+        )
+
+    def test_identical_uploads_share_one_file(self):
+        a, b = self.attach(), self.attach(name="copia.png")
+        self.assertEqual(a.file.name, b.file.name)
+        self.assertEqual(a.sha256, b.sha256)
+        self.assertTrue(a.file.name.startswith(f"attachments/{a.sha256[:2]}/{a.sha256[2:4]}/"))
+        shard = os.path.dirname(a.file.path)
+        self.assertEqual(os.listdir(shard), [os.path.basename(a.file.name)])
+
+    def test_extension_comes_from_content(self):
+        a = self.attach(name="x.html")
+        self.assertEqual(a.file.name, f"attachments/{a.sha256[:2]}/{a.sha256[2:4]}/{a.sha256}.png")
+        b = self.attach(data=b"%PDF-1.7 nada de imagem", name="x.html")
+        self.assertFalse(os.path.splitext(b.file.name)[1])
+
+    def test_file_removed_only_with_last_reference(self):
+        a, b = self.attach(), self.attach()
+        path = a.file.path
+        a.delete()
+        Worker().run_once()
+        self.assertTrue(os.path.exists(path))
+        b.delete()
+        self.assertTrue(os.path.exists(path))  # liberado pelo worker, fora da requisição
+        Worker().run_once()
+        self.assertFalse(os.path.exists(path))
+
+    def test_release_racing_with_reuse_keeps_the_file(self):
+        a = self.attach()
+        path, storage = a.file.path, a.file.storage
+        # Referência surge enquanto o arquivo está fora do lugar: volta para o storage
+        self.assertFalse(storage.release(a.file.name, lambda: True))
+        self.assertTrue(os.path.exists(path))
+        # Worker apagou entre o _save (que reaproveitou) e o commit: regravado após o commit
+        with self.captureOnCommitCallbacks(execute=True):
+            self.attach()
+            os.remove(path)
+        self.assertTrue(os.path.exists(path))
+        self.assertEqual(os.listdir(os.path.dirname(path)), [os.path.basename(path)])
+
+    def test_dedupe_media_command(self):
+        legacy = []
+        for i in range(3):
+            a = self.attach(data=PNG_BYTES + b"legado")
+            old = f"attachments/{self.post.pk}/legado_{i}.png"
+            a.file.storage.delete(a.file.name)
+            Attachment.objects.filter(pk=a.pk).update(file=old, sha256="")
+            default_storage.save(old, ContentFile(PNG_BYTES + b"legado"))  # layout antigo
+            legacy.append(old)
+        call_command("dedupe_media", stdout=io.StringIO())
+        names = set(Attachment.objects.values_list("file", flat=True))
+        self.assertEqual(len(names), 1)
+        for old in legacy:
+            self.assertFalse(os.path.exists(os.path.join(self.media, old)))
+        self.assertTrue(os.path.exists(os.path.join(self.media, names.pop())))
+
+
+class MediaServingTests(TestCase):
+    """config.media.serve_media: Range/206, ETag/304 e offload para o proxy."""
+    def setUp(self):
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media, ignore_errors=True)
+        override = override_settings(MEDIA_ROOT=self.media)
+        override.enable()
+        self.addCleanup(override.disable)
+        os.makedirs(os.path.join(self.media, "videos"))
+        with open(os.path.join(self.media, "videos", "clip.mp4"), "wb") as f:
+            f.write(bytes(range(100)))
+        self.url = "/media/videos/clip.mp4"
+
+    def body(self, resp):
+        return b"".join(resp.streaming_content)
+
+    def test_full_response_is_cacheable(self):
+        resp = self.client.get(self.url)
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(self.body(resp), bytes(range(100)))
+        self.assertEqual(resp["Accept-Ranges"], "bytes")
+        # Nome comum pode voltar com outro conteúdo: revalida pelo ETag
+        self.assertNotIn("immutable", resp["Cache-Control"])
+        self.assertIn("no-cache", resp["Cache-Control"])
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=resp["ETag"]).status_code, 304)
+
+    def test_content_addressed_name_is_immutable(self):
+        digest = hashlib.sha256(b"abc").hexdigest()
+        path = os.path.join(self.media, "attachments", digest[:2], digest[2:4])
+        os.makedirs(path)
+        with open(os.path.join(path, f"{digest}.png"), "wb") as f:
+            f.write(b"abc")
+        resp = self.client.get(f"/media/attachments/{digest[:2]}/{digest[2:4]}/{digest}.png")
+        self.assertEqual(resp.status_code, 200)
+        self.assertIn("immutable", resp["Cache-Control"])
+        self.assertEqual(resp["ETag"], f'"{digest}"')
+
+    def test_byte_ranges(self):
+        resp = self.client.get(self.url, HTTP_RANGE="bytes=10-19")
+        self.assertEqual(resp.status_code, 206)
+        self.assertEqual(resp["Content-Range"], "bytes 10-19/100")
+        self.assertEqual(resp["Content-Length"], "10")
+        self.assertEqual(self.body(resp), bytes(range(10, 20)))
+        resp = self.client.get(self.url, HTTP_RANGE="bytes=-5")
+        self.assertEqual(self.body(resp), bytes(range(95, 100)))
+        resp = self.client.get(self.url, HTTP_RANGE="bytes=90-")
+        self.assertEqual(resp["Content-Range"], "bytes 90-99/100")
+
+    def test_unsatisfiable_and_stale_if_range(self):
+        resp = self.client.get(self.url, HTTP_RANGE="bytes=500-")
+        self.assertEqual(resp.status_code, 416)
+        self.assertEqual(resp["Content-Range"], "bytes */100")
+        resp = self.client.get(self.url, HTTP_RANGE="bytes=0-1", HTTP_IF_RANGE='"outra-versao"')
+        self.assertEqual(resp.status_code, 200)
+
+    @override_settings(MEDIA_ACCEL_REDIRECT="nginx", MEDIA_ACCEL_PREFIX="/protected-media/")
+    def test_nginx_offload(self):
+        resp = self.client.get(self.url)
+        self.assertEqual(resp["X-Accel-Redirect"], "/protected-media/videos/clip.mp4")
+        self.assertEqual(resp.content, b"")
+
+    def test_path_traversal_is_404(self):
+        self.assertEqual(self.client.get("/media/../manage.py").status_code, 404)
+        self.assertEqual(self.client.get("/media/videos/nao-existe.mp4").status_code, 404)
+
+    def test_file_without_row_is_a_download(self):
+        with open(os.path.join(self.media, "videos", "page.html"), "wb") as f:
+            f.write(b"<script>alert(1)</script>")
+        resp = self.client.get("/media/videos/page.html")
+        self.assertEqual(resp["Content-Type"], "application/octet-stream")
+        self.assertEqual(resp["Content-Disposition"], "attachment")
+
+
+class AuthorTimelineTests(TestCase):
+    """Timeline por autor (/u/<username>/) e contadores desnormalizados."""
+    def setUp(self):
+        cache.clear()
+        self.ana = User.objects.create_user("ana", password="x")
+        self.bia = User.objects.create_user("bia", password="x")
+
+    def stats(self, user):
+        return AuthorStats.objects.get(user=user)
+
+    def test_counters_follow_creates_and_deletes(self):
+        post = Post.objects.create(author=self.ana, message="um")
+        Post.objects.create(author=self.ana, message="dois")
+        Attachment.objects.create(post=post, file="attachments/a.txt", sha256="a")
+        Attachment.objects.create(post=post, file="attachments/b.txt", sha256="b")
+        self.assertEqual((self.stats(self.ana).post_count, self.stats(self.ana).attachment_count), (2, 2))
+        post.delete()  # cascata leva os dois anexos
+        self.assertEqual((self.stats(self.ana).post_count, self.stats(self.ana).attachment_count), (1, 0))
+        self.assertEqual(self.stats(self.bia).post_count, 0)
+
+    def test_recount_repairs_bulk_inserts(self):
+        Post.objects.bulk_create([Post(author=self.bia, message=f"m{i}") for i in range(3)])
+        self.assertEqual(self.stats(self.bia).post_count, 0)  # bulk_create não dispara signals
+        call_command("recount_author_stats", stdout=io.StringIO())
+        self.assertEqual(self.stats(self.bia).post_count, 3)
+
+    def test_pages_only_author_posts(self):
+        Post.objects.bulk_create([Post(author=self.ana if i % 3 else self.bia, message=f"m{i}") for i in range(45)])
+        url = reverse("posts:author", args=["ana"])
+        seen, after = [], None
+        while True:
+            resp = self.client.get(url, {"after": after} if after else {})
+            seen += [p.pk for p in resp.context["posts"]]
+            after = resp.context["page_obj"].next_cursor
+            if not after:
+                break
+        expected = list(Post.objects.filter(author=self.ana).values_list("pk", flat=True))
+        self.assertEqual(seen, expected)
+        self.assertEqual(self.client.get(reverse("posts:author", args=["ninguem"])).status_code, 404)
+
+    def test_header_shows_counters(self):
+        Post.objects.create(author=self.ana, message="oi")
+        resp = self.client.get(reverse("posts:author", args=["ana"]))
+        self.assertContains(resp, "1 post</span>")
+        self.assertContains(resp, "0 anexos")
+
+
+class NdjsonTransferTests(TestCase):
+    """export_posts/import_posts: ida e volta, idempotência e checkpoint."""
+    def setUp(self):
+        cache.clear()
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp, ignore_errors=True)
+        self.path = os.path.join(self.tmp, "posts.ndjson.gz")
+        ana = User.objects.create_user("ana", password="x")
+        bia = User.objects.create_user("bia", password="x")
+        posts = [Post.objects.create(author=ana if i % 2 else bia, message=f"mensagem {i}") for i in range(7)]
+        Attachment.objects.create(post=posts[0], file="attachments/a.txt", sha256="a", content_type="text/plain")
+
+    def export_and_wipe(self, *extra):
+        call_command("export_posts", self.path, "--batch", "3", *extra, stdout=io.StringIO())
+        self.before = list(Post.objects.order_by("pk").values_list("pk", "author__username", "message", "created_at"))
+        User.objects.all().delete()  # cascata: posts, anexos, contadores
+
+    def test_round_trip_keeps_ids_timestamps_and_counters(self):
+        self.export_and_wipe("--with-passwords")
+        call_command("import_posts", self.path, "--batch", "4", stdout=io.StringIO())
+        after = list(Post.objects.order_by("pk").values_list("pk", "author__username", "message", "created_at"))
+        self.assertEqual(after, self.before)
+        self.assertEqual(Attachment.objects.get().post_id, self.before[0][0])
+        self.assertTrue(User.objects.get(username="ana").check_password("x"))
+        self.assertEqual(AuthorStats.objects.get(user__username="bia").post_count, 4)
+        self.assertFalse(os.path.exists(self.path + ".checkpoint"))
+        # De novo: nada duplica e nada conta como importado
+        out = io.StringIO()
+        call_command("import_posts", self.path, stdout=out)
+        self.assertEqual(Post.objects.count(), 7)
+        self.assertIn("Importados 0 autores, 0 posts e 0 anexos", out.getvalue())
+
+    def test_id_taken_by_another_post_aborts(self):
+        self.export_and_wipe()
+        carla = User.objects.create_user("carla", password="x")
+        Post.objects.create(id=self.before[0][0], author=carla, message="post local")
+        with self.assertRaises(CommandError):
+            call_command("import_posts", self.path, stdout=io.StringIO())
+        self.assertEqual(Post.objects.get(pk=self.before[0][0]).message, "post local")
+        self.assertFalse(Attachment.objects.exists())
+
+    def test_resumes_from_checkpoint(self):
+        self.export_and_wipe()
+        with gzip.open(self.path, "rb") as f:
+            lines = f.readlines()
+        # Simula uma execução interrompida depois do meta, dos usuários e do 1º post (com anexo)
+        offset = sum(len(line) for line in lines[:5])
+        with open(self.path + ".checkpoint", "w") as f:
+            json.dump({"offset": offset}, f)
+        User.objects.bulk_create([User(username="ana"), User(username="bia")])
+        call_command("import_posts", self.path, stdout=io.StringIO())
+        self.assertEqual(Post.objects.count(), 6)
+        self.assertFalse(Attachment.objects.exists())
+
+    def test_copy_media_rejects_names_outside_root(self):
+        src, dst = os.path.join(self.tmp, "src"), os.path.join(self.tmp, "dst")
+        os.makedirs(os.path.join(src, "attachments"))
+        with open(os.path.join(src, "attachments", "ok.txt"), "w") as f:
+            f.write("ok")
+        with open(os.path.join(self.tmp, "segredo.txt"), "w") as f:
+            f.write("fora")
+        names = ["attachments/ok.txt", "../segredo.txt", "../../dst/../x.txt", os.path.join(self.tmp, "segredo.txt")]
+        counts = copy_media(names, src, dst)
+        self.assertEqual((counts["copied"], counts["rejected"]), (1, 3))
+        self.assertFalse(os.path.exists(os.path.join(self.tmp, "x.txt")))
+        self.assertEqual(os.listdir(dst), ["attachments"])
+
+
+class SeedTimelineTests(TestCase):
+    def test_seeds_skewed_authors_and_consistent_counters(self):
+        call_command("seed_timeline", "--users", "10", "--posts", "300", "--batch", "100", stdout=io.StringIO())
+        self.assertEqual(Post.objects.count(), 300)
+        self.assertTrue(Attachment.objects.exists())
+        counts = list(AuthorStats.objects.order_by("-post_count").values_list("post_count", flat=True))
+        self.assertEqual(sum(counts), 300)
+        self.assertGreater(counts[0], 3 * counts[-1])  # poucos autores escrevem muito
+        self.assertTrue(self.client.login(username="seed0", password="seed"))
+        self.assertEqual(Post.objects.filter(created_at__gt=timezone.now()).count(), 0)
+
+
+class JsonApiTests(TestCase):
+    """API JSON async: timeline por cursor, detalhe e posts por autor."""
+    @classmethod
+    def setUpTestData(cls):
+        cls.ana = User.objects.create_user("ana", password="x")
+        cls.bia = User.objects.create_user("bia", password="x")
+        Post.objects.bulk_create([Post(author=cls.ana if i % 2 else cls.bia, message=f"m{i}") for i in range(30)])
+
+    def test_timeline_pages_with_cursor(self):
+        first = self.client.get(reverse("posts:api_timeline"), {"limit": 20}).json()
+        self.assertEqual(len(first["results"]), 20)
+        self.assertIsNone(first["previous"])
+        second = self.client.get(reverse("posts:api_timeline"), {"after": first["next"]}).json()
+        self.assertEqual(len(second["results"]), 10)
+        self.assertIsNone(second["next"])
+        ids = [p["id"] for p in first["results"] + second["results"]]
+        self.assertEqual(ids, list(Post.objects.order_by("-created_at", "-id").values_list("id", flat=True)))
+
+    def test_detail_and_author(self):
+        post = Post.objects.filter(author=self.ana).first()
+        data = self.client.get(reverse("posts:api_detail", args=[post.pk])).json()
+        self.assertEqual((data["id"], data["author"], data["message"]), (post.pk, "ana", post.message))
+        self.assertEqual(self.client.get(reverse("posts:api_detail", args=[0])).status_code, 404)
+        results = self.client.get(reverse("posts:api_author_posts", args=["bia"])).json()["results"]
+        self.assertEqual({p["author"] for p in results}, {"bia"})
+        self.assertEqual(len(results), 15)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_fixed_query_count_and_cache(self):
+        with self.assertNumQueries(3):  # Max(updated_at) com cache frio, posts+autores, anexos
+            self.client.get(reverse("posts:api_timeline"))
+        with self.assertNumQueries(0):
+            resp = self.client.get(reverse("posts:api_timeline"))
+        self.assertEqual(self.client.get(reverse("posts:api_timeline"), HTTP_IF_NONE_MATCH=resp["ETag"]).status_code, 304)
+
+    def test_new_post_invalidates_cached_page(self):
+        self.client.get(reverse("posts:api_timeline"))
+        Post.objects.create(author=self.ana, message="novinho")
+        first = self.client.get(reverse("posts:api_timeline")).json()["results"][0]
+        self.assertEqual(first["message"], "novinho")
+
+
+
+class FeedTests(TestCase):
+    """Feeds Atom/JSON: since_id incremental, 304 sem queries e corpo em cache."""
+    @classmethod
+    def setUpTestData(cls):
+        cls.ana = User.objects.create_user("ana", password="x")
+        cls.bia = User.objects.create_user("bia", password="x")
+        Post.objects.bulk_create([Post(author=cls.ana if i % 2 else cls.bia, message=f"m{i}") for i in range(60)])
+
+    def setUp(self):
+        cache.clear()
+
+    def test_json_feed_and_since_id(self):
+        feed = self.client.get(reverse("posts:feed_json"))
+        self.assertEqual(feed["Content-Type"], "application/feed+json")
+        items = feed.json()["items"]
+        self.assertEqual(len(items), 50)
+        newest = int(items[0]["id"])
+        self.assertEqual(self.client.get(reverse("posts:feed_json"), {"since_id": newest}).json()["items"], [])
+        # Bloco mais antigo acima de since_id: o cliente alcança sem buracos
+        since = Post.objects.order_by("id")[4].pk
+        ids = [int(i["id"]) for i in self.client.get(reverse("posts:feed_json"), {"since_id": since}).json()["items"]]
+        self.assertEqual(ids, list(Post.objects.filter(pk__gt=since).order_by("id").values_list("id", flat=True)[:50])[::-1])
+        self.assertEqual(self.client.get(reverse("posts:feed_json"), {"since_id": "x"}).status_code, 404)
+
+    def test_atom_per_author(self):
+        resp = self.client.get(reverse("posts:author_feed_atom", args=["ana"]))
+        self.assertEqual(resp["Content-Type"], "application/atom+xml; charset=utf-8")
+        self.assertContains(resp, "<name>ana</name>", count=30)
+        self.assertNotContains(resp, "<name>bia</name>")
+        self.assertEqual(self.client.get(reverse("posts:author_feed_atom", args=["nobody"])).status_code, 404)
+
+    def test_unknown_author_is_404_even_when_etag_matches(self):
+        etag = self.client.get(reverse("posts:feed_atom"))["ETag"]
+        url = reverse("posts:author_feed_atom", args=["nobody"])
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 404)
+
+    def test_extra_query_parameters_share_the_cached_body(self):
+        url = reverse("posts:feed_json")
+        first = self.client.get(url, {"since_id": "5", "utm": "a"})
+        with self.assertNumQueries(0):
+            second = self.client.get(url, {"since_id": "5", "utm": "b", "x": "y"})
+        self.assertEqual(second.content, first.content)
+        self.assertTrue(first.json()["feed_url"].endswith(f"{url}?since_id=5"))
+
+    def test_unchanged_poll_is_free(self):
+        url = reverse("posts:feed_atom")
+        resp = self.client.get(url)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=resp["ETag"]).status_code, 304)
+            self.assertEqual(self.client.get(url).content, resp.content)  # corpo em cache
+        Post.objects.create(author=self.ana, message="novidade")
+        fresh = self.client.get(url, HTTP_IF_NONE_MATCH=resp["ETag"])
+        self.assertEqual(fresh.status_code, 200)
+        self.assertContains(fresh, "novidade")
+
+
+@override_settings(SERVER_TIMING=True, SLOW_REQUEST_MS=10_000)
+class InstrumentationTests(TestCase):
+    """Middleware de instrumentação: Server-Timing, /metrics e agregação entre workers."""
+    def setUp(self):
+        cache.clear()
+        User.objects.create_user("ana", password="x")
+        Post.objects.create(author=User.objects.get(), message="oi")
+
+    def test_server_timing_counts_queries(self):
+        resp = self.client.get(reverse("posts:list"))
+        header = resp["Server-Timing"]
+        self.assertRegex(header, r'db;dur=[\d.]+;desc="[1-9]\d* queries"')
+        self.assertRegex(header, r"tpl;dur=[\d.]+, total;dur=[\d.]+")
+
+    def test_metrics_exposition(self):
+        self.client.get(reverse("posts:list"))
+        body = self.client.get(reverse("metrics")).content.decode()
+        self.assertIn('http_requests_total{view="posts:list",method="GET",status="200"}', body)
+        self.assertIn('http_request_duration_seconds_bucket{view="posts:list",method="GET",le="+Inf"}', body)
+        self.assertRegex(body, r'db_queries_total\{view="posts:list"\} [1-9]')
+        self.assertIn("# TYPE http_request_duration_seconds histogram", body)
+
+    @override_settings(METRICS_TOKEN="segredo")
+    def test_metrics_token(self):
+        self.assertEqual(self.client.get(reverse("metrics")).status_code, 403)
+        resp = self.client.get(reverse("metrics"), HTTP_AUTHORIZATION="Bearer segredo")
+        self.assertEqual(resp.status_code, 200)
+
+    def test_metrics_hidden_from_public_addresses(self):
+        self.assertEqual(self.client.get(reverse("metrics"), REMOTE_ADDR="8.8.8.8").status_code, 404)
+        self.assertEqual(self.client.get(reverse("metrics"), REMOTE_ADDR="10.0.0.5").status_code, 200)
+        with override_settings(THROTTLE_PROXIES=1):
+            resp = self.client.get(reverse("metrics"), REMOTE_ADDR="10.0.0.5", HTTP_X_FORWARDED_FOR="8.8.8.8")
+            self.assertEqual(resp.status_code, 404)
+
+    def test_sums_files_from_all_workers(self):
+        from config.metrics import Registry
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        # Arquivo de outro worker (pid diferente), já reciclado
+        with open(os.path.join(directory, "metrics-1.json"), "w") as f:
+            json.dump({"counters": [["db_queries_total", [["view", "v"]], 5]], "histograms": []}, f)
+        registry = Registry(directory=directory)
+        registry.inc("db_queries_total", (("view", "v"),), 2)
+        self.assertIn('db_queries_total{view="v"} 7', registry.render())
+
+    def test_files_of_finished_workers_are_folded(self):
+        from config.metrics import DEAD_FILE, Registry
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        for _ in range(3):
+            proc = subprocess.Popen(["true"])
+            proc.wait()  # pid de um processo que já terminou
+            with open(os.path.join(directory, f"metrics-{proc.pid}.json"), "w") as f:
+                json.dump({"counters": [["db_queries_total", [["view", "v"]], 5]], "histograms": []}, f)
+        registry = Registry(directory=directory)
+        self.assertIn('db_queries_total{view="v"} 15', registry.render())
+        self.assertEqual(set(os.listdir(directory)), {DEAD_FILE, f"metrics-{os.getpid()}.json", "metrics.lock"})
+        self.assertIn('db_queries_total{view="v"} 15', registry.render())
+
+
+@skipIf(connection.vendor != "sqlite", "perfil específico do SQLite")
+class SqliteProfileTests(TransactionTestCase):
+    """Pragmas por conexão, BEGIN IMMEDIATE nas escritas e router de leitura."""
+    def test_pragmas_applied_on_new_connections(self):
+        connection.close()
+        with connection.cursor() as cursor:
+            cursor.execute("PRAGMA busy_timeout")
+            self.assertEqual(cursor.fetchone()[0], 5000)
+            cursor.execute("PRAGMA synchronous")
+            self.assertEqual(cursor.fetchone()[0], 1)  # NORMAL
+
+    def test_write_transactions_begin_immediate(self):
+        user = User.objects.create_user("ana", password="x")
+        with CaptureQueriesContext(connection) as ctx:
+            with transaction.atomic():
+                Post.objects.create(author=user, message="oi")
+        self.assertEqual(ctx.captured_queries[0]["sql"], "BEGIN IMMEDIATE")
+
+
+
+class ReplicaRouterTests(SimpleTestCase):
+    """Sem transação de teste em volta: o router vê o default fora de atomic."""
+    databases = {"default"}
+
+    @override_settings(DATABASE_READ_ALIASES=["replica1"])
+    def test_router(self):
+        from config import routers
+        router = routers.ReplicaRouter()
+        tokens = routers.begin_request(False)
+        try:
+            self.assertEqual(router.db_for_read(Post), "replica1")
+            with transaction.atomic():
+                self.assertEqual(router.db_for_read(Post), "default")
+            self.assertEqual(router.db_for_write(Post), "default")
+            # Depois de escrever, a própria requisição lê do default
+            self.assertEqual(router.db_for_read(Post), "default")
+        finally:
+            self.assertTrue(routers.end_request(tokens))
+        tokens = routers.begin_request(True)
+        self.assertEqual(router.db_for_read(Post), "default")
+        routers.end_request(tokens)
+        self.assertFalse(router.allow_migrate("replica1", "posts"))
+
+
+class ReplicaRoutingTests(TestCase):
+    """ReplicaRouter, fixação no primário depois de escrever e cópia local da réplica."""
+    def setUp(self):
+        cache.clear()
+
+    @override_settings(DATABASE_READ_ALIASES=["replica1"], DATABASE_PIN_SECONDS=30)
+    def test_writer_is_pinned_to_primary(self):
+        from config.middleware import PrimaryPinMiddleware
+        from config.routers import primary_pinned
+        user = User.objects.create_user("ana", password="x")
+        self.client.force_login(user)
+        resp = self.client.post(reverse("posts:create"), {
+            "message": "oi", "attachments-TOTAL_FORMS": "0", "attachments-INITIAL_FORMS": "0",
+        })
+        self.assertEqual(resp.status_code, 302)
+        self.assertIn(PrimaryPinMiddleware.cookie_name, resp.cookies)
+
+        seen = []
+        middleware = PrimaryPinMiddleware(lambda request: seen.append(primary_pinned()) or HttpResponse())
+        request = RequestFactory().get("/")
+        request.COOKIES[PrimaryPinMiddleware.cookie_name] = resp.cookies[PrimaryPinMiddleware.cookie_name].value
+        middleware(request)
+        middleware(RequestFactory().get("/"))
+        self.assertEqual(seen, [True, False])
+
+    def test_reads_do_not_pin(self):
+        resp = self.client.get(reverse("posts:list"))
+        self.assertNotIn("primary_pin", resp.cookies)
+
+    def test_sync_sqlite_replica(self):
+        import sqlite3
+        tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp, ignore_errors=True)
+        source, replica = os.path.join(tmp, "db.sqlite3"), os.path.join(tmp, "replica.sqlite3")
+        with sqlite3.connect(source) as db:
+            db.execute("CREATE TABLE t (x)")
+            db.execute("INSERT INTO t VALUES (42)")
+        call_command("sync_sqlite_replica", "--source", source, "--target", replica, stdout=io.StringIO())
+        with sqlite3.connect(replica) as db:
+            self.assertEqual(db.execute("SELECT x FROM t").fetchall(), [(42,)])
+
+
+class SessionAuthCacheTests(TestCase):
+    """Sessão cached_db + usuário em cache: leitura logada sem queries de sessão/usuário."""
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user("ana", password="x")
+        Post.objects.create(author=self.user, message="oi")
+        self.client.login(username="ana", password="x")
+
+    def test_warm_logged_in_read_queries_only_the_page(self):
+        self.client.get(reverse("posts:list"))
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(self.client.get(reverse("posts:list")).status_code, 200)
+        tables = " ".join(q["sql"] for q in ctx.captured_queries)
+        self.assertNotIn("django_session", tables)
+        self.assertNotIn('FROM "auth_user"', tables)
+        self.assertEqual(len(ctx.captured_queries), 2)  # posts+autores, anexos (sem anexos, sem renditions)
+
+    def test_password_change_ends_cached_sessions(self):
+        self.assertEqual(self.client.get(reverse("posts:create")).status_code, 200)
+        self.user.set_password("nova")
+        self.user.save()
+        self.assertEqual(self.client.get(reverse("posts:create")).status_code, 302)
+
+    def test_sessions_from_model_backend_stay_logged_in(self):
+        # Sessão aberta antes do CachedModelBackend: guarda o caminho do ModelBackend
+        client = self.client_class()
+        client.force_login(self.user, backend="django.contrib.auth.backends.ModelBackend")
+        self.assertEqual(client.get(reverse("posts:create")).status_code, 200)
+        # Senha errada não roda o hash de novo no segundo backend
+        with mock.patch("django.contrib.auth.backends.UserModel.check_password", return_value=False) as check:
+            self.assertFalse(client.login(username="ana", password="errada"))
+        self.assertEqual(check.call_count, 1)
+
+    def test_cleanup_sessions(self):
+        from django.contrib.sessions.models import Session
+        Session.objects.create(session_key="velha", session_data="", expire_date=timezone.now() - timedelta(days=1))
+        call_command("cleanup_sessions", "--batch", "1", stdout=io.StringIO())
+        self.assertFalse(Session.objects.filter(session_key="velha").exists())
+        self.assertTrue(Session.objects.exists())  # a sessão do login continua
+
+
+
+class GcMediaTests(TestCase):
+    """Limpeza de mídia: renditions na exclusão e varredura de órfãos com gc_media."""
+    def setUp(self):
+        cache.clear()
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media, ignore_errors=True)
+        override = override_settings(MEDIA_ROOT=self.media)
+        override.enable()
+        self.addCleanup(override.disable)
+        post = Post.objects.create(author=User.objects.create_user("ivo", password="x"), message="gc")
+        self.attachment = Attachment.objects.create(
+            post=post, file=SimpleUploadedFile("a.png", PNG_BYTES), content_type="image/png",
+            renditions_status=Attachment.RENDITIONS_DONE,
+        )
+
+    def write(self, name, data=b"x" * 100, age=7200):
+        path = os.path.join(self.media, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(data)
+        os.utime(path, (time.time() - age,) * 2)
+        return path
+
+    def test_delete_releases_original_and_renditions(self):
+        rendition = Rendition(attachment=self.attachment, format=Rendition.FORMAT_JPEG, width=320, height=160)
+        rendition.file.save("320.jpeg", ContentFile(b"jpeg"), save=True)
+        paths = [self.attachment.file.path, rendition.file.path]
+        self.attachment.post.delete()
+        Worker().run_once()
+        for path in paths:
+            self.assertFalse(os.path.exists(path))
+        self.assertFalse(os.path.exists(os.path.dirname(rendition.file.path)))
+
+    def test_gc_removes_only_old_unreferenced_files(self):
+        os.utime(self.attachment.file.path, (time.time() - 7200,) * 2)
+        orphans = [
+            self.write("attachments/ff/ee/orfao.png"),
+            self.write("attachments/ff/ee/.upload-abc123"),  # upload interrompido
+            self.write("renditions/999/320.webp"),
+        ]
+        fresh = self.write("attachments/aa/bb/novo.png", age=0)  # upload em andamento
+        out = io.StringIO()
+        call_command("gc_media", "--dry-run", "--batch", "2", stdout=out)
+        self.assertIn("3 órfão(s)", out.getvalue())
+        self.assertTrue(all(os.path.exists(p) for p in orphans))
+
+        with self.assertNumQueries(3):  # 2 lotes de anexos + 1 de renditions
+            call_command("gc_media", "--batch", "2", stdout=out)
+        self.assertFalse(any(os.path.exists(p) for p in orphans))
+        self.assertTrue(os.path.exists(fresh))
+        self.assertTrue(os.path.exists(self.attachment.file.path))
+
+
+class MediaKindTests(TestCase):
+    """Tipo de mídia pré-calculado (kind), dimensões no upload e filtro ?media=."""
+    def setUp(self):
+        cache.clear()
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media, ignore_errors=True)
+        override = override_settings(MEDIA_ROOT=self.media)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.user = User.objects.create_user("juca", password="x")
+        self.text = Post.objects.create(author=self.user, message="só texto")
+        self.video = Post.objects.create(author=self.user, message="com vídeo")
+        Attachment.objects.create(post=self.video, file="attachments/v.mp4", content_type="video/mp4")
+
+    @skipIf(Image is None, "Pillow não instalado")
+    def test_kind_and_size_extracted_once_at_upload(self):
+        buf = io.BytesIO()
+        Image.new("RGB", (300, 200)).save(buf, "PNG")
+        a = Attachment.objects.create(post=self.text, file=SimpleUploadedFile("f.png", buf.getvalue()))
+        self.assertEqual((a.content_type, a.kind, a.width, a.height), ("image/png", "image", 300, 200))
+        a.content_type = "audio/mpeg"
+        a.save(update_fields=["content_type"])  # saves seguintes não recalculam
+        a.refresh_from_db()
+        self.assertEqual(a.kind, "image")
+
+    def test_media_filter(self):
+        resp = self.client.get(reverse("posts:list"), {"media": "video"})
+        self.assertEqual([p.pk for p in resp.context["posts"]], [self.video.pk])
+        self.assertEqual(list(self.client.get(reverse("posts:list"), {"media": "image"}).context["posts"]), [])
+        self.assertEqual(self.client.get(reverse("posts:list"), {"media": "exe"}).status_code, 404)
+        resp = self.client.get(reverse("posts:author", args=["juca"]), {"media": "video"})
+        self.assertContains(resp, "com vídeo")
+        self.assertNotContains(resp, "só texto")
+        self.assertContains(resp, "<video")
+
+    def test_pagination_keeps_filter(self):
+        for i in range(20):
+            p = Post.objects.create(author=self.user, message=f"v{i}")
+            Attachment.objects.create(post=p, file=f"attachments/v{i}.mp4", content_type="video/mp4")
+        self.assertContains(self.client.get(reverse("posts:list"), {"media": "video"}), "?media=video&amp;after=")
+
+    def test_api_media_filter(self):
+        results = self.client.get(reverse("posts:api_timeline"), {"media": "video"}).json()["results"]
+        self.assertEqual([r["id"] for r in results], [self.video.pk])
+        self.assertEqual(results[0]["attachments"][0]["kind"], "video")
+
+    @skipIf(connection.vendor != "sqlite", "plano de execução do SQLite")
+    def test_filter_uses_kind_index(self):
+        qs = Post.objects.with_media("video").order_by("-created_at", "-id")[:21]
+        self.assertIn("attachment_kind_post_idx", qs.explain())
+
+
+class LiveTimelineTests(TestCase):
+    """SSE da timeline: eventos publicados após o commit e entregues pelo broadcaster."""
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user("kika", password="x")
+
+    def test_post_lifecycle_publishes_events(self):
+        sent = []
+        backend = mock.Mock(has_listeners=lambda: True, publish=sent.append)
+        with mock.patch("posts.events.get_backend", return_value=backend):
+            with self.captureOnCommitCallbacks(execute=True):
+                post = Post.objects.create(author=self.user, message="ao vivo")
+                post_id = post.pk
+                self.assertEqual(sent, [])  # só depois do commit
+            with self.captureOnCommitCallbacks(execute=True):
+                post.message = "editado"
+                post.save()
+            with self.captureOnCommitCallbacks(execute=True):
+                post.delete()
+        events = [m.decode().split("\n", 1)[0] for m in sent]
+        self.assertEqual(events, ["event: post", "event: edit", "event: delete"])
+        self.assertIn('data-post-id=\\"%d\\"' % post_id, sent[0].decode())
+        self.assertIn("editado", sent[1].decode())
+
+    def test_no_rendering_without_listeners(self):
+        with mock.patch("posts.events.render_to_string") as render:
+            with self.captureOnCommitCallbacks(execute=True):
+                Post.objects.create(author=self.user, message="ninguém ouvindo")
+        render.assert_not_called()
+
+    async def test_stream_delivers_and_unsubscribes(self):
+        response = await self.async_client.get(reverse("posts:api_events"))
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        self.assertEqual(response["Cache-Control"], "no-cache")
+        stream = _event_stream()  # o mesmo gerador da resposta, consumido direto
+        self.assertEqual(await anext(stream), b"retry: 5000\n\n")
+        await sync_to_async(publish_post)("delete", 42)
+        self.assertEqual(await anext(stream), b'event: delete\ndata: {"id":42}\n\n')
+        await stream.aclose()
+        self.assertFalse(broadcaster.subscribers)
+
+    def test_wsgi_and_slow_clients(self):
+        self.assertEqual(self.client.get(reverse("posts:api_events")).status_code, 204)
+        sub = Subscription(2)
+        for i in range(3):
+            sub.push(b"x")
+        self.assertEqual(sub.queue.qsize(), 1)
+        self.assertIs(sub.queue.get_nowait(), RESET)
+
+
+class CssBundleTests(SimpleTestCase):
+    """build_css: purga pelos templates, CSS crítico e fallback para o CDN."""
+    def test_purge_keeps_only_used_selectors(self):
+        css = (
+            '/*! licença */:root{--x:"a{b}"}.btn,.btn.active{a:b}.nav:not(.sumido){c:d}'
+            "@media (min-width:1px){.sumido{e:f}}.spin{animation:1s girar}"
+            "@keyframes girar{to{x:y}}@keyframes parado{to{x:y}}"
+        )
+        self.assertEqual(
+            purge(css, {"btn", "nav", "spin"}),
+            '/*! licença */:root{--x:"a{b}"}.btn{a:b}.nav:not(.sumido){c:d}.spin{animation:1s girar}'
+            "@keyframes girar{to{x:y}}",
+        )
+
+    def test_build_from_templates(self):
+        build_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, build_dir)
+        source = os.path.join(build_dir, "src.css")
+        with open(source, "w") as f:
+            f.write(".navbar{a:b}.alert-danger{c:d}.jumbotron{e:f}")
+        with override_settings(ASSETS_BUILD_DIR=build_dir):
+            call_command("build_css", source=source, stdout=io.StringIO())
+        with open(os.path.join(build_dir, "css", "app.css")) as f:
+            bundle = f.read()
+        with open(os.path.join(build_dir, "css", "critical.css")) as f:
+            critical = f.read()
+        self.assertIn(".alert-danger", bundle)  # só em password_reset_confirm.html
+        self.assertNotIn(".jumbotron", bundle)
+        self.assertIn(".card{border-radius", bundle)  # static/main.css vai junto
+        self.assertIn(".navbar", critical)
+        self.assertNotIn(".alert-danger", critical)
+
+    def test_integrity_and_cdn_fallback(self):
+        self.assertTrue(check_integrity(b"abc", "sha384-ywB1P0WjXou1oD1pmsZQBycsMqsO3tFjGotgWkP/W+2AhgcroefMI1i67KE0yCWn"))
+        self.assertFalse(check_integrity(b"abd", "sha384-ywB1P0WjXou1oD1pmsZQBycsMqsO3tFjGotgWkP/W+2AhgcroefMI1i67KE0yCWn"))
+        _css_bundle.cache_clear()
+        self.addCleanup(_css_bundle.cache_clear)
+        html = Template("{% load assets %}{% css_bundle %}").render(Context())
+        self.assertIn('integrity="sha384-', html)  # sem collectstatic: Bootstrap do CDN
+
+    @skipUnless(vendor_path().exists(), "Bootstrap não vendorizado em assets/vendor/")
+    def test_purges_vendored_bootstrap_against_real_templates(self):
+        data = vendor_path().read_bytes()
+        self.assertTrue(check_integrity(data, settings.CSS_VENDOR_INTEGRITY))
+        build_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, build_dir)
+        with override_settings(ASSETS_BUILD_DIR=build_dir):
+            call_command("build_css", stdout=io.StringIO())
+        with open(os.path.join(build_dir, "css", "app.css")) as f:
+            bundle = f.read()
+        self.assertLess(len(bundle), len(data) / 3)
+        for selector in (".navbar", ".container", ".btn-primary", ".card", ".alert-danger"):
+            self.assertIn(selector, bundle)
+        self.assertNotIn(".carousel", bundle)
+
+    @override_settings(DEBUG=False)
+    def test_collectstatic_fails_without_bundle_in_production(self):
+        with mock.patch("posts.cssbundle.build", side_effect=OSError("sem rede")):
+            with self.assertRaises(CommandError):
+                call_command("collectstatic", interactive=False, stdout=io.StringIO(), stderr=io.StringIO())
+
+
+class ThrottleTests(TestCase):
+    """ThrottleMiddleware: 429 por token bucket e 503 sem vaga, antes do formulário."""
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user("kika", password="x")
+
+    @override_settings(THROTTLE_RATES={"login": {"ip": "2/m"}})
+    def test_login_bucket_rejects_before_authenticate(self):
+        from django.contrib.auth import forms as auth_forms
+        url = reverse("login")
+        with mock.patch.object(auth_forms, "authenticate", wraps=auth_forms.authenticate) as auth:
+            codes = [self.client.post(url, {"username": "kika", "password": "errada"}).status_code for _ in range(3)]
+        self.assertEqual(codes, [200, 200, 429])
+        self.assertEqual(auth.call_count, 2)  # o terceiro nem chegou ao hash de senha
+        resp = self.client.post(url, {"username": "kika", "password": "x"})
+        self.assertEqual(resp["Retry-After"], "30")  # 1 ficha a cada 30 s
+        # Outro IP tem o próprio balde; a ficha volta com o tempo
+        self.assertEqual(self.client.post(url, {}, REMOTE_ADDR="10.0.0.9").status_code, 200)
+        with mock.patch("config.throttle.time.time", return_value=time.time() + 31):
+            self.assertEqual(self.client.post(url, {}).status_code, 200)
+        self.assertEqual(self.client.get(url).status_code, 200)  # GET não é limitado
+
+    @override_settings(THROTTLE_RATES={"posts:create": {"user": "1/m"}})
+    def test_post_create_per_user(self):
+        other = User.objects.create_user("lia", password="x")
+        form = {"attachments-TOTAL_FORMS": "0", "attachments-INITIAL_FORMS": "0"}
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.post(reverse("posts:create"), {"message": "um", **form}).status_code, 302)
+        self.assertEqual(self.client.post(reverse("posts:create"), {"message": "dois", **form}).status_code, 429)
+        self.client.force_login(other)
+        self.assertEqual(self.client.post(reverse("posts:create"), {"message": "três", **form}).status_code, 302)
+        self.assertEqual(Post.objects.count(), 2)
+
+    @override_settings(THROTTLE_RATES={}, THROTTLE_CONCURRENCY={"auth": 1})
+    def test_concurrency_slots(self):
+        from config.throttle import acquire_slot, release_slot
+        busy = acquire_slot("auth", 1, 60)
+        resp = self.client.post(reverse("signup"), {})
+        self.assertEqual((resp.status_code, resp["Retry-After"]), (503, "1"))
+        release_slot(busy)
+        self.assertEqual(self.client.post(reverse("signup"), {}).status_code, 200)
+        self.assertIsNotNone(acquire_slot("auth", 1, 60))  # a requisição devolveu a vaga
+
+    def test_client_ip_behind_proxies(self):
+        from config.throttle import client_ip
+        request = RequestFactory().post("/", REMOTE_ADDR="10.0.0.1", HTTP_X_FORWARDED_FOR="6.6.6.6, 1.2.3.4")
+        self.assertEqual(client_ip(request), "10.0.0.1")
+        self.assertEqual(client_ip(request, proxies=1), "1.2.3.4")  # o cliente não forja o último salto
+
+    def test_rate_format(self):
+        from config.throttle import parse_rate
+        self.assertEqual(parse_rate("10/m"), (10, 60))
+        self.assertEqual(parse_rate("5/hour"), (5, 3600))
+        self.assertIsNone(parse_rate("0"))
+        for bad in ("10", "abc/m", "0/m", "10/x", "10/5m"):
+            with self.assertRaises(ValueError):
+                parse_rate(bad)
+
+FLAKY_CALLS = []
+
+
+@task("tests.flaky", max_attempts=2)
+def flaky_task(fail):
+    FLAKY_CALLS.append(fail)
+    if fail:
+        raise RuntimeError("falhou")
+
+
+@task("tests.slow")
+def slow_task(seconds):
+    time.sleep(seconds)
+
+
+class JobQueueTests(TestCase):
+    """Fila de jobs no banco: reserva única, retry com backoff e tarefas das views."""
+    def setUp(self):
+        cache.clear()
+        FLAKY_CALLS.clear()
+
+    def test_job_runs_once_and_is_removed(self):
+        enqueue("tests.flaky", fail=False)
+        self.assertEqual(len(claim(10, "w1")), 1)
+        self.assertEqual(claim(10, "w2"), [])  # já reservado
+        Job.objects.update(status=Job.QUEUED)
+        self.assertEqual(Worker().run_once(), 1)
+        self.assertEqual(FLAKY_CALLS, [False])
+        self.assertFalse(Job.objects.exists())
+
+    def test_retry_with_backoff_then_failed(self):
+        job = enqueue("tests.flaky", fail=True)
+        with self.assertLogs("posts.jobs", "ERROR"):
+            Worker().run_once()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.QUEUED, 1))
+        self.assertGreater(job.run_at, timezone.now())  # espera o backoff
+        self.assertEqual(Worker().run_once(), 0)
+        Job.objects.update(run_at=timezone.now())
+        with self.assertLogs("posts.jobs", "ERROR"):
+            Worker().run_once()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.FAILED, 2))
+        self.assertIn("RuntimeError", job.last_error)
+        self.assertEqual(queue_stats()["depth"], {Job.QUEUED: 0, Job.RUNNING: 0, Job.FAILED: 1})
+
+    def test_stale_running_job_is_requeued(self):
+        enqueue("tests.flaky", fail=False)
+        claim(1, "morto")
+        Job.objects.update(locked_at=timezone.now() - timedelta(hours=1))
+        self.assertEqual(recover_stale(), 1)
+        self.assertEqual(Job.objects.get().status, Job.QUEUED)
+
+    def test_stale_renditions_job_resets_attachment(self):
+        post = Post.objects.create(author=User.objects.create_user("ana"), message="foto")
+        attachment = Attachment.objects.create(post=post, file="attachments/x.png", content_type="image/png")
+        Job.objects.all().delete()
+        enqueue("posts.renditions", attachment_id=attachment.pk)
+        claim(1, "morto")
+        Attachment.objects.update(renditions_status=Attachment.RENDITIONS_PROCESSING)
+        Job.objects.update(locked_at=timezone.now() - timedelta(hours=1))
+        self.assertEqual(recover_stale(), 1)
+        attachment.refresh_from_db()
+        self.assertEqual(attachment.renditions_status, Attachment.RENDITIONS_PENDING)
+
+    def test_heartbeat_keeps_live_job_from_being_recovered(self):
+        post = Post.objects.create(author=User.objects.create_user("ana"), message="foto")
+        attachment = Attachment.objects.create(post=post, file="attachments/x.png", content_type="image/png")
+        Job.objects.all().delete()
+        enqueue("posts.renditions", attachment_id=attachment.pk)
+        job = claim(1, "vivo")[0]
+        Attachment.objects.update(renditions_status=Attachment.RENDITIONS_PROCESSING)
+        Job.objects.update(locked_at=timezone.now() - timedelta(hours=1))
+        _beat(job)
+        self.assertEqual(recover_stale(), 0)
+        self.assertEqual(Job.objects.get().locked_by, "vivo")
+        attachment.refresh_from_db()
+        self.assertEqual(attachment.renditions_status, Attachment.RENDITIONS_PROCESSING)
+
+    @override_settings(JOBS_LOCK_TIMEOUT=0.03)
+    def test_long_job_sends_heartbeats(self):
+        enqueue("tests.slow", seconds=0.1)
+        with mock.patch("posts.jobs._beat") as beat:
+            Worker().run_once()
+        self.assertGreater(beat.call_count, 0)
+        self.assertFalse(Job.objects.exists())
+
+    def test_password_reset_email_sent_by_worker(self):
+        User.objects.create_user("ana", email="ana@example.com", password="x")
+        resp = self.client.post(reverse("password_reset"), {"email": "ana@example.com"})
+        self.assertEqual(resp.status_code, 302)
+        self.assertEqual(mail.outbox, [])
+        job = Job.objects.get()
+        self.assertEqual(job.name, "mail.password_reset")
+        self.assertNotIn("/reset/", json.dumps(job.payload))
+        self.assertNotIn("token", job.payload["context"])
+        Worker().run_once()
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertIn("/reset/", mail.outbox[0].body)
+        link = re.search(r"/reset/\S+", mail.outbox[0].body).group(0)
+        self.assertEqual(self.client.get(link).status_code, 302)  # token válido: vai para set-password
+
+    def test_queue_depth_in_metrics(self):
+        enqueue("tests.flaky", fail=False)
+        body = self.client.get(reverse("metrics")).content.decode()
+        self.assertIn('jobs_queue_depth{status="queued"} 1', body)
+        self.assertIn("# TYPE jobs_queue_lag_seconds gauge", body)
+
+
+def _settings_value(name, **env):
+    """Valor de config.settings num interpretador novo (os defaults dependem do ambiente)."""
+    env = {k: v for k, v in os.environ.items() if not k.startswith(("CACHE_", "SESSION_", "THROTTLE_"))} | env
+    out = subprocess.run(
+        [sys.executable, "-c", f"import config.settings as s; print(repr(s.{name}))"],
+        cwd=settings.BASE_DIR, env=env, check=True, capture_output=True, text=True,
+    )
+    return ast.literal_eval(out.stdout.strip())
+
+
+class SharedCacheTests(TestCase):
+    """Produção com vários workers: versões, sessões e limites num cache compartilhado."""
+    def test_production_defaults_to_file_cache(self):
+        self.assertEqual(_settings_value("CACHE_BACKEND", DEBUG="0"), "file")
+        self.assertEqual(_settings_value("CACHE_BACKEND", DEBUG="1"), "locmem")
+
+    def test_gunicorn_refuses_locmem_with_several_workers(self):
+        from config import gunicorn
+        server = mock.Mock()
+        with override_settings(CACHE_BACKEND="locmem", CACHE_SHARED=False), mock.patch.object(gunicorn, "workers", 3):
+            with self.assertRaises(ImproperlyConfigured):
+                gunicorn.on_starting(server)
+        with override_settings(CACHE_BACKEND="file", CACHE_SHARED=True), mock.patch.object(gunicorn, "workers", 3):
+            gunicorn.on_starting(server)
+
+    def test_per_process_cache_falls_back_to_db_sessions(self):
+        env = {"DEBUG": "0", "CACHE_BACKEND": "locmem", "THROTTLE_ENABLED": "0"}
+        self.assertEqual(_settings_value("SESSION_ENGINE", **env), "django.contrib.sessions.backends.db")
+        self.assertEqual(_settings_value("AUTHENTICATION_BACKENDS", **env), ["django.contrib.auth.backends.ModelBackend"])
+        self.assertEqual(_settings_value("SESSION_ENGINE", DEBUG="0"), "django.contrib.sessions.backends.cached_db")
+
+    def test_throttle_requires_shared_cache_in_production(self):
+        with self.assertRaises(subprocess.CalledProcessError) as ctx:
+            _settings_value("THROTTLE_ENABLED", DEBUG="0", CACHE_BACKEND="locmem", SESSION_MODE="db")
+        self.assertIn("THROTTLE_ENABLED=1", ctx.exception.stderr)
+        self.assertFalse(_settings_value("THROTTLE_ENABLED", DEBUG="0", CACHE_BACKEND="locmem", THROTTLE_ENABLED="0"))
+
+    def test_logout_reaches_other_workers(self):
+        from django.contrib.sessions.backends.cached_db import KEY_PREFIX
+        from django.core.cache.backends.filebased import FileBasedCache
+        from config.auth import user_cache_key
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        with override_settings(CACHES={"default": {
+            "BACKEND": "django.core.cache.backends.filebased.FileBasedCache", "LOCATION": directory,
+        }}):
+            # Outro worker: outra instância do cache sobre o mesmo diretório
+            other = FileBasedCache(directory, {})
+            user = User.objects.create_user("ana", password="x")
+            self.client.login(username="ana", password="x")
+            self.client.get(reverse("posts:create"))
+            session_key = self.client.cookies[settings.SESSION_COOKIE_NAME].value
+            self.assertIsNotNone(other.get(KEY_PREFIX + session_key))
+            self.assertIsNotNone(other.get(user_cache_key(user.pk)))
+            self.client.post(reverse("logout"))
+            self.assertIsNone(other.get(KEY_PREFIX + session_key))
+            user.set_password("nova")
+            user.save()
+            self.assertIsNone(other.get(user_cache_key(user.pk)))
+
+    def test_card_edit_reaches_other_workers(self):
+        from django.core.cache.backends.filebased import FileBasedCache
+        from .cache import render_post_card
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        with override_settings(CACHES={"default": {
+            "BACKEND": "django.core.cache.backends.filebased.FileBasedCache", "LOCATION": directory,
+        }}):
+            post = Post.objects.create(author=User.objects.create_user("ana"), message="antes")
+            self.assertIn("antes", render_post_card(post))
+            # A edição passa por outro worker (outra instância do cache)
+            with mock.patch("posts.cache.cache", FileBasedCache(directory, {})):
+                post.message = "depois"
+                post.save()
+            self.assertIn("depois", render_post_card(Post.objects.get(pk=post.pk)))
 
-# Create your tests here.
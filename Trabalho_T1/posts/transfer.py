@@ -0,0 +1,101 @@
+"""
+Utilitários de export/import em NDJSON (manage.py export_posts / import_posts).
+
+Cada linha é um objeto JSON com "type" = "user" | "post" | "attachment".
+Autores são referenciados pelo username (ids de usuário não viajam entre
+bancos); posts e anexos mantêm seus ids, o que torna o import idempotente.
+"""
+import contextlib
+import gzip
+import json
+import os
+import shutil
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.exceptions import SuspiciousFileOperation
+from django.utils._os import safe_join
+
+from .models import Post, Attachment
+
+FORMAT_VERSION = 1
+
+
+def open_stream(path, mode):
+    """Arquivo binário para `path` ("-" = stdin/stdout; sufixo .gz = gzip)."""
+    if path == "-":
+        stream = sys.stdin.buffer if "r" in mode else sys.stdout.buffer
+        return contextlib.nullcontext(stream)
+    if path.endswith(".gz"):
+        return gzip.open(path, mode + "b")
+    return open(path, mode + "b")
+
+
+def dump_line(record):
+    return json.dumps(record, separators=(",", ":"), ensure_ascii=False).encode() + b"\n"
+
+
+@contextlib.contextmanager
+def keep_timestamps():
+    """
+    Desliga auto_now/auto_now_add durante o import: bulk_create chamaria pre_save
+    e trocaria created_at/updated_at/uploaded_at pela hora do import.
+    """
+    fields = [
+        Post._meta.get_field("created_at"), Post._meta.get_field("updated_at"),
+        Attachment._meta.get_field("uploaded_at"),
+    ]
+    saved = [(f, f.auto_now, f.auto_now_add) for f in fields]
+    for f in fields:
+        f.auto_now = f.auto_now_add = False
+    try:
+        yield
+    finally:
+        for f, auto_now, auto_now_add in saved:
+            f.auto_now, f.auto_now_add = auto_now, auto_now_add
+
+
+def _copy_one(name, src_root, dst_root):
+    # O nome vem do arquivo importado: absoluto ou com "../" sairia da pasta de mídia
+    try:
+        src = safe_join(src_root, name)
+        dst = safe_join(dst_root, name)
+    except (SuspiciousFileOperation, ValueError):
+        return "rejected"
+    if not os.path.exists(src):
+        return "missing"
+    if os.path.exists(dst) and os.path.getsize(dst) == os.path.getsize(src):
+        return "skipped"
+    os.makedirs(os.path.dirname(dst), exist_ok=True)
+    # Cópia para temporário + rename: uma interrupção não deixa arquivo pela metade
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(dst), prefix=".copy-")
+    os.close(fd)
+    try:
+        shutil.copyfile(src, tmp)
+        os.replace(tmp, dst)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    return "copied"
+
+
+def copy_media(names, src_root, dst_root, jobs=1):
+    """
+    Copia arquivos de mídia mantendo o mesmo nome relativo (o nome é o que está
+    no banco). Com jobs > 1 as cópias rodam em threads (I/O libera o GIL).
+    Retorna um dict com as contagens copied/skipped/missing/rejected (nome fora
+    da pasta de mídia).
+    """
+    counts = {"copied": 0, "skipped": 0, "missing": 0, "rejected": 0}
+    names = list(dict.fromkeys(n for n in names if n))  # CAS: vários anexos, um arquivo
+    if jobs > 1:
+        with ThreadPoolExecutor(max_workers=jobs) as pool:
+            results = pool.map(lambda n: _copy_one(n, src_root, dst_root), names)
+            for result in results:
+                counts[result] += 1
+    else:
+        for name in names:
+            counts[_copy_one(name, src_root, dst_root)] += 1
+    return counts
@@ -0,0 +1,82 @@
+import hashlib
+
+from django.conf import settings
+from django.core.files.uploadhandler import SkipFile, TemporaryFileUploadHandler
+
+# (deslocamento, assinatura, tipo) — checados em ordem no primeiro chunk
+MAGIC_NUMBERS = [
+    (0, b"\xff\xd8\xff", "image/jpeg"),
+    (0, b"\x89PNG\r\n\x1a\n", "image/png"),
+    (0, b"GIF87a", "image/gif"),
+    (0, b"GIF89a", "image/gif"),
+    (8, b"WEBP", "image/webp"),
+    (8, b"WAVE", "audio/wav"),
+    (0, b"ID3", "audio/mpeg"),
+    (4, b"ftyp", "video/mp4"),
+    (0, b"\x1a\x45\xdf\xa3", "video/webm"),
+]
+
+
+def sniff_content_type(head, declared=""):
+    """Detecta o tipo real pelos magic bytes; o tipo declarado pelo cliente só desempata."""
+    if head[:4] == b"OggS":
+        # Ogg é contêiner de áudio e de vídeo: mantém o que o cliente disse, se for Ogg
+        return declared if declared in ("audio/ogg", "video/ogg") else "audio/ogg"
+    for offset, signature, content_type in MAGIC_NUMBERS:
+        if head[offset:offset + len(signature)] == signature:
+            return content_type
+    # MP3 sem tag ID3 começa direto em um frame (sync de 11 bits)
+    if len(head) >= 2 and head[0] == 0xFF and head[1] & 0xE0 == 0xE0:
+        return "audio/mpeg"
+    return None
+
+
+class StreamingAttachmentUploadHandler(TemporaryFileUploadHandler):
+    """
+    Grava o upload direto em disco em chunks (memória constante), valida o tipo
+    pelos magic bytes do primeiro chunk, descarta o arquivo assim que passa de
+    MAX_UPLOAD_SIZE_BYTES e calcula o SHA-256 durante o streaming.
+
+    Arquivos rejeitados são pulados (SkipFile) e o motivo fica em
+    request.upload_errors[<nome do campo>] para o formulário exibir.
+    """
+    chunk_size = 64 * 2 ** 10
+
+    def __init__(self, request=None):
+        super().__init__(request)
+        self.max_bytes = getattr(settings, "MAX_UPLOAD_SIZE_BYTES", 25 * 1024 * 1024)
+        self.allowed = set(getattr(settings, "ALLOWED_MEDIA_CONTENT_TYPES", []))
+        if request is not None and not hasattr(request, "upload_errors"):
+            request.upload_errors = {}
+
+    def _reject(self, message):
+        if self.request is not None:
+            self.request.upload_errors[self.field_name] = message
+        raise SkipFile(message)
+
+    def new_file(self, field_name, file_name, content_type, content_length, charset=None, content_type_extra=None):
+        super().new_file(field_name, file_name, content_type, content_length, charset, content_type_extra)
+        if content_length is not None and content_length > self.max_bytes:
+            self._reject("Arquivo excede o tamanho máximo permitido.")
+        self.hasher = hashlib.sha256()
+        self.received = 0
+        self.detected_type = None
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        if self.received > self.max_bytes:
+            self._reject("Arquivo excede o tamanho máximo permitido.")
+        if self.detected_type is None:
+            self.detected_type = sniff_content_type(raw_data, self.content_type)
+            if self.detected_type not in self.allowed:
+                self._reject("Tipo de arquivo não permitido.")
+        self.hasher.update(raw_data)
+        self.file.write(raw_data)
+
+    def file_complete(self, file_size):
+        uploaded = super().file_complete(file_size)
+        if self.detected_type:
+            # O tipo detectado substitui o Content-Type enviado pelo cliente
+            uploaded.content_type = self.detected_type
+        uploaded.sha256 = self.hasher.hexdigest()
+        return uploaded
@@ -1,6 +1,9 @@
 from django.urls import path
+
+from . import api, feeds
 from .views import (
-    PostListView, PostDetailView, PostCreateView, PostUpdateView, PostDeleteView
+    PostListView, PostDetailView, PostCreateView, PostUpdateView, PostDeleteView,
+    PostSearchView, AuthorPostListView,
 )
 
 app_name = "posts"
@@ -8,7 +11,21 @@ app_name = "posts"
 urlpatterns = [
     path("", PostListView.as_view(), name="list"),                # público
     path("<int:pk>/", PostDetailView.as_view(), name="detail"),   # público
+    path("busca/", PostSearchView.as_view(), name="search"),      # público
+    path("u/<str:username>/", AuthorPostListView.as_view(), name="author"),  # público
     path("novo/", PostCreateView.as_view(), name="create"),       # autenticado
     path("<int:pk>/editar/", PostUpdateView.as_view(), name="update"),  # autor/staff
     path("<int:pk>/excluir/", PostDeleteView.as_view(), name="delete"), # autor/staff
+
+    # API JSON (async, somente leitura)
+    path("api/posts/", api.timeline, name="api_timeline"),
+    path("api/posts/<int:pk>/", api.post_detail, name="api_detail"),
+    path("api/u/<str:username>/posts/", api.author_posts, name="api_author_posts"),
+    path("api/events/", api.timeline_events, name="api_events"),  # SSE (ASGI)
+
+    # Feeds Atom / JSON Feed (?since_id= incremental, ETag)
+    path("api/feed.atom", feeds.timeline_atom, name="feed_atom"),
+    path("api/feed.json", feeds.timeline_json, name="feed_json"),
+    path("api/u/<str:username>/feed.atom", feeds.author_atom, name="author_feed_atom"),
+    path("api/u/<str:username>/feed.json", feeds.author_json, name="author_feed_json"),
 ]
@@ -1,31 +1,146 @@
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
+from django.contrib.auth.models import User
 from django.contrib.auth.views import LoginView
+from django.db import transaction
+from django.http import Http404
+from django.shortcuts import get_object_or_404
 from django.urls import reverse_lazy
-from django.views.generic import ListView, DetailView, CreateView, UpdateView, DeleteView, FormView
+from django.views.decorators.csrf import csrf_exempt, csrf_protect
+from django.views.generic import ListView, DetailView, CreateView, UpdateView, DeleteView, FormView, TemplateView
 
-from .models import Post
+from .models import Post, Attachment
 from .forms import PostForm, SignUpForm, AttachmentFormSet
+from .pagination import KeysetPaginationMixin
+from .cache import AnonymousPageCacheMixin, timeline_state, post_versions
+from .search import search_posts
+from .uploadhandlers import StreamingAttachmentUploadHandler
 
 # ---------------------------
 # Timeline pública (somente leitura)
 # ---------------------------
-class PostListView(ListView):
-    """Lista todos os posts na timeline, com paginação de 20 itens."""
+class MediaFilterMixin:
+    """?media=image|audio|video: só posts com anexo desse tipo (o cache de página separa por URL)."""
+    media_filters = [(k, label) for k, label in Attachment.KIND_CHOICES if k != Attachment.KIND_OTHER]
+
+    def get_media_kind(self):
+        kind = self.request.GET.get("media", "")
+        if kind and kind not in dict(self.media_filters):
+            raise Http404("Filtro de mídia inválido.")
+        return kind
+
+    def filter_media(self, queryset):
+        kind = self.get_media_kind()
+        return queryset.with_media(kind) if kind else queryset
+
+    def get_context_data(self, **kwargs):
+        ctx = super().get_context_data(**kwargs)
+        ctx["media"] = self.get_media_kind()
+        ctx["media_filters"] = self.media_filters
+        return ctx
+
+class PostListView(AnonymousPageCacheMixin, MediaFilterMixin, KeysetPaginationMixin, ListView):
+    """Lista todos os posts na timeline, com paginação por cursor de 20 itens."""
     model = Post
     template_name = "posts/post_list.html"
     context_object_name = "posts"
     paginate_by = 20
 
-class PostDetailView(DetailView):
+    def get_queryset(self):
+        # autor via JOIN; anexos e renditions em queries extras fixas (evita N+1 no template)
+        return self.filter_media(Post.objects.select_related("author").prefetch_related("attachments__renditions"))
+
+    def page_cache_state(self):
+        return timeline_state()
+
+class PostDetailView(AnonymousPageCacheMixin, DetailView):
     """Exibe detalhes de um post específico."""
     model = Post
     template_name = "posts/post_detail.html"
     context_object_name = "post"
 
+    def get_queryset(self):
+        return Post.objects.select_related("author").prefetch_related("attachments__renditions")
+
+    def page_cache_state(self):
+        # Consulta barata pela PK; a versão vem dos mesmos tokens do cache de cards
+        row = Post.objects.filter(pk=self.kwargs["pk"]).values_list("author_id", "updated_at").first()
+        if row is None:
+            return None
+        author_id, updated_at = row
+        return ":".join(post_versions(self.kwargs["pk"], author_id)), updated_at.timestamp()
+
+class AuthorPostListView(AnonymousPageCacheMixin, MediaFilterMixin, KeysetPaginationMixin, ListView):
+    """Timeline de um autor (/u/<username>/), paginada por cursor."""
+    model = Post
+    template_name = "posts/post_author.html"
+    context_object_name = "posts"
+    paginate_by = 20
+
+    def get_author(self):
+        if not hasattr(self, "author"):
+            # Contadores desnormalizados no mesmo SELECT do usuário (sem COUNT(*))
+            self.author = get_object_or_404(
+                User.objects.select_related("post_stats"), username=self.kwargs["username"]
+            )
+        return self.author
+
+    def get_queryset(self):
+        # filter(author_id) + ordem (-created_at, -id) = range scan em post_author_created_id_idx
+        return self.filter_media(
+            Post.objects.filter(author_id=self.get_author().pk)
+            .select_related("author").prefetch_related("attachments__renditions")
+        )
+
+    def get_context_data(self, **kwargs):
+        ctx = super().get_context_data(**kwargs)
+        author = self.get_author()
+        ctx["author"] = author
+        ctx["stats"] = getattr(author, "post_stats", None)
+        return ctx
+
+    def page_cache_state(self):
+        # Posts, anexos e usernames já invalidam a versão da timeline
+        return timeline_state()
+
+class PostSearchView(TemplateView):
+    """Busca pública por texto, ranqueada e paginada por cursor."""
+    template_name = "posts/post_search.html"
+    paginate_by = 20
+
+    def get_context_data(self, **kwargs):
+        ctx = super().get_context_data(**kwargs)
+        q = self.request.GET.get("q", "").strip()
+        posts, next_cursor = search_posts(q, after=self.request.GET.get("after"), limit=self.paginate_by)
+        ctx.update({"q": q, "posts": posts, "next_cursor": next_cursor})
+        return ctx
+
 # ---------------------------
 # CRUD (somente autenticado)
 # ---------------------------
-class PostCreateView(LoginRequiredMixin, CreateView):
+class StreamingUploadMixin:
+    """
+    Troca os upload handlers do request pelo StreamingAttachmentUploadHandler.
+    O CsrfViewMiddleware lê request.POST antes da view (e aí os handlers já não
+    podem mudar), então a checagem de CSRF é feita aqui, depois da troca.
+    Deve vir depois dos mixins de login/permissão, que não leem o corpo.
+    """
+    @classmethod
+    def as_view(cls, **initkwargs):
+        return csrf_exempt(super().as_view(**initkwargs))
+
+    def dispatch(self, request, *args, **kwargs):
+        request.upload_handlers = [StreamingAttachmentUploadHandler(request)]
+        return csrf_protect(super().dispatch)(request, *args, **kwargs)
+
+    def get_attachment_formset(self, instance=None):
+        if self.request.POST:
+            return AttachmentFormSet(
+                self.request.POST, self.request.FILES, instance=instance,
+                upload_errors=getattr(self.request, "upload_errors", None),
+            )
+        return AttachmentFormSet(instance=instance)
+
+class PostCreateView(LoginRequiredMixin, StreamingUploadMixin, CreateView):
     """Cria novo post com anexos. Requer login."""
     model = Post
     form_class = PostForm
@@ -38,10 +153,7 @@ class PostCreateView(LoginRequiredMixin, CreateView):
 
     def get_context_data(self, **kwargs):
         ctx = super().get_context_data(**kwargs)
-        if self.request.POST:
-            ctx["formset"] = AttachmentFormSet(self.request.POST, self.request.FILES)
-        else:
-            ctx["formset"] = AttachmentFormSet()
+        ctx["formset"] = self.get_attachment_formset()
         return ctx
 
     def form_valid(self, form):
@@ -49,9 +161,11 @@ class PostCreateView(LoginRequiredMixin, CreateView):
         context = self.get_context_data()
         formset = context["formset"]
         if formset.is_valid():
-            self.object = form.save()
-            formset.instance = self.object
-            formset.save()
+            # Post, anexos e contadores do autor entram (ou não) juntos
+            with transaction.atomic():
+                self.object = form.save()
+                formset.instance = self.object
+                formset.save()
             return super().form_valid(form)
         else:
             return self.form_invalid(form)
@@ -68,7 +182,7 @@ class OwnerOrStaffRequiredMixin(UserPassesTestMixin):
         obj = self.get_object()
         return self.request.user.is_staff or obj.author_id == self.request.user.id
 
-class PostUpdateView(LoginRequiredMixin, OwnerRequiredMixin, UpdateView):
+class PostUpdateView(LoginRequiredMixin, OwnerRequiredMixin, StreamingUploadMixin, UpdateView):
     """Edita post existente com anexos. Requer ser autor ou staff."""
     model = Post
     form_class = PostForm
@@ -81,19 +195,18 @@ class PostUpdateView(LoginRequiredMixin, OwnerRequiredMixin, UpdateView):
 
     def get_context_data(self, **kwargs):
         ctx = super().get_context_data(**kwargs)
-        if self.request.POST:
-            ctx["formset"] = AttachmentFormSet(self.request.POST, self.request.FILES, instance=self.object)
-        else:
-            ctx["formset"] = AttachmentFormSet(instance=self.object)
+        ctx["formset"] = self.get_attachment_formset(instance=self.object)
         return ctx
 
     def form_valid(self, form):
         context = self.get_context_data()
         formset = context["formset"]
         if formset.is_valid():
-            self.object = form.save()
-            formset.instance = self.object
-            formset.save()
+            # Post, anexos e contadores do autor entram (ou não) juntos
+            with transaction.atomic():
+                self.object = form.save()
+                formset.instance = self.object
+                formset.save()
             return super().form_valid(form)
         else:
             return self.form_invalid(form)
@@ -113,7 +226,7 @@ class PublicLoginView(LoginView):
 
     def get_context_data(self, **kwargs):
         ctx = super().get_context_data(**kwargs)
-        ctx["recent_posts"] = Post.objects.select_related("author").all()[:10]
+        ctx["recent_posts"] = Post.objects.select_related("author")[:10]
         return ctx
 
 # ---------------------------